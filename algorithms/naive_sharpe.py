@@ -77,7 +77,7 @@ class NaiveSharpe(Algorithm):
         sharpe_ratio_list = []
 
         for symbol, asset in self.broker.assets.items():
-            sharpe_ratio = asset.testing_df.iloc[-1].naivesharpe
+            sharpe_ratio = asset.latest_row.naivesharpe
             sharpe_ratio_list.append((symbol, sharpe_ratio))
 
         sharpe_ratio_list = sorted(sharpe_ratio_list, key=lambda x: x[1], reverse=True)
@@ -77,13 +77,13 @@ class NearestNeighbors(Algorithm):
 
         for symbol, asset in self.broker.assets.items():
 
-            df = asset.testing_df
+            latest_row = asset.latest_row
 
             # breakpoint()
-            if df.iloc[-1][f'nearest_neighbor_last_5_K{self.variability_constant}'] < self.lower_bound:
+            if latest_row[f'nearest_neighbor_last_5_K{self.variability_constant}'] < self.lower_bound:
                 self.broker.place_order(symbol, 20, OrderType.BUY)
 
-            elif df.iloc[-1][f'nearest_neighbor_last_5_K{self.variability_constant}'] > self.upper_bound:
+            elif latest_row[f'nearest_neighbor_last_5_K{self.variability_constant}'] > self.upper_bound:
                 self.broker.place_order(symbol, 20, OrderType.SELL)
 
         display.print_total_value(self.name, self.broker, current_datetime)
@@ -68,9 +68,7 @@ class ProportionalToReturns(Algorithm):
         """
         # Testing code, called on every time frame
         for symbol, asset in self.broker.assets.items():
-            df = asset.testing_df
-
-            current_returns = df.iloc[-1].returns_vwap
+            current_returns = asset.latest_row.returns_vwap
 
             if current_returns < -0.01:
                 self.broker.place_order(symbol, -int(current_returns * 100), OrderType.BUY)
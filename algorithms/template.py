@@ -6,6 +6,7 @@ import derived_columns.definitions as dcolumns
 from derived_columns import Column
 from monte.algorithm import Algorithm
 from monte.broker import Broker
+from monte.cadence import Cadence, EveryTimeFrame
 from monte.machine_settings import MachineSettings
 from monte.orders import Order, OrderType
 
@@ -57,12 +58,20 @@ class Template(Algorithm):
         # Training code, called once
         ...
 
+    def get_cadence(self) -> Cadence:
+        """
+        Returns the cadence that decides which time frames run_one_time_frame() is called on. Use
+        EveryNTimeFrames(n), SessionOpen(), SessionClose(), OnProcessedOrders() or OnColumnCrossing(...), or
+        combine them with |. Remove this method to run on every time frame.
+        """
+        return EveryTimeFrame()
+
     def run_one_time_frame(self, current_datetime: datetime, processed_orders: list[Order]):
         """
-        Runs on every time frame during the testing phase of the simulation. This is the main body of the
-        algorithm.
+        Runs on every time frame the algorithm's cadence is due on during the testing phase of the simulation.
+        This is the main body of the algorithm.
         """
-        # Testing code, called on every time frame
+        # Testing code, called on every time frame (by default)
         ...
 
     def cleanup(self):
@@ -1,5 +1,6 @@
 from dataclasses import dataclass
 
+import numpy as np
 import pandas as pd
 from numpy.typing import ArrayLike
 from scipy.fft import fft, fftfreq
@@ -7,6 +8,7 @@ from sklearn.linear_model import LinearRegression
 from sklearn.model_selection import train_test_split
 
 from monte.column import wrap_column
+from monte.rolling import python_divide, python_pow, python_sum, rolling_windows
 
 
 @wrap_column()
@@ -17,6 +19,12 @@ def net(df: pd.DataFrame, num_rows: int, col: str) -> float:
     return df.iloc[-num_rows][col] - df.iloc[-1][col]
 
 
+@net.batch
+def net_batch(df: pd.DataFrame, num_rows: int, col: str) -> np.ndarray:
+    windows = rolling_windows(df[col], num_rows)
+    return windows[:, 0] - windows[:, -1]
+
+
 @wrap_column()
 def mean(df: pd.DataFrame, num_rows: int, col: str) -> float:
     """
@@ -28,6 +36,11 @@ def mean(df: pd.DataFrame, num_rows: int, col: str) -> float:
     return total / num_rows
 
 
+@mean.batch
+def mean_batch(df: pd.DataFrame, num_rows: int, col: str) -> np.ndarray:
+    return python_sum(rolling_windows(df[col], num_rows)) / num_rows
+
+
 @wrap_column()
 def std_dev(df: pd.DataFrame, num_rows: int, col: str) -> float:
     """
@@ -39,6 +52,13 @@ def std_dev(df: pd.DataFrame, num_rows: int, col: str) -> float:
     return (sum_of_squared_differences / num_rows) ** 0.5
 
 
+@std_dev.batch
+def std_dev_batch(df: pd.DataFrame, num_rows: int, col: str) -> np.ndarray:
+    avg = mean_batch(df, num_rows, col)
+    squared_differences = python_pow(rolling_windows(df[col], num_rows) - avg[:, np.newaxis], 2)
+    return python_pow(python_sum(squared_differences) / num_rows, 0.5)
+
+
 @wrap_column()
 def returns(df: pd.DataFrame, num_rows: int, col: str) -> float:
     """
@@ -49,6 +69,14 @@ def returns(df: pd.DataFrame, num_rows: int, col: str) -> float:
     return ((final - initial) / initial)
 
 
+@returns.batch
+def returns_batch(df: pd.DataFrame, num_rows: int, col: str) -> np.ndarray:
+    windows = rolling_windows(df[col], num_rows)
+    initial = windows[:, 0]
+    final = windows[:, -1]
+    return python_divide(final - initial, initial)
+
+
 @wrap_column()
 def infimum(df: pd.DataFrame, num_rows: int, col: str, k: float) -> float:
     """
@@ -66,6 +94,11 @@ def infimum(df: pd.DataFrame, num_rows: int, col: str, k: float) -> float:
     return lower_bound
 
 
+@infimum.batch
+def infimum_batch(df: pd.DataFrame, num_rows: int, col: str, k: float) -> np.ndarray:
+    return mean_batch(df, num_rows, col) - k * std_dev_batch(df, num_rows, col)
+
+
 @wrap_column()
 def infimum_norm(df: pd.DataFrame, num_rows: int, infimum_column: str, returns_column: str) -> float:
    # breakpoint()
@@ -77,6 +110,12 @@ def infimum_norm(df: pd.DataFrame, num_rows: int, infimum_column: str, returns_c
     return value
 
 
+@infimum_norm.batch
+def infimum_norm_batch(df: pd.DataFrame, num_rows: int, infimum_column: str, returns_column: str) -> np.ndarray:
+    oldest_infimums = rolling_windows(df[infimum_column], num_rows)[:, 0]
+    return (mean_batch(df, num_rows, returns_column) - oldest_infimums) ** 2
+
+
 @wrap_column()
 def linear_regression_prediction(
         df: pd.DataFrame, num_rows: int, returns_column: str, inf_norm_column: str) -> float:
@@ -131,6 +170,26 @@ def nearest_neighbor(df: pd.DataFrame, num_rows: int, infimum_column: str, retur
     return nearest_neighbor
 
 
+@nearest_neighbor.batch
+def nearest_neighbor_batch(df: pd.DataFrame, num_rows: int, infimum_column: str, returns_column: str) -> np.ndarray:
+    recent_rolling_avg = mean_batch(df, num_rows, returns_column)
+    infimum_windows = rolling_windows(df[infimum_column], num_rows)
+    returns_windows = rolling_windows(df[returns_column], num_rows)
+
+    distances = python_pow(recent_rolling_avg[:, np.newaxis] - infimum_windows, 2)
+
+    # Walk through the windows from the oldest row to the newest, only switching to a row that is strictly
+    # closer, the same way the per-row version does
+    lowest_distances = distances[:, 0]
+    nearest_neighbors = returns_windows[:, 0]
+    for window_index in range(1, num_rows):
+        is_closer = distances[:, window_index] < lowest_distances
+        lowest_distances = np.where(is_closer, distances[:, window_index], lowest_distances)
+        nearest_neighbors = np.where(is_closer, returns_windows[:, window_index], nearest_neighbors)
+
+    return nearest_neighbors
+
+
 @dataclass
 class FFTResult:
     """
@@ -163,3 +222,8 @@ def naive_sharpe(df: pd.DataFrame, num_rows: int, col: str) -> float:
     curr_returns = returns(df, num_rows, col)
     curr_std_dev = std_dev(df, num_rows, col)
     return curr_returns / curr_std_dev
+
+
+@naive_sharpe.batch
+def naive_sharpe_batch(df: pd.DataFrame, num_rows: int, col: str) -> np.ndarray:
+    return python_divide(returns_batch(df, num_rows, col), std_dev_batch(df, num_rows, col))
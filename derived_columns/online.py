@@ -0,0 +1,240 @@
+import math
+from abc import abstractmethod
+from collections import deque
+
+from monte.column import OnlineState
+
+
+class RollingWindowState(OnlineState):
+    """
+    Abstract base class for online states over the last ``num_rows`` input values. The window itself is kept so that the
+    value leaving it is known, and so that running sums can be recalculated from scratch once every
+    ``num_rows`` updates. This keeps floating point error from building up, and still costs O(1) per update
+    on average.
+
+    Missing (NaN) input values are counted instead of being added to the running state. Like the rolling
+    functions in definitions.py, the column's value is NaN while any of them are in the window.
+    """
+
+    _window: deque
+    _num_missing: int
+    _num_seen: int
+    _num_updates_since_refresh: int
+
+    def __init__(self, num_rows: int):
+        super().__init__(num_rows)
+        self._window = deque()
+        self._num_missing = 0
+        self._num_seen = 0
+        self._num_updates_since_refresh = 0
+
+    @property
+    def is_full(self) -> bool:
+        return len(self._window) == self.num_rows
+
+    def update(self, value: float) -> float:
+        value = float(value)
+
+        # Remove the oldest value once the window is full
+        if self.is_full:
+            oldest_value = self._window.popleft()
+            if math.isnan(oldest_value):
+                self._num_missing -= 1
+            else:
+                self._remove(oldest_value)
+
+        self._window.append(value)
+        if math.isnan(value):
+            self._num_missing += 1
+        else:
+            self._add(value)
+
+        self._num_seen += 1
+
+        self._num_updates_since_refresh += 1
+        if self._num_updates_since_refresh >= self.num_rows:
+            self._refresh()
+            self._num_updates_since_refresh = 0
+
+        if not self.is_full or self._num_missing:
+            return math.nan
+
+        return self._get_value()
+
+    def _present_values(self) -> list[float]:
+        """
+        Returns the values in the window that aren't missing, oldest first.
+        """
+        return [value for value in self._window if not math.isnan(value)]
+
+    @abstractmethod
+    def _add(self, value: float):
+        """
+        Adds a value that entered the window to the running state.
+        """
+        ...
+
+    @abstractmethod
+    def _remove(self, value: float):
+        """
+        Removes the oldest value, which just left the window, from the running state.
+        """
+        ...
+
+    def _refresh(self):
+        """
+        Recalculates the running state from the values in the window.
+        """
+        pass
+
+    @abstractmethod
+    def _get_value(self) -> float:
+        """
+        Returns the column's value for a full window without any missing values.
+        """
+        ...
+
+
+class RollingSum(RollingWindowState):
+    """
+    The sum of the last ``num_rows`` values of a column.
+    """
+
+    _sum: float
+
+    def __init__(self, num_rows: int):
+        super().__init__(num_rows)
+        self._sum = 0.0
+
+    def _add(self, value: float):
+        self._sum += value
+
+    def _remove(self, value: float):
+        self._sum -= value
+
+    def _refresh(self):
+        self._sum = math.fsum(self._present_values())
+
+    def _get_value(self) -> float:
+        return self._sum
+
+
+class RollingMean(RollingSum):
+    """
+    The mean of the last ``num_rows`` values of a column.
+    """
+
+    def _get_value(self) -> float:
+        return self._sum / self.num_rows
+
+
+class RollingStdDev(RollingWindowState):
+    """
+    The (population) standard deviation of the last ``num_rows`` values of a column, kept up to date with
+    Welford's algorithm extended to remove the value that leaves the window.
+    """
+
+    _count: int
+    _mean: float
+    _sum_of_squared_differences: float
+
+    def __init__(self, num_rows: int):
+        super().__init__(num_rows)
+        self._count = 0
+        self._mean = 0.0
+        self._sum_of_squared_differences = 0.0
+
+    def _add(self, value: float):
+        self._count += 1
+        delta = value - self._mean
+        self._mean += delta / self._count
+        self._sum_of_squared_differences += delta * (value - self._mean)
+
+    def _remove(self, value: float):
+        self._count -= 1
+        if self._count == 0:
+            self._mean = 0.0
+            self._sum_of_squared_differences = 0.0
+            return
+
+        delta = value - self._mean
+        self._mean -= delta / self._count
+        self._sum_of_squared_differences -= delta * (value - self._mean)
+
+    def _refresh(self):
+        values = self._present_values()
+
+        self._count = len(values)
+        self._mean = math.fsum(values) / self._count if values else 0.0
+        self._sum_of_squared_differences = math.fsum((value - self._mean) ** 2 for value in values)
+
+    def _get_value(self) -> float:
+        return (max(self._sum_of_squared_differences, 0.0) / self.num_rows) ** 0.5
+
+
+class RollingInfimum(RollingStdDev):
+    """
+    A lower bound for the rolling mean of a column: ``mean - k * std_dev`` over the last ``num_rows`` values.
+    """
+
+    k: float
+
+    def __init__(self, num_rows: int, k: float):
+        super().__init__(num_rows)
+        self.k = k
+
+    def _get_value(self) -> float:
+        return self._mean - self.k * super()._get_value()
+
+
+class RollingExtremum(RollingWindowState):
+    """
+    Abstract base class for the rolling minimum and maximum. A monotonic deque of (row number, value) pairs holds the
+    only values in the window that can still become the extremum, with the current extremum at the front.
+    """
+
+    _candidates: deque
+
+    def __init__(self, num_rows: int):
+        super().__init__(num_rows)
+        self._candidates = deque()
+
+    def _add(self, value: float):
+        # Values that are no better than the new value can never be the extremum again
+        while self._candidates and not self._is_better(self._candidates[-1][1], value):
+            self._candidates.pop()
+
+        self._candidates.append((self._num_seen, value))
+
+    def _remove(self, value: float):
+        # The value leaving the window is the oldest one, so it can only be at the front
+        if self._candidates and self._candidates[0][0] <= self._num_seen - self.num_rows:
+            self._candidates.popleft()
+
+    def _get_value(self) -> float:
+        return self._candidates[0][1]
+
+    @abstractmethod
+    def _is_better(self, candidate: float, value: float) -> bool:
+        """
+        Returns True if ``candidate`` is a better extremum than ``value``.
+        """
+        ...
+
+
+class RollingMin(RollingExtremum):
+    """
+    The minimum of the last ``num_rows`` values of a column.
+    """
+
+    def _is_better(self, candidate: float, value: float) -> bool:
+        return candidate < value
+
+
+class RollingMax(RollingExtremum):
+    """
+    The maximum of the last ``num_rows`` values of a column.
+    """
+
+    def _is_better(self, candidate: float, value: float) -> bool:
+        return candidate > value
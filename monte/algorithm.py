@@ -5,6 +5,7 @@ from datetime import datetime
 
 from monte.api import AlpacaAPIBundle
 from monte.broker import Broker
+from monte.cadence import Cadence, EveryTimeFrame
 from monte.column import Column
 from monte.machine_settings import MachineSettings
 from monte.orders import Order
@@ -60,11 +61,20 @@ class Algorithm(ABC):
     @abstractmethod
     def run_one_time_frame(self, current_datetime: datetime, processed_orders: list[Order]):
         """
-        This method is called once on every time_frame during the testing data phase. The current datetime
-        of the simulation is passed in along with a list of orders that were completed this time_frame.
+        This method is called during the testing data phase on every time_frame the algorithm's cadence is due
+        on (every time_frame by default). The current datetime of the simulation is passed in along with a list
+        of orders that were completed since the last time this method was called.
         """
         ...
 
+    def get_cadence(self) -> Cadence:
+        """
+        Returns the cadence (see monte.cadence) that decides on which time_frames run_one_time_frame() is
+        called. This is called once when the trading machine starts up. By default, the algorithm runs on every
+        time_frame.
+        """
+        return EveryTimeFrame()
+
     @abstractmethod
     def cleanup(self):
         """
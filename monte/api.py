@@ -1,15 +1,22 @@
-import gzip
+import asyncio
 import json
 import os
 import pathlib
+import threading
+import time
 from datetime import date, datetime
-from typing import Type, TypeVar
+from typing import Type, TypeVar, Union
 
-import asks
+import aiohttp
 import pandas as pd
-import trio
+import pyarrow as pa
 from alpaca_trade_api import REST, TimeFrame
 
+from monte.bar_cache import BarCache
+from monte.bar_columns import BarColumnBuilder
+from monte.request_scheduler import (RETRYABLE_STATUS_CODES, KeyUtilization, RequestScheduler,
+                                     get_backoff_delay)
+
 #############
 # CONSTANTS #
 #############
@@ -18,21 +25,57 @@ REPO_NAME = "monte"
 MARKET_DATA_BASE_URL = "https://data.alpaca.markets"
 CRYPTO_BASE_URL = "https://data.alpaca.markets/v1beta1/crypto"
 
+# Connection pool settings for the async bars client. Each API key pair gets its own pool.
+MAX_CONNECTIONS_PER_KEY = 16
+KEEPALIVE_TIMEOUT = 60
+REQUEST_TIMEOUT = 60
+
 
 ##############
 # ALPACA API #
 ##############
 
+def _get_retry_after(headers: dict[str, str]) -> Union[float, None]:
+    """
+    Returns the number of seconds Alpaca asked to wait before the next request, based on the Retry-After or
+    X-RateLimit-Reset response headers. Returns None if neither header was sent.
+    """
+    lowercase_headers = {name.lower(): value for name, value in headers.items()}
+
+    try:
+        if "retry-after" in lowercase_headers:
+            return max(0.0, float(lowercase_headers["retry-after"]))
+
+        if "x-ratelimit-reset" in lowercase_headers:
+            return max(0.0, float(lowercase_headers["x-ratelimit-reset"]) - time.time())
+    except ValueError:
+        pass
+
+    return None
+
+
 class AsyncAlpacaBars():
     """
     A custom Alpaca API client that supports asynchronous requests for getting historical market data bars.
+
+    Requests are made with aiohttp on an asyncio event loop that runs in a background thread for as long as
+    the client is used. Every API key pair gets its own session with a keep-alive connection pool, so
+    requests for all of the symbols (and all of their pages) reuse warm connections instead of paying for a
+    new TCP and TLS handshake every time. The loop, thread and sessions are created lazily and are not
+    pickled, so a client can be sent to (or inherited by) another process.
     """
 
     headers: dict[str, str]
     base_url: str
+    bar_cache: Union[BarCache, None]
+    scheduler: RequestScheduler
+    key_headers: list[dict[str, str]]
+    _loop: Union[asyncio.AbstractEventLoop, None]
+    _loop_thread: Union[threading.Thread, None]
+    _loop_pid: Union[int, None]
+    _sessions: list[aiohttp.ClientSession]
+    _loop_lock: threading.Lock
 
-    # TODO: Rewrite this to use asyncio and aiohttp when Python 3.11 comes out with the new asyncio.TaskGroup
-    # class
     # TODO: Move to using the newer Alpaca API (alpaca-py)
 
     def __init__(self, key_id: str, secret_id: str, base_url: str):
@@ -45,13 +88,38 @@ class AsyncAlpacaBars():
         # The base url is something like "https://data.alpaca.markets"
         self.base_url = base_url
 
+        # An optional on-disk cache of bars. When set, only the dates missing from the cache are requested
+        self.bar_cache = None
+
+        # Every page of bars is requested with one of the key pairs in self.key_headers, whichever the
+        # scheduler says has the most rate limit budget left. On its own, an instance only knows its own key
+        # pair, but AlpacaAPIBundle shares every key pair and one scheduler between all of its instances.
+        self.scheduler = RequestScheduler(1)
+        self.key_headers = [self.headers]
+
+        # The event loop and the sessions (one per key pair) are created the first time they are needed
+        self._reset_event_loop()
+        self._loop_lock = threading.Lock()
+
+    def __getstate__(self) -> dict:
+        # The event loop, its thread and the sessions belong to the process that created them
+        state = self.__dict__.copy()
+        for attribute in ("_loop", "_loop_thread", "_loop_pid", "_sessions", "_loop_lock"):
+            del state[attribute]
+        return state
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        self._reset_event_loop()
+        self._loop_lock = threading.Lock()
+
     async def get_bars(self, symbol: str, time_frame: TimeFrame, start_date: datetime, end_date: datetime,
                        output_dict: dict[str, pd.DataFrame], adjustment: str = 'all', limit: int = 10000):
         """
         Asynchronously performs one requests for historical bars from the Alpaca API.
         """
-        # Create an empty list to store all of the bars received from Alpaca
-        list_of_bars = []
+        # Every page is decoded straight into typed column arrays, which are turned into a dataframe at the end
+        bar_columns = BarColumnBuilder(initial_capacity=limit)
 
         # HTTPS GET request parameters
         params = {
@@ -59,7 +127,7 @@ class AsyncAlpacaBars():
             "start": start_date.isoformat(),
             "end": end_date.isoformat(),
             "timeframe": str(time_frame),
-            "limit": limit
+            "limit": str(limit)
         }
 
         # Alpaca does not let us request all the data at once, and instead forces us to request it in
@@ -67,26 +135,26 @@ class AsyncAlpacaBars():
         while True:
 
             # Get the data from Alpaca asynchronously
-            response = await asks.get(
-                f"https://data.alpaca.markets/v2/stocks/{symbol}/bars",
-                headers=self.headers,
-                params=params,
-                follow_redirects=False
-            )
+            status_code, body = await self._get_page(f"{self.base_url}/v2/stocks/{symbol}/bars", params)
 
-            # Response code 200 means success. If the data was received successfully, load it as a dictionary
-            if response.status_code == 200:
-                try:
-                    body_dict = json.loads(str(gzip.decompress(response.body), 'utf-8'))
-                except gzip.BadGzipFile:
+            # Response code 200 means success. If the data was received successfully, add its bars to the
+            # columns and extract the token ID for the next data 'page'.
+            if status_code == 200:
+
+                # Alpaca sends an empty body when it has no data at all. A page with "bars": null decodes to
+                # no bars, like an empty list of bars does.
+                if not body.strip():
                     raise ValueError(
                         f"Alpaca does not have any data for {symbol} between {start_date} and {end_date}")
 
-            # Response code 500 means "internal error", retry with the same parameters
-            elif response.status_code == 500:
-                continue
+                try:
+                    next_page_token = bar_columns.append_page(body)
+                except pa.ArrowInvalid as exc:
+                    raise ValueError(
+                        f"Could not decode a page of bars for {symbol} between {start_date} and {end_date} from "
+                        f"Alpaca: {exc}") from exc
 
-            elif response.status_code == 400 and len(list_of_bars) >= limit:
+            elif status_code == 400 and bar_columns.num_rows >= limit:
                 raise OverflowError(
                     "Hit the limit of 10,000 rows in a single request from alpaca. To get around this, "
                     "consider making your data buffer size smaller. This will break up the request into "
@@ -95,45 +163,110 @@ class AsyncAlpacaBars():
             # Something went wrong and we can't recover. Raise an error.
             else:
                 raise ConnectionError(
-                    f"Bad response from Alpaca with response code: {response.status_code}")
-
-            # Add the bars from the latest Alpaca request to the list of all the bars
-            list_of_bars.extend(body_dict['bars'])
-
-            # Extract the token ID for the next data 'page' from the parsed body of the HTTPS response.
-            next_page_token = body_dict['next_page_token']
+                    f"Bad response from Alpaca with response code: {status_code}")
 
             # If there is a next_page_token, add it as an HTTPS parameter for the next request.
             if next_page_token:
-                params['next_page_token'] = next_page_token
+                params['page_token'] = next_page_token
 
             # Else, there is no more data to request.
             else:
                 break
 
-        # Put the data into a dataframe
-        df = pd.DataFrame(list_of_bars)
+        # Add the bars to the output_dict as a dataframe
+        output_dict[symbol] = bar_columns.to_dataframe()
+
+    async def _get_page(self, url: str, params: dict[str, str]) -> tuple[int, bytes]:
+        """
+        Requests one page of data using whichever key pair has the most rate limit budget left and returns
+        the response code and body. Requests that are throttled (429) are retried right away with a
+        different key pair if one has budget, and requests that hit a server error (5xx) are retried after an
+        exponential backoff.
+        """
+        for attempt in range(self.scheduler.max_retries + 1):
+            key_index = await self._acquire_key()
+
+            async with self._sessions[key_index].get(url, params=params, allow_redirects=False) as response:
+                status_code = response.status
+                body = await response.read()
+                retry_after = _get_retry_after(dict(response.headers))
+
+            if status_code not in RETRYABLE_STATUS_CODES:
+                return status_code, body
+
+            self.scheduler.record_failure(key_index, status_code, retry_after)
+
+            # The scheduler already holds back throttled key pairs, so only back off on server errors
+            if status_code != 429:
+                await asyncio.sleep(get_backoff_delay(attempt))
+
+        raise ConnectionError(
+            f"Bad response from Alpaca with response code: {status_code} after "
+            f"{self.scheduler.max_retries + 1} attempts")
+
+    async def _acquire_key(self) -> int:
+        """
+        Waits until one of the key pairs has rate limit budget left and returns its index.
+        """
+        while True:
+            key_index, wait_time = self.scheduler.try_acquire()
+
+            if key_index is not None:
+                return key_index
 
-        # Add the dataframe to the output_dict
-        output_dict[symbol] = df
+            await asyncio.sleep(wait_time)
 
     def get_bulk_bars(self, symbols: list[str], time_frame: TimeFrame, start_date: date, end_date: date,
                       adjustment: str = 'all', limit: int = 10000) -> dict[str, pd.DataFrame]:
         """
         Gets bar data for all of the ``symbols`` using the provided arguments such as``time_frame`` and
-        ``start_date``.
+        ``start_date``. If this instance has a bar cache, cached dates are read from disk and only the missing
+        dates are requested from Alpaca.
+        """
+        if self.bar_cache is not None:
+            return self.bar_cache.get_bulk_bars(
+                self._download_bulk_bars, symbols, time_frame, start_date, end_date, adjustment, limit)
+
+        return self._download_bulk_bars(symbols, time_frame, start_date, end_date, adjustment, limit)
+
+    def close(self):
+        """
+        Closes the sessions and stops the background event loop, if they were started. They are started
+        again the next time data is requested.
+        """
+        with self._loop_lock:
+            if self._loop is None or self._loop_pid != os.getpid():
+                self._reset_event_loop()
+                return
+
+            asyncio.run_coroutine_threadsafe(self._close_sessions(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop_thread.join()  # type: ignore
+            self._loop.close()
+
+            self._reset_event_loop()
+
+    def _download_bulk_bars(self, symbols: list[str], time_frame: TimeFrame, start_date: date,
+                            end_date: date, adjustment: str = 'all',
+                            limit: int = 10000) -> dict[str, pd.DataFrame]:
+        """
+        Downloads bar data for all of the ``symbols`` from Alpaca, skipping the bar cache. This can be called
+        from several threads at once, all of the requests share the same event loop and connection pools.
         """
         output_dict = {}
 
-        trio.run(
-            self._async_get_bulk_bars,
-            symbols,
-            time_frame,
-            start_date,
-            end_date,
-            output_dict,
-            adjustment,
-            limit)
+        loop = self._get_event_loop()
+
+        asyncio.run_coroutine_threadsafe(
+            self._async_get_bulk_bars(
+                symbols,
+                time_frame,
+                start_date,
+                end_date,
+                output_dict,
+                adjustment,
+                limit),
+            loop).result()
 
         return output_dict
 
@@ -144,17 +277,65 @@ class AsyncAlpacaBars():
         High-level coroutine that manages getting bar data for all symbols provided. Spawns one coroutine
         per symbol.
         """
-        async with trio.open_nursery() as n:
-            for symbol in symbols:
-                n.start_soon(
-                    self.get_bars,
-                    symbol,
-                    time_frame,
-                    start_date,
-                    end_date,
-                    output_dict,
-                    adjustment,
-                    limit)
+        await asyncio.gather(*(
+            self.get_bars(
+                symbol,
+                time_frame,
+                start_date,
+                end_date,
+                output_dict,
+                adjustment,
+                limit)
+            for symbol in symbols))
+
+    def _get_event_loop(self) -> asyncio.AbstractEventLoop:
+        """
+        Returns the background event loop, starting it (and creating the sessions) if it isn't running in
+        this process yet.
+        """
+        with self._loop_lock:
+            # A process that was forked from the one that started the loop inherits the loop, but not the
+            # thread running it
+            if self._loop is None or self._loop_pid != os.getpid():
+                self._loop = asyncio.new_event_loop()
+                self._loop_thread = threading.Thread(
+                    name="Alpaca Bars Event Loop", target=self._loop.run_forever, daemon=True)
+                self._loop_thread.start()
+                self._loop_pid = os.getpid()
+
+                self._sessions = asyncio.run_coroutine_threadsafe(
+                    self._create_sessions(), self._loop).result()
+
+            return self._loop
+
+    async def _create_sessions(self) -> list[aiohttp.ClientSession]:
+        """
+        Creates one session, with its own keep-alive connection pool, for every key pair.
+        """
+        return [
+            aiohttp.ClientSession(
+                headers=headers,
+                connector=aiohttp.TCPConnector(
+                    limit=MAX_CONNECTIONS_PER_KEY, keepalive_timeout=KEEPALIVE_TIMEOUT),
+                timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT))
+            for headers in self.key_headers
+        ]
+
+    async def _close_sessions(self):
+        """
+        Closes every session, along with its connections.
+        """
+        for session in self._sessions:
+            await session.close()
+
+    def _reset_event_loop(self):
+        """
+        Forgets the event loop and sessions, so that they are created again when they are needed next.
+        """
+        self._loop = None
+        self._loop_thread = None
+        self._loop_pid = None
+        self._sessions = []
 
 
 class AlpacaAPIBundle():
@@ -168,9 +349,11 @@ class AlpacaAPIBundle():
     _market_data_instances: list[REST]
     _crypto_instances: list[REST]
     _async_market_data_instances: list[AsyncAlpacaBars]
+    bar_cache: Union[BarCache, None]
+    bar_request_scheduler: RequestScheduler
     T = TypeVar('T')
 
-    def __init__(self):
+    def __init__(self, use_bar_cache: bool = True, bar_cache_dir: Union[str, None] = None):
         # Get the repo dir as a string
         repo_dir = self._get_repo_root_dir()
 
@@ -190,10 +373,27 @@ class AlpacaAPIBundle():
         self._async_market_data_instances = self._create_api_instances(
             AsyncAlpacaBars, MARKET_DATA_BASE_URL)
 
+        # Share one on-disk bar cache between all of the async bars instances. By default, the cache lives in
+        # the bar_cache folder at the root of the repo.
+        if use_bar_cache:
+            self.bar_cache = BarCache(bar_cache_dir or f"{repo_dir}{os.sep}bar_cache")
+        else:
+            self.bar_cache = None
+
         # Store the number of API instances there are in every instance list. The number of API instances
         # is equivalent to the number of API key pairs
         self._num_api_instances = len(self.alpaca_config["API_KEYS"])
 
+        # Share one request scheduler and every key pair between all of the async bars instances, so that each
+        # page of bars is requested with whichever key pair has rate limit budget left
+        self.bar_request_scheduler = RequestScheduler(self._num_api_instances)
+        key_headers = [async_instance.headers for async_instance in self._async_market_data_instances]
+
+        for async_instance in self._async_market_data_instances:
+            async_instance.bar_cache = self.bar_cache
+            async_instance.scheduler = self.bar_request_scheduler
+            async_instance.key_headers = key_headers
+
         # Create an index variable to track which instance within the API instance lists
         # should be used
         self._api_instance_index = 0
@@ -262,6 +462,35 @@ class AlpacaAPIBundle():
 
         return lru_instance
 
+    def get_bulk_bars(self, symbols: list[str], time_frame: TimeFrame, start_date: date,
+                      end_date: date) -> dict[str, pd.DataFrame]:
+        """
+        Gets bar data for all of the ``symbols``, spreading the requests across every API key pair.
+        """
+        # Every async bars instance can use every key pair, so always use the first one. That way only one
+        # event loop and one set of connection pools is ever started.
+        return self._async_market_data_instances[0].get_bulk_bars(symbols, time_frame, start_date, end_date)
+
+    def close(self):
+        """
+        Closes the connection pools of the async bars instances.
+        """
+        for async_instance in self._async_market_data_instances:
+            async_instance.close()
+
+    def get_rate_limit_utilization(self) -> list[KeyUtilization]:
+        """
+        Returns how much of the market data rate limit of every API key pair was used in the last minute.
+        """
+        return self.bar_request_scheduler.get_utilization()
+
+    @property
+    def num_api_key_pairs(self) -> int:
+        """
+        Returns the number of API key pairs loaded from alpaca_config.json.
+        """
+        return self._num_api_instances
+
     def _create_api_instances(self, api_class: Type[T], endpoint: str) -> list[T]:
         """
         Create a list of instances of ``api_class``, where each instance is authenticated using a different
@@ -1,18 +1,45 @@
 from __future__ import annotations
 
+import time
+import traceback
+from collections import deque
 from collections.abc import ItemsView
-from datetime import date, datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
 from enum import Enum
-from multiprocessing import Process, Queue
+from itertools import islice
+from multiprocessing import Pipe, Process, Semaphore
+from multiprocessing.connection import Connection
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Union
 
+import numpy as np
 import pandas as pd
 from alpaca_trade_api import TimeFrameUnit
-from dateutil.parser import isoparse
 
 from monte.api import AlpacaAPIBundle
-from monte.dates import (TradingDay, get_list_of_buffer_ranges,
-                         get_list_of_trading_days_in_range)
+from monte.bar_cache import RAW_BAR_COLUMNS
+from monte.bar_panel import BarAligner, BarPanel
+from monte.buffer_queue import BufferQueue
+from monte.clock import SimulationClock
+from monte.column import Column, OnlineColumn, OnlineState
+from monte.column_plan import ColumnPlan, PlannedColumn
+from monte.column_store import ColumnStore
+from monte.dates import TradingDayTable, get_list_of_buffer_ranges, get_trading_day_table_in_range, to_epoch_ns
 from monte.machine_settings import MachineSettings
+from monte.request_scheduler import get_backoff_delay
+from monte.shared_buffers import (SharedArraysDescriptor, SharedBufferDescriptor, allocate_arrays,
+                                  attach_arrays, attach_buffer, discard_arrays, free_segment, open_arrays,
+                                  publish_arrays, publish_buffer, release_segment)
+from monte.snapshot import MarketSnapshot
+
+NANOSECONDS_PER_DAY = 24 * 60 * 60 * 1_000_000_000
+
+# The number of times a buffer is requested from the data source before giving up
+MAX_DATA_REQUEST_ATTEMPTS = 5
+
+# How often (in seconds) the asset manager checks that an asset worker is still alive while waiting on it
+WORKER_CHECK_INTERVAL = 1.0
 
 
 class BaseColumns(Enum):
@@ -42,16 +69,25 @@ class DataDestination(Enum):
 
 class CommonAssetData:
     """
-    Stores the training and testing dataframes for the asset, as well as other data needed to update and
-    increment the dataframes.
+    Stores the training and testing data for the asset, as well as other data needed to update and
+    increment them.
+
+    The training and testing data are kept in column stores (preallocated, typed column arrays) so that adding
+    a row never copies the rows that came before it. The testing data is trimmed to
+    ``machine_settings.max_rows_in_test_df`` rows by moving the store's start cursor forward. ``training_df``
+    and ``testing_df`` are dataframes that are built from the stores on demand.
     """
 
     machine_settings: MachineSettings
     base_columns: list[str]
-    buffer: pd.DataFrame
-    training_df: pd.DataFrame
-    testing_df: pd.DataFrame
-    _finished_populating_start_buffer: bool
+    training_data: ColumnStore
+    testing_data: ColumnStore
+    _column_plan: ColumnPlan
+    _derived_column_window: int
+    _batch_columns: list[str]
+    _online_states: dict[str, OnlineState]
+    _held_values: dict[str, Any]
+    _num_rows_added: int
 
     # TODO: Reference counting
 
@@ -74,212 +110,522 @@ class CommonAssetData:
 
         # Create empty dataframes
         self.reset_main_dfs()
-        self.reset_buffer()
 
-        self._finished_populating_start_buffer = False
+    @property
+    def training_df(self) -> pd.DataFrame:
+        """
+        A dataframe of all of the training data.
+        """
+        return self.training_data.to_dataframe()
+
+    @property
+    def testing_df(self) -> pd.DataFrame:
+        """
+        A dataframe of all of the testing data.
+        """
+        return self.testing_data.to_dataframe()
 
     def price(self) -> float:
         """
         Returns the latest price contained in the testing data.
         """
-        return self.testing_df.iloc[-1].vwap
+        return self.testing_data.get_last_value(BaseColumns.VWAP.value)
 
     def timestamp(self) -> str:
         """
         Returns the latest timestamp contained in the testing data.
         """
-        return self.testing_df.iloc[-1].timestamp
+        return self.testing_data.get_last_value(BaseColumns.TIMESTAMP.value)
 
     def datetime(self) -> datetime:
         """
         Returns the latest datetime contained in the testing data.
         """
-        return self.testing_df.iloc[-1].datetime
+        return self.testing_data.get_last_value(BaseColumns.DATETIME.value)
+
+    @property
+    def finished_warmup(self) -> bool:
+        """
+        True once the warmup rows (see ``MachineSettings.calculate_warmup_rows()``) have been added.
+        """
+        return self._num_rows_added >= self.machine_settings.warmup_rows
 
     def reset_main_dfs(self):
         """
-        Creates a new, empty dataframe with all of the base columns and derived columns. The result is
-        stored in self.df.
+        Creates new, empty training and testing data stores with all of the base columns and derived columns.
         """
         columns = self.base_columns.copy()
         columns.extend(self.machine_settings.derived_columns.keys())
-        self.training_df = pd.DataFrame({}, columns=columns)
-        self.testing_df = pd.DataFrame({}, columns=columns)
 
-    def reset_buffer(self):
+        datetime_columns = [BaseColumns.DATETIME.value]
+        self.training_data = ColumnStore(columns, datetime_columns, self.machine_settings.time_zone)
+        self.testing_data = ColumnStore(columns, datetime_columns, self.machine_settings.time_zone)
+
+        # The derived columns are calculated in the order of the plan, and each one starts being calculated once
+        # this many rows have been added
+        self._column_plan = self.machine_settings.column_plan
+        self._num_rows_added = 0
+
+        # Derived columns only ever look at the last few rows of data, so they are calculated on a dataframe of
+        # just those rows instead of on all of the data. Online columns read their input from the store instead
+        # of from the dataframe, so their number of rows doesn't count.
+        self._derived_column_window = max(
+            [self.machine_settings.max_rows_in_test_df] +
+            [column_obj.num_rows_needed for column_obj in self.machine_settings.derived_columns.values()
+             if not isinstance(column_obj, OnlineColumn)])
+
+        self._batch_columns = self._get_batch_columns()
+
+        # Online columns keep a running state for this asset that every new row is fed into. Aliases share the
+        # state of the column they are an alias of.
+        self._online_states = {
+            step.title: step.column.create_state()
+            for step in self._column_plan
+            if isinstance(step.column, OnlineColumn)
+        }
+
+        # The last calculated value of every periodic column, which is held on the rows it isn't calculated on
+        self._held_values = {}
+
+    def checkpoint_online_columns(self) -> dict[str, OnlineState]:
         """
-        Creates a new, empty dataframe with only the base columns (NOT derived columns). The result is
-        stored in self.buffer.
+        Returns a copy of the running state of every online column, which can be passed to
+        ``restore_online_columns()`` later.
         """
-        self.buffer = pd.DataFrame({}, columns=self.base_columns)
+        return {column_title: state.checkpoint() for column_title, state in self._online_states.items()}
 
-    def increment_dataframe(self, data_destination: DataDestination):
+    def restore_online_columns(self, checkpoint: dict[str, OnlineState]):
         """
-        Performs all of the actions needed to increment the destination dataframe (indicated by
-        ``data_destination``) forward by one time_frame. This includes moving a row from the buffer
-        to the destination dataframe, trimming down the number of rows in the destination dataframe (if
-        needed), and adding data for all of the derived columns to the new row.
+        Replaces the running state of the online columns with the states in ``checkpoint``.
         """
-        # Grab a copy of the latest row from the buffer
-        latest_row = self.buffer.head(1)
+        if checkpoint.keys() != self._online_states.keys():
+            raise ValueError("The checkpoint does not hold a state for every online column.")
 
-        # Drop the top row of the buffer (the row we just copied)
-        self.buffer.drop(self.buffer.head(1).index, inplace=True)
+        self._online_states = {column_title: state.checkpoint() for column_title, state in checkpoint.items()}
 
-        # Depending on the data destination, choose a pd.DataFrame to write to
-        if data_destination is DataDestination.TRAINING_DATA:
-            self.training_df = pd.concat(objs=[self.training_df, latest_row], ignore_index=True)
-            destination_df = self.training_df
-        elif data_destination is DataDestination.TESTING_DATA:
-            self.testing_df = pd.concat(objs=[self.testing_df, latest_row], ignore_index=True)
-            destination_df = self.testing_df
-        else:
-            raise ValueError(
-                "Invalid data_destination. Must be a member of the DataDestination enum.")
+    def _update_online_column(self, column_title: str, input_value: Any) -> float:
+        """
+        Feeds the newest row's input value into an online column's running state and returns the column's new
+        value.
+        """
+        return self._online_states[column_title].update(input_value)
+
+    def _is_calculated_on_row(self, column_obj: Column,
+                              num_rows_added: Union[int, np.ndarray]) -> Union[bool, np.ndarray]:
+        """
+        Returns True if ``column_obj`` is calculated on the row that was added when ``num_rows_added`` rows had
+        been added (or an array of those, for an array of row counts). Periodic columns (see ``Column.period``)
+        count their periods from the first row of the simulation, which is the first row after the warmup rows.
+        """
+        if not column_obj.is_periodic:
+            return True
+
+        simulation_row = num_rows_added - self.machine_settings.warmup_rows - 1
+        return simulation_row % column_obj.period == column_obj.phase
+
+    def _hold_periodic_values(self, column_title: str, values: np.ndarray,
+                              calculated_rows: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the values of the periodic column ``column_title`` for a span of new rows, where every row it
+        isn't calculated on (where ``calculated_rows`` is False) holds the value of the last row it was
+        calculated on, along with a mask of the rows that have a value. Rows before the first calculated row of
+        the span hold the value held from before the span, if there is one.
+        """
+        last_calculated_rows = np.maximum.accumulate(np.where(calculated_rows, np.arange(len(values)), -1))
+        has_value = last_calculated_rows >= 0
+        held_values = values[np.maximum(last_calculated_rows, 0)]
+
+        if column_title in self._held_values:
+            held_values[~has_value] = self._held_values[column_title]
+            has_value[:] = True
+
+        if has_value.any():
+            self._held_values[column_title] = held_values[-1]
 
-        # If the dataframes have at least "start_buffer" amount of rows
-        if (self._finished_populating_start_buffer or self._count_unique_days_in_dataframes()
-                > self.machine_settings.start_buffer_days):
-            self._finished_populating_start_buffer = True
+        return held_values, has_value
 
-        # Keep removing the top row (oldest data) until the dataframe has been reduced to the maximum allowed
+    def _get_batch_columns(self) -> list[str]:
+        """
+        Returns the titles of the derived columns that can be calculated for a whole span of rows at once,
+        either with their batch implementations or, for online columns, by feeding the span into their running
+        state, in the order of the column plan. A column only qualifies if all of the derived columns it
+        depends on qualify too.
+        """
+        batch_columns = []
+        for step in self._column_plan:
+            has_batch_form = isinstance(step.column, OnlineColumn) or step.column.has_batch_func
+
+            if has_batch_form and all(dependency in batch_columns for dependency in step.dependencies):
+                batch_columns.append(step.title)
+
+        return batch_columns
+
+    def increment_dataframe(self, data_destination: DataDestination, latest_row: dict[str, Any],
+                            derived_column_values: Union[dict[str, np.ndarray], None] = None):
+        """
+        Performs all of the actions needed to increment the destination data (indicated by
+        ``data_destination``) forward by one time_frame. This includes adding ``latest_row`` (a row of the
+        buffer panel) to the destination data, trimming down the number of rows in the destination data (if
+        needed), and adding data for all of the derived columns to the new row.
+
+        If ``derived_column_values`` is given, the derived columns were already calculated somewhere else (by
+        an asset worker, see ``get_derived_column_values()``) and their values are copied in instead.
+        """
+        destination_data = self._get_destination_data(data_destination)
+
+        destination_data.append_row(latest_row)
+        self._num_rows_added += 1
+
+        # Remove the top rows (oldest data) until the testing data has been reduced to the maximum allowed
         # number of rows
-        while (data_destination is DataDestination.TESTING_DATA and
-                len(self.testing_df.index) > self.machine_settings.max_rows_in_test_df and
-                self._finished_populating_start_buffer):
+        num_extra_rows = len(self.testing_data) - self.machine_settings.max_rows_in_test_df
+        if (data_destination is DataDestination.TESTING_DATA and num_extra_rows > 0 and
+                self.finished_warmup):
 
-            # Drop the oldest row if it exceeds the configured length limit (machine_settings.max_rows_in_df)
-            self.testing_df.drop(self.testing_df.head(1).index, inplace=True)
+            self.testing_data.drop_first_rows(num_extra_rows)
 
-        # Calculate and add the values of all derived columns
-        for column_title, column_obj in self.machine_settings.derived_columns.items():
+        if derived_column_values is not None:
+            self._copy_derived_column_values(destination_data, derived_column_values)
+            return
 
-            if column_obj.dependencies_are_fulfilled(destination_df, self.machine_settings.derived_columns):
+        # Calculate and add the values of all derived columns, in the order of the column plan. The dataframe the
+        # derived columns are calculated on is only built once a column that isn't an online column needs it.
+        destination_df = None
+        for step in self._column_plan:
+            column_title = step.title
+            column_obj = step.column
+            is_calculated = self._is_calculated_on_row(column_obj, self._num_rows_added)
 
-                destination_df.at[destination_df.index[-1],
-                                  column_title] = column_obj(destination_df)
+            # Online columns feed every row into their state, even on the rows their value is held on
+            if isinstance(column_obj, OnlineColumn):
+                value = self._update_online_column(
+                    column_title, destination_data.get_last_value(column_obj.input_column))
 
-    def _switch_to_testing_data(self):
+            elif is_calculated and self._num_rows_added >= step.ready_row_count:
+                if destination_df is None:
+                    destination_df = destination_data.to_dataframe(
+                        last_n=self._derived_column_window, as_objects=True)
+
+                value = column_obj(destination_df)
+
+            elif is_calculated:
+                continue
+
+            # Periodic columns hold their last calculated value on the rows they aren't calculated on
+            if not is_calculated:
+                if column_title not in self._held_values:
+                    continue
+
+                value = self._held_values[column_title]
+
+            elif column_obj.is_periodic:
+                self._held_values[column_title] = value
+
+            # Aliases of the column get the same value
+            for title in step.all_titles:
+                destination_data.set_last_value(title, value)
+
+                # Later derived columns can depend on this one, so update the dataframe too
+                if destination_df is not None:
+                    destination_df.iat[-1, destination_df.columns.get_loc(title)] = value
+
+    def add_training_rows(self, rows: dict[str, np.ndarray],
+                          derived_column_values: Union[dict[str, np.ndarray], None] = None):
         """
-        Performs any actions needed to tansition to the testing phase of the data from the training phase.
-        This includes copying over a start buffer of data to the testing dataframe, as well as removing
-        start buffer data from the training dataframe.
+        Adds several rows of buffer panel data (as returned by ``BarPanel.get_rows()``) to the training data
+        at once. The training data ends up the same as if ``increment_dataframe()`` had been called once per
+        row, but the rows are appended in bulk and the derived columns are calculated in a single pass over
+        the new rows without building a dataframe for every row.
+
+        If ``derived_column_values`` is given, the derived columns of the new rows are copied in from it
+        instead of being calculated, like in ``increment_dataframe()``.
+        """
+        num_new_rows = len(rows[BaseColumns.DATETIME.value])
+        if num_new_rows == 0:
+            return
+
+        # The derived columns of the first new rows can look back on this many of the rows before them
+        num_previous_rows = min(len(self.training_data), self._derived_column_window - 1)
+        num_rows_added_before = self._num_rows_added
+
+        self.training_data.append_rows(rows)
+        self._num_rows_added += num_new_rows
+
+        if derived_column_values is not None:
+            self._copy_derived_column_values(self.training_data, derived_column_values)
+            return
+
+        if not len(self._column_plan):
+            return
+
+        first_position = len(self.training_data) - num_previous_rows - num_new_rows
+
+        # Columns with a batch form (see _get_batch_columns()) are calculated for all of the new rows at once
+        for column_title in self._batch_columns:
+            self._add_batch_column_values(column_title, first_position, num_previous_rows, num_rows_added_before)
+
+        row_steps = [step for step in self._column_plan if step.title not in self._batch_columns]
+        if not row_steps:
+            return
+
+        # The rest are calculated one row at a time. All of the windows they are calculated on are slices of
+        # one dataframe. Its values are kept in an array that every calculated value is written back into, so
+        # the slices for later rows (and later derived columns of the same row) see it right away.
+        values = self.training_data.get_object_values(last_n=num_previous_rows + num_new_rows)
+        all_rows_df = pd.DataFrame(values, columns=self.training_data.columns, dtype=object, copy=False)
+
+        column_indices = {
+            title: all_rows_df.columns.get_loc(title) for step in row_steps for title in step.all_titles}
+
+        for row_index in range(num_previous_rows, len(values)):
+            window_start = max(0, row_index + 1 - self._derived_column_window)
+            destination_df = all_rows_df.iloc[window_start:row_index + 1]
+            num_rows_added = num_rows_added_before + row_index - num_previous_rows + 1
+
+            for step in row_steps:
+                column_title = step.title
+                column_obj = step.column
+                is_calculated = self._is_calculated_on_row(column_obj, num_rows_added)
+
+                if isinstance(column_obj, OnlineColumn):
+                    input_values = self.training_data.get_column(column_obj.input_column)
+                    value = self._update_online_column(column_title, input_values[first_position + row_index])
+                elif is_calculated and num_rows_added >= step.ready_row_count:
+                    value = column_obj(destination_df)
+                elif is_calculated:
+                    continue
+
+                # Periodic columns hold their last calculated value on the rows they aren't calculated on
+                if not is_calculated:
+                    if column_title not in self._held_values:
+                        continue
+
+                    value = self._held_values[column_title]
+
+                elif column_obj.is_periodic:
+                    self._held_values[column_title] = value
+
+                # Aliases of the column get the same value
+                for title in step.all_titles:
+                    previous_dtype = self.training_data.get_column(title).dtype
+                    self.training_data.set_value(title, first_position + row_index, value)
+
+                    # Write the value back the way the store holds it. If the store had to widen the column's
+                    # type, the earlier values of the column change too.
+                    stored_values = self.training_data.get_column(title)[first_position:]
+                    column_index = column_indices[title]
+                    if stored_values.dtype != previous_dtype:
+                        values[:, column_index] = stored_values
+                    else:
+                        values[row_index:row_index + 1, column_index] = stored_values[row_index:row_index + 1]
+
+    def _add_batch_column_values(self, column_title: str, first_position: int, num_previous_rows: int,
+                                 num_rows_added_before: int):
         """
-        # Copy a start buffer's worth of data to the head of the testing_df
-        self.testing_df = self.training_df.tail(
-            int(self.machine_settings.get_rows_per_day() *
-                (self.machine_settings.start_buffer_days + 1)))
+        Calculates the values of the derived column ``column_title`` for every training row after the first
+        ``num_previous_rows`` rows from ``first_position`` on, using the column's batch implementation.
+        ``num_rows_added_before`` is the number of rows that had been added before those rows. Rows before the
+        column's ready row count are left empty, just like when they are calculated one at a time. The aliases of
+        the column get a copy of the new values.
+        """
+        step = next(step for step in self._column_plan if step.title == column_title)
+        first_new_position = first_position + num_previous_rows
 
-        self._remove_start_buffer_data_from_training_df()
+        self._calculate_batch_column_values(step, first_position, num_previous_rows, num_rows_added_before)
 
-    def _remove_start_buffer_data_from_training_df(self):
+        new_values = self.training_data.get_column(column_title)[first_new_position:]
+        for alias in step.aliases:
+            self.training_data.set_values(alias, first_new_position, new_values)
+
+    def _calculate_batch_column_values(self, step: PlannedColumn, first_position: int, num_previous_rows: int,
+                                       num_rows_added_before: int):
         """
-        Removes data with timestamps before the simulation start date.
+        Does the work of ``_add_batch_column_values()`` for the column of ``step`` itself.
+        """
+        column_title = step.title
+        column_obj = step.column
+        first_new_position = first_position + num_previous_rows
+
+        # Online columns only need the new rows' input values, which are fed into their state in order
+        if isinstance(column_obj, OnlineColumn):
+            input_values = self.training_data.get_column(column_obj.input_column)[first_new_position:]
+            online_values = np.array([self._update_online_column(column_title, input_value)
+                                      for input_value in input_values.tolist()], dtype=float)
+
+            if column_obj.is_periodic:
+                num_rows_added = num_rows_added_before + np.arange(1, len(online_values) + 1)
+                online_values, has_value = self._hold_periodic_values(
+                    column_title, online_values, self._is_calculated_on_row(column_obj, num_rows_added))
+                online_values[~has_value] = np.nan
+
+            self.training_data.set_values(column_title, first_new_position, online_values)
+            return
+
+        span_df = self.training_data.to_dataframe(last_n=len(self.training_data) - first_position)
+        batch_values = column_obj.call_batch(span_df)[num_previous_rows:]
+
+        # The number of rows that had been added by the time each new row was added
+        num_rows_added = num_rows_added_before + np.arange(1, len(batch_values) + 1)
+        ready_rows = num_rows_added >= step.ready_row_count
+
+        # Periodic columns are only kept on the rows they are calculated on, and every other row holds the last
+        # kept value. From here on, the rows that have a value count as ready.
+        if column_obj.is_periodic:
+            batch_values, ready_rows = self._hold_periodic_values(
+                column_title, batch_values, ready_rows & self._is_calculated_on_row(column_obj, num_rows_added))
+
+        # Writing NaN into the rows that aren't ready changes nothing, since new rows start out empty
+        if batch_values.dtype.kind == "f":
+            self.training_data.set_values(
+                column_title, first_new_position, np.where(ready_rows, batch_values, np.nan))
+        else:
+            for row_index in np.flatnonzero(ready_rows):
+                self.training_data.set_value(column_title, first_new_position + row_index, batch_values[row_index])
+
+    def get_derived_column_values(self, data_destination: DataDestination, num_rows: int) -> dict[str, np.ndarray]:
+        """
+        Returns a copy of the values of every derived column in the last ``num_rows`` rows of the destination
+        data, which can be passed to ``increment_dataframe()`` or ``add_training_rows()`` of another copy of
+        this asset's data to add the same rows there.
+        """
+        destination_data = self._get_destination_data(data_destination)
+
+        return {
+            column_title: destination_data.get_column(column_title, last_n=num_rows).copy()
+            for column_title in self.machine_settings.derived_columns
+        }
+
+    def _copy_derived_column_values(self, destination_data: ColumnStore,
+                                    derived_column_values: dict[str, np.ndarray]):
+        """
+        Writes ``derived_column_values`` (as returned by ``get_derived_column_values()``) into the last rows of
+        ``destination_data``.
         """
-        # Remove the start buffer data from the training_df
-        self.training_df = self.training_df.loc[
-            self.training_df['datetime'] > self.machine_settings.start_date]
+        for column_title, values in derived_column_values.items():
+            destination_data.set_values(column_title, len(destination_data) - len(values), values)
 
-    def _count_unique_days_in_dataframes(self) -> int:
+    def _get_destination_data(self, data_destination: DataDestination) -> ColumnStore:
         """
-        Counts the number of unique dates that occur between ``self.training_df`` and ``self.testing_df``.
-        This is used to determine how many unique days of data the dataframes contain compared to
-        ``self.machine_settings.start_buffer_days``.
+        Returns the column store that ``data_destination`` refers to.
         """
-        unique_days = set()
+        if data_destination is DataDestination.TRAINING_DATA:
+            return self.training_data
+        elif data_destination is DataDestination.TESTING_DATA:
+            return self.testing_data
+        else:
+            raise ValueError(
+                "Invalid data_destination. Must be a member of the DataDestination enum.")
 
-        # Add all of the dates from the training df to the set of unique days
-        for datetime in self.training_df.datetime:
-            unique_days.add(str(datetime.date()))
+    def _switch_to_testing_data(self):
+        """
+        Performs any actions needed to tansition to the testing phase of the data from the training phase.
+        This includes copying over a start buffer of data to the testing data, as well as removing
+        start buffer data from the training data.
+        """
+        # Copy a full testing dataframe's worth of data to the head of the testing data
+        self.testing_data = self.training_data.copy_tail(self.machine_settings.max_rows_in_test_df)
 
-        # Add all of the dates from the testing df to the set of unique days
-        for datetime in self.testing_df.datetime:
-            unique_days.add(str(datetime.date()))
+        self._remove_start_buffer_data_from_training_df()
 
-        return len(unique_days)
+    def _remove_start_buffer_data_from_training_df(self):
+        """
+        Removes data with timestamps before the simulation start date.
+        """
+        # Remove the start buffer data from the training data
+        self.training_data.drop_rows_through(BaseColumns.DATETIME.value, self.machine_settings.start_date)
 
 
 def _get_alpaca_data(
         machine_settings: MachineSettings, symbols: list[str],
         start_date: date, end_date: date) -> dict[str, pd.DataFrame]:
     """
-    Download Alpaca bars for all ``symbols`` between ``start_date`` and ``end_date``. Clean up the downloaded
-    data.
+    Get bars from the machine's data source (Alpaca by default) for all ``symbols`` between ``start_date``
+    and ``end_date``. Clean up the downloaded data.
     """
-    # Get one buffer's worth of data
-    while True:
+    # Get one buffer's worth of data. Failed requests are retried a limited number of times, backing off a
+    # little longer after each failure.
+    for attempt in range(MAX_DATA_REQUEST_ATTEMPTS):
         try:
-            buffer_data = machine_settings.alpaca_api.async_market_data_bars.get_bulk_bars(
+            buffer_data = machine_settings.data_source.get_bulk_bars(
                 symbols, machine_settings.time_frame, start_date, end_date)
             break
-        except:
-            print(f"Failed to get data from alpaca. Re-requesting data between {start_date}, "
+        except Exception:
+            if attempt == MAX_DATA_REQUEST_ATTEMPTS - 1:
+                raise
+
+            print(f"Failed to get data from the data source. Re-requesting data between {start_date}, "
                   f"and {end_date}.")
-            continue
+            time.sleep(get_backoff_delay(attempt, base_delay=1.0))
 
-    # Get a list of all the trading days during this date range
-    trading_days = get_list_of_trading_days_in_range(machine_settings, start_date, end_date)
+    # Get a table of all the trading days (and their market hours) during this date range
+    trading_day_table = get_trading_day_table_in_range(machine_settings, start_date, end_date)
 
-    # For each symbol and associated buffer that the Alpaca API returned
+    # Clean each symbol's buffer
     for symbol, buffer in buffer_data.items():
+        buffer_data[symbol] = _clean_bars(machine_settings, symbol, buffer, trading_day_table)
 
-        # Iterate over the rows
-        for index, row in buffer.iterrows():
-
-            # The date of the current row
-            row_datetime = isoparse(row.t)
-
-            # Flag variables
-            date_in_buffer_range = False
-
-            for trading_day in trading_days:
-
-                # Check that the date is a valid day where the market was open
-                if row_datetime.date() == trading_day.date:
-                    date_in_buffer_range = True
-
-                    # The current row should be dropped if its timestamp is outside the market hours for this
-                    # TradingDay, except if the TimeFrameUnit is a Day. The timestamp doesnt matter then.
-                    if (machine_settings.time_frame.unit != TimeFrameUnit.Day and (
-                            row_datetime < trading_day.open_time or row_datetime > trading_day.close_time)):
-                        buffer.drop(index, inplace=True)
-
-            # If the date of the row does not correspond to a valid TradingDay, drop it.
-            if not date_in_buffer_range:
-                buffer.drop(index, inplace=True)
-
-        # Reset the index to 'forget' about the dropped rows
-        buffer.reset_index(drop=True, inplace=True)
-
-        # Rename columns to more human-friendly names
-        buffer.rename(columns={
-            "t": BaseColumns.TIMESTAMP.value,  # timestamp
-            "o": BaseColumns.OPEN.value,  # open
-            "h": BaseColumns.HIGH.value,  # high
-            "l": BaseColumns.LOW.value,  # low
-            "c": BaseColumns.CLOSE.value,  # close
-            "v": BaseColumns.VOLUME.value,  # volume
-            "n": BaseColumns.TRADE_COUNT.value,  # trade_count
-            "vw": BaseColumns.VWAP.value,  # vwap
-        }, inplace=True)
-
-        # Add datetimes as a column
-        buffer.insert(loc=8, column=BaseColumns.DATETIME.value, value=-1)
-
-        # Populate datetime column
-        buffer[BaseColumns.DATETIME.value] = buffer.apply(
-            lambda row: isoparse(row.timestamp).astimezone(machine_settings.time_zone), axis=1)
+    return buffer_data
 
-        # Add symbol as a column
-        buffer.insert(loc=9, column=BaseColumns.SYMBOL.value, value=symbol)
 
-    # TODO: Verify all timestamps are the same across assets for a given row
+def _clean_bars(machine_settings: MachineSettings, symbol: str, bars: pd.DataFrame,
+                trading_day_table: TradingDayTable) -> pd.DataFrame:
+    """
+    Turns a dataframe of raw bars for one symbol into a buffer dataframe. Bars that are not on a trading day,
+    or that fall outside of market hours (unless the TimeFrameUnit is a Day), are removed. The columns are
+    renamed to human-friendly names and the datetime and symbol columns are added.
 
-    return buffer_data
+    Everything is done with vectorized operations: the timestamps are parsed once, each bar is matched to
+    its trading day with a binary search, and a single boolean mask filters the bars.
+    """
+    # Data sources return a dataframe without any columns when there are no bars
+    if bars.empty:
+        bars = pd.DataFrame({}, columns=RAW_BAR_COLUMNS)
+
+    # Parse all of the timestamps at once
+    timestamps = pd.to_datetime(bars["t"], utc=True)
+    bar_times = to_epoch_ns(timestamps)
+
+    # Find the trading day whose date matches each bar's (UTC) date
+    bar_dates = (bar_times // NANOSECONDS_PER_DAY).astype("datetime64[D]")
+    day_indices = np.searchsorted(trading_day_table.dates, bar_dates)
+    day_indices = np.minimum(day_indices, max(len(trading_day_table.dates) - 1, 0))
+
+    if len(trading_day_table.dates) == 0:
+        keep = np.zeros(len(bars), dtype=bool)
+    else:
+        # Drop bars whose date does not correspond to a valid TradingDay
+        keep = trading_day_table.dates[day_indices] == bar_dates
+
+        # Drop bars outside the market hours for their TradingDay, except if the TimeFrameUnit is a Day. The
+        # timestamp doesn't matter then.
+        if machine_settings.time_frame.unit != TimeFrameUnit.Day:
+            keep &= ((bar_times >= trading_day_table.open_times[day_indices]) &
+                     (bar_times <= trading_day_table.close_times[day_indices]))
+
+    kept_bars = bars.loc[keep]
+
+    # Format the timestamps the way Alpaca does (ISO-8601 in UTC), whether the data source sent them as strings
+    # or as datetimes
+    kept_timestamps = np.char.add(
+        np.datetime_as_string(bar_times[keep].view("datetime64[ns]"), unit="s"), "Z")
+
+    # Rename columns to more human-friendly names, then add the datetime and symbol columns
+    return pd.DataFrame({
+        BaseColumns.TIMESTAMP.value: kept_timestamps,
+        BaseColumns.OPEN.value: kept_bars["o"].to_numpy(),
+        BaseColumns.HIGH.value: kept_bars["h"].to_numpy(),
+        BaseColumns.LOW.value: kept_bars["l"].to_numpy(),
+        BaseColumns.CLOSE.value: kept_bars["c"].to_numpy(),
+        BaseColumns.VOLUME.value: kept_bars["v"].to_numpy(),
+        BaseColumns.TRADE_COUNT.value: kept_bars["n"].to_numpy(),
+        BaseColumns.VWAP.value: kept_bars["vw"].to_numpy(),
+        BaseColumns.DATETIME.value: pd.DatetimeIndex(timestamps.loc[keep]).tz_convert(machine_settings.time_zone),
+        BaseColumns.SYMBOL.value: symbol,
+    })
 
 
 def _get_alpaca_data_as_process(
-        output_queue: Queue,
+        output_queue: BufferQueue,
         machine_settings: MachineSettings, symbols: list[str],
         start_date: datetime, end_date: datetime):
     """
@@ -295,25 +641,426 @@ def _get_alpaca_data_as_process(
     buffer_ranges = get_list_of_buffer_ranges(
         machine_settings, machine_settings.data_buffer_days, start_date, end_date)
 
-    # Request each buffer's worth of data in a row
-    for buffer_range in buffer_ranges:
-        buffer_start_date = buffer_range[0]
-        buffer_end_date = buffer_range[1]
-        buffer_data = _get_alpaca_data(
-            machine_settings,
-            symbols,
-            buffer_start_date,
-            buffer_end_date)
-
-        # Put the current buffer data on the queue that connects to the main process with all of the
-        # algorithms and the asset_manager.
-        output_queue.put(buffer_data)
+    # Buffers are aligned onto the ticks of the simulation clock in the order they are delivered, so that missing
+    # bars can be forward-filled from the previous buffer
+    bar_aligner = BarAligner(machine_settings.missing_bar_policy)
+    clock = SimulationClock(machine_settings)
+
+    # Keep a window of buffer ranges in flight at once so that network latency overlaps with the simulation.
+    # The buffers still have to be delivered in chronological order, so they are always collected from the
+    # front of the window.
+    with ThreadPoolExecutor(max_workers=machine_settings.prefetch_window,
+                            thread_name_prefix="Buffer Prefetch") as executor:
+
+        remaining_buffer_ranges = iter(buffer_ranges)
+        buffers_in_flight = deque()
+
+        # Start requesting the first window of buffer ranges
+        for buffer_range in islice(remaining_buffer_ranges, machine_settings.prefetch_window):
+            buffers_in_flight.append(
+                (buffer_range, executor.submit(_get_alpaca_data, machine_settings, symbols, *buffer_range)))
+
+        while buffers_in_flight:
+            # Wait for the oldest buffer in the window
+            buffer_range, buffer_future = buffers_in_flight.popleft()
+            buffer_data = buffer_future.result()
+
+            # Slide the window forward before handing off the buffer, since putting it on the queue can block
+            next_buffer_range = next(remaining_buffer_ranges, None)
+            if next_buffer_range is not None:
+                buffers_in_flight.append(
+                    (next_buffer_range,
+                     executor.submit(_get_alpaca_data, machine_settings, symbols, *next_buffer_range)))
+
+            # Publish the current buffer data into shared memory and put its descriptor on the queue that
+            # connects to the main process with all of the algorithms and the asset_manager. Only the small
+            # descriptor gets pickled, the bars themselves are never copied through the queue. This blocks while
+            # the queue is over its byte budget, i.e. when the simulation has fallen behind.
+            descriptor = publish_buffer(bar_aligner.align(buffer_data, clock.get_ticks(*buffer_range)))
+
+            # The queue is closed if the simulation stopped early, in which case nothing will ever attach the
+            # buffer
+            if not output_queue.put(descriptor, descriptor.num_bytes):
+                discard_arrays(descriptor)
+                executor.shutdown(cancel_futures=True)
+                return
 
     # Put a flag/marker onto the end of the queue to let the asset_manager know that this process has
     # finished getting the bar data.
     output_queue.put("DONE")
 
 
+class AssetWorkerCommand(Enum):
+    """
+    An Enum holding the commands the asset manager sends to its asset workers.
+    """
+    SET_PANEL = 1
+    INCREMENT = 2
+    ADD_TRAINING_ROWS = 3
+    SWITCH_TO_TESTING_DATA = 4
+    REMOVE_START_BUFFER_DATA = 5
+    STOP = 6
+
+
+def _run_asset_worker_as_process(connection: Connection, command_ready: Any, reply_ready: Any,
+                                 descriptor: SharedArraysDescriptor, machine_settings: MachineSettings,
+                                 symbols: list[str]):
+    """
+    This function is meant to be run as a mp.Process. Keeps a copy of the data of the assets in ``symbols`` (a
+    shard of the watched assets) and calculates their derived columns, following the commands the asset
+    manager sends (see ``AssetWorkerPool``).
+
+    The worker waits on ``command_ready`` and reads the command from its shared segment (described by
+    ``descriptor``). The arguments of every command but INCREMENT are sent over ``connection``. Once it is done,
+    the worker marks in the segment whether it sent a reply over ``connection`` and releases ``reply_ready``.
+    """
+    assets = {symbol: CommonAssetData(machine_settings, symbol) for symbol in symbols}
+    panel = None
+    attached_segments = []
+
+    worker_segment, worker_arrays = open_arrays(descriptor)
+    command_array = worker_arrays["command"]
+    sent_reply = worker_arrays["sent_reply"]
+
+    while True:
+        command_ready.acquire()
+        command = AssetWorkerCommand(int(command_array[0]))
+
+        if command is AssetWorkerCommand.INCREMENT:
+            argument = DataDestination(int(command_array[1]))
+        else:
+            argument = connection.recv()
+
+        try:
+            reply = None
+
+            if command is AssetWorkerCommand.SET_PANEL:
+                shm, panel = attach_buffer(argument)
+                attached_segments = [segment for segment in attached_segments if not release_segment(segment)]
+                attached_segments.append(shm)
+
+            elif command is AssetWorkerCommand.INCREMENT:
+                row_index = panel.advance()
+                for symbol, asset in assets.items():
+                    asset.increment_dataframe(argument, panel.get_row(row_index, symbol))
+
+                reply = _write_latest_derived_column_values(
+                    assets, argument, worker_arrays["latest_values"], worker_arrays["is_shared"])
+
+            elif command is AssetWorkerCommand.ADD_TRAINING_ROWS:
+                rows = panel.advance_rows(argument)
+                for symbol, asset in assets.items():
+                    asset.add_training_rows(panel.get_rows(rows, symbol))
+
+                reply = _publish_derived_column_values(assets, DataDestination.TRAINING_DATA, argument)
+
+            elif command is AssetWorkerCommand.SWITCH_TO_TESTING_DATA:
+                for asset in assets.values():
+                    asset._switch_to_testing_data()
+
+            elif command is AssetWorkerCommand.REMOVE_START_BUFFER_DATA:
+                for asset in assets.values():
+                    asset._remove_start_buffer_data_from_training_df()
+
+            result = (True, reply)
+
+        # Send the error back to the asset manager instead of dying silently, which would leave it waiting
+        except Exception:
+            result = (False, traceback.format_exc())
+
+        # The reply is only sent after reply_ready is released, since the asset manager doesn't read it before
+        # then and a big reply would otherwise fill up the pipe and block
+        sent_reply[0] = result != (True, None)
+        reply_ready.release()
+
+        if sent_reply[0]:
+            connection.send(result)
+
+        if command is AssetWorkerCommand.STOP:
+            break
+
+    for segment in attached_segments:
+        release_segment(segment)
+
+    command_array = sent_reply = worker_arrays = None
+    release_segment(worker_segment)
+
+
+def _write_latest_derived_column_values(assets: dict[str, CommonAssetData], data_destination: DataDestination,
+                                        latest_values: np.ndarray,
+                                        is_shared: np.ndarray) -> Union[dict[str, dict[str, np.ndarray]], None]:
+    """
+    Writes the derived column values of the last row of every asset into ``latest_values``, a (symbol x
+    column) array in the worker's shared segment that is reused on every row. Only columns that are float64
+    for every asset fit in it, and they are marked in ``is_shared``. The rest (like columns of Python objects)
+    are returned as a dictionary of symbols to dictionaries of column titles to values, to be pickled, or None
+    if there aren't any.
+    """
+    values_by_symbol = [asset.get_derived_column_values(data_destination, 1) for asset in assets.values()]
+
+    pickled_values = {}
+    for column_index, column_title in enumerate(next(iter(assets.values())).machine_settings.derived_columns):
+        column_values = [values[column_title] for values in values_by_symbol]
+        is_shared[column_index] = all(values.dtype == np.float64 for values in column_values)
+
+        if is_shared[column_index]:
+            latest_values[:, column_index] = np.concatenate(column_values)
+        else:
+            for symbol, values in zip(assets, column_values):
+                pickled_values.setdefault(symbol, {})[column_title] = values
+
+    return pickled_values or None
+
+
+def _publish_derived_column_values(assets: dict[str, CommonAssetData], data_destination: DataDestination,
+                                   num_rows: int) -> tuple[Union[SharedArraysDescriptor, None], dict]:
+    """
+    Collects the derived column values of the last ``num_rows`` rows of every asset. Columns with the same
+    numeric type for every asset are stacked into one (symbol x row) array each and published into a new shared
+    memory segment. The rest (like columns of Python objects) are returned as a dictionary of symbols to
+    dictionaries of column titles to values, to be pickled.
+    """
+    values_by_symbol = {
+        symbol: asset.get_derived_column_values(data_destination, num_rows) for symbol, asset in assets.items()}
+
+    shared_values = {}
+    pickled_values = {symbol: {} for symbol in assets}
+
+    for column_title in next(iter(values_by_symbol.values()), {}):
+        column_values = [values[column_title] for values in values_by_symbol.values()]
+        dtypes = {values.dtype for values in column_values}
+
+        if len(dtypes) == 1 and dtypes.pop() != object:
+            shared_values[column_title] = np.stack(column_values)
+        else:
+            for symbol, values in zip(assets, column_values):
+                pickled_values[symbol][column_title] = values
+
+    descriptor = publish_arrays(shared_values) if shared_values else None
+
+    return descriptor, pickled_values
+
+
+class AssetWorkerPool():
+    """
+    Splits the watched assets between ``machine_settings.num_asset_workers`` worker processes, each of which
+    keeps its own copy of its shard's data and calculates the shard's derived columns. The asset manager sends
+    every command to all of the workers before waiting on any of them, so the shards are worked on in
+    parallel.
+
+    Each worker gets the rows of its own symbols from every buffer panel, and sends back the derived column
+    values of the rows it added. The asset manager still adds the base columns of each row to its own copy of
+    the data and copies the derived column values in, so the algorithms keep reading the data in the main
+    process.
+
+    Incrementing happens on every row, so it avoids pickling and creating shared memory segments. Every worker
+    gets one shared segment when it starts, which holds the command it should run and the derived column
+    values of its latest row (see ``_write_latest_derived_column_values()``), and a pair of semaphores to
+    signal that a command or its reply is ready. Only the other commands, which run once per buffer or less,
+    send their arguments and replies over a pipe (see ``_publish_derived_column_values()``).
+    """
+
+    shards: list[list[str]]
+    processes: list[Process]
+    connections: list[Connection]
+    column_titles: list[str]
+    _command_semaphores: list[Any]
+    _reply_semaphores: list[Any]
+    _worker_segments: list[SharedMemory]
+    _worker_arrays: list[dict[str, np.ndarray]]
+    _panel: Union[BarPanel, None]
+    _attached_segments: list[SharedMemory]
+
+    def __init__(self, machine_settings: MachineSettings, symbols: list[str]):
+        num_workers = max(1, min(machine_settings.num_asset_workers, len(symbols)))
+        self.shards = [symbols[worker_index::num_workers] for worker_index in range(num_workers)]
+        self.column_titles = list(machine_settings.derived_columns)
+
+        self.processes = []
+        self.connections = []
+        self._command_semaphores = []
+        self._reply_semaphores = []
+        self._worker_segments = []
+        self._worker_arrays = []
+        for worker_index, shard in enumerate(self.shards):
+            connection, worker_connection = Pipe()
+            command_ready = Semaphore(0)
+            reply_ready = Semaphore(0)
+
+            worker_segment, descriptor, worker_arrays = allocate_arrays({
+                "command": ((2,), np.int64),
+                "sent_reply": ((1,), np.bool_),
+                "latest_values": ((len(shard), len(self.column_titles)), np.float64),
+                "is_shared": ((len(self.column_titles),), np.bool_),
+            })
+
+            process = Process(
+                name=f"Asset Worker {worker_index}",
+                target=_run_asset_worker_as_process,
+                args=(worker_connection, command_ready, reply_ready, descriptor, machine_settings, shard),
+                daemon=True)
+
+            process.start()
+            worker_connection.close()
+
+            self.processes.append(process)
+            self.connections.append(connection)
+            self._command_semaphores.append(command_ready)
+            self._reply_semaphores.append(reply_ready)
+            self._worker_segments.append(worker_segment)
+            self._worker_arrays.append(worker_arrays)
+
+        self._panel = None
+        self._attached_segments = []
+
+    def set_panel(self, panel: BarPanel):
+        """
+        Hands each worker the unread rows of its own symbols from ``panel``, unless it already has them.
+        """
+        if panel is self._panel:
+            return
+
+        self._panel = panel
+        self._run_command(AssetWorkerCommand.SET_PANEL,
+                          [publish_buffer(panel.select_symbols(shard)) for shard in self.shards])
+
+    def increment(self, data_destination: DataDestination) -> dict[str, dict[str, np.ndarray]]:
+        """
+        Has every worker add the next row of its panel to the destination data (indicated by
+        ``data_destination``) and returns the derived column values of the new row for every symbol.
+        """
+        replies = self._run_command(AssetWorkerCommand.INCREMENT, data_destination)
+
+        derived_column_values = {}
+        for shard, worker_arrays, pickled_values in zip(self.shards, self._worker_arrays, replies):
+            # The workers overwrite their latest values on the next row, so copy them out
+            latest_values = worker_arrays["latest_values"].copy()
+            shared_columns = [
+                (column_index, column_title) for column_index, column_title in enumerate(self.column_titles)
+                if worker_arrays["is_shared"][column_index]
+            ]
+
+            for symbol_index, symbol in enumerate(shard):
+                derived_column_values[symbol] = {
+                    column_title: latest_values[symbol_index, column_index:column_index + 1]
+                    for column_index, column_title in shared_columns
+                }
+
+                if pickled_values is not None:
+                    derived_column_values[symbol].update(pickled_values[symbol])
+
+        return derived_column_values
+
+    def add_training_rows(self, num_rows: int) -> dict[str, dict[str, np.ndarray]]:
+        """
+        Has every worker add the next ``num_rows`` rows of its panel to the training data and returns the
+        derived column values of the new rows for every symbol.
+        """
+        return self._collect_derived_column_values(
+            self._run_command(AssetWorkerCommand.ADD_TRAINING_ROWS, num_rows))
+
+    def switch_to_testing_data(self):
+        """
+        Has every worker switch its assets to the testing phase of the data.
+        """
+        self._run_command(AssetWorkerCommand.SWITCH_TO_TESTING_DATA)
+
+    def remove_start_buffer_data(self):
+        """
+        Has every worker remove the start buffer data from its assets' training data.
+        """
+        self._run_command(AssetWorkerCommand.REMOVE_START_BUFFER_DATA)
+
+    def stop(self):
+        """
+        Stops the worker processes and frees the shared memory segments that are left.
+        """
+        # A worker that died can't be told to stop, so the rest are stopped without waiting on them
+        try:
+            self._run_command(AssetWorkerCommand.STOP)
+        except (OSError, RuntimeError):
+            for process in self.processes:
+                process.terminate()
+
+        for process in self.processes:
+            process.join()
+
+        self._attached_segments = [
+            segment for segment in self._attached_segments if not release_segment(segment)]
+
+        self._worker_arrays = []
+        for worker_segment in self._worker_segments:
+            free_segment(worker_segment)
+
+        self._worker_segments = []
+
+    def _run_command(self, command: AssetWorkerCommand, arguments: Any = None) -> list[Any]:
+        """
+        Sends ``command`` to every worker and waits for all of their replies (None for workers that didn't send
+        one). ``arguments`` is either one argument for all of the workers or, for SET_PANEL, a list with one
+        argument per worker. Raises a RuntimeError if any worker failed or stopped.
+        """
+        if command is not AssetWorkerCommand.SET_PANEL:
+            arguments = [arguments] * len(self.connections)
+
+        for connection, command_ready, worker_arrays, argument in zip(
+                self.connections, self._command_semaphores, self._worker_arrays, arguments):
+
+            worker_arrays["command"][0] = command.value
+            if command is AssetWorkerCommand.INCREMENT:
+                worker_arrays["command"][1] = argument.value
+            else:
+                connection.send(argument)
+
+            command_ready.release()
+
+        replies = []
+        for process, connection, reply_ready, worker_arrays in zip(
+                self.processes, self.connections, self._reply_semaphores, self._worker_arrays):
+
+            # Check on the worker every once in a while, since a worker that died would never reply
+            while not reply_ready.acquire(timeout=WORKER_CHECK_INTERVAL):
+                if not process.is_alive():
+                    raise RuntimeError(f"{process.name} stopped while running {command.name}")
+
+            if not worker_arrays["sent_reply"][0]:
+                replies.append(None)
+                continue
+
+            succeeded, reply = connection.recv()
+
+            if not succeeded:
+                raise RuntimeError(f"{process.name} failed while running {command.name}:\n{reply}")
+
+            replies.append(reply)
+
+        return replies
+
+    def _collect_derived_column_values(self, replies: list[Any]) -> dict[str, dict[str, np.ndarray]]:
+        """
+        Turns the replies of the workers (see ``_publish_derived_column_values()``) into a dictionary of
+        symbols to dictionaries of column titles to values.
+        """
+        # The values of the previous replies have been copied out by now, so their segments can usually be freed
+        self._attached_segments = [
+            segment for segment in self._attached_segments if not release_segment(segment)]
+
+        derived_column_values = {}
+
+        for shard, (descriptor, pickled_values) in zip(self.shards, replies):
+            shared_values = {}
+            if descriptor is not None:
+                shm, shared_values = attach_arrays(descriptor)
+                self._attached_segments.append(shm)
+
+            for symbol_index, symbol in enumerate(shard):
+                derived_column_values[symbol] = {
+                    column_title: values[symbol_index] for column_title, values in shared_values.items()}
+                derived_column_values[symbol].update(pickled_values[symbol])
+
+        return derived_column_values
+
+
 class AssetManager:
     """
     Manages all Assets while the simulation is running. Handles getting the data, cleaning it, and moving it
@@ -322,11 +1069,17 @@ class AssetManager:
 
     machine_settings: MachineSettings
     watched_assets: dict[str, CommonAssetData]
-    data_getter_process: Process
-    buffered_df_queue: Queue
+    data_getter_process: Union[Process, None]
+    buffered_df_queue: BufferQueue
     simulation_running: bool
     data_destination: DataDestination
-    testing_df_threshold: TradingDay
+    testing_threshold_row: int
+    buffer_panel: Union[BarPanel, None]
+    clock: SimulationClock
+    asset_workers: Union[AssetWorkerPool, None]
+    snapshot: Union[MarketSnapshot, None]
+    _testing_df_threshold_ns: int
+    _attached_segments: list[SharedMemory]
 
     def __init__(self, machine_settings: MachineSettings):
         self.machine_settings = machine_settings
@@ -334,12 +1087,27 @@ class AssetManager:
         self.watched_assets = {}  # Dict of Assets
         self.simulation_running = False
 
-        self._reference_symbol = "SPY"
-        self.watch_asset(self._reference_symbol)
+        # Keeps track of the simulation's ticks, so that the simulation runs whether or not any assets are watched
+        self.clock = SimulationClock(machine_settings)
+
+        self.buffered_df_queue = BufferQueue(machine_settings.max_queued_buffer_bytes)
+        self._attached_segments = []
+
+        # Started in startup()
+        self.data_getter_process = None
+
+        # The upcoming rows of every watched asset, aligned to one time index
+        self.buffer_panel = None
 
-        self.buffered_df_queue = Queue()
+        # Only started if the watched assets are split between worker processes
+        self.asset_workers = None
 
-        self.testing_df_threshold = self.threshold_date_to_start_using_testing_df()
+        # The testing data of the latest tick, frozen once per tick of the testing phase (see take_snapshot())
+        self.snapshot = None
+
+        # The time of the threshold row in nanoseconds since the epoch, so that the threshold can be checked
+        # with a single integer comparison
+        self.testing_threshold_row, self._testing_df_threshold_ns = self.calculate_testing_threshold()
 
     def startup(self):
         """
@@ -355,6 +1123,10 @@ class AssetManager:
 
         self.simulation_running = True
 
+        # The derived columns of the watched assets are calculated in worker processes if there is more than one
+        if self.machine_settings.num_asset_workers > 1:
+            self.asset_workers = AssetWorkerPool(self.machine_settings, list(self.watched_assets.keys()))
+
         self.data_getter_process = Process(
             name="Working Data Getter",
             target=_get_alpaca_data_as_process,
@@ -372,9 +1144,28 @@ class AssetManager:
 
     def cleanup(self):
         """
-        Runs at the end of the simulation and performs cleanup tasks.
+        Runs at the end of the simulation (or when it stops early because of an error) and performs cleanup
+        tasks.
         """
-        self.data_getter_process.join()
+        # If the simulation stopped early, the data getter might still be waiting for room on the queue.
+        # Closing the queue wakes it up and makes it stop.
+        self.buffered_df_queue.close()
+        if self.data_getter_process is not None:
+            self.data_getter_process.join()
+
+        # Free the buffers that were never used, since nothing else will
+        for item in self.buffered_df_queue.drain():
+            if isinstance(item, SharedBufferDescriptor):
+                discard_arrays(item)
+
+        if self.asset_workers is not None:
+            self.asset_workers.stop()
+            self.asset_workers = None
+
+        # Release the shared memory segments of the last buffers. Segments that are still in use are freed
+        # when this process exits, since they have already been unlinked.
+        self._attached_segments = [
+            segment for segment in self._attached_segments if not release_segment(segment)]
 
     def get_training_df(self, symbol: str) -> pd.DataFrame:
         """
@@ -384,49 +1175,113 @@ class AssetManager:
 
     def get_testing_df(self, symbol: str) -> pd.DataFrame:
         """
-        Returns the testing dataframe for the provided symbol.
+        Returns the testing dataframe for the provided symbol. While a snapshot of the latest tick is held, the
+        dataframe comes from the snapshot.
         """
+        if self.snapshot is not None:
+            return self.snapshot.get_testing_df(symbol)
+
         return self.watched_assets[symbol].testing_df
 
+    def get_latest_row(self, symbol: str) -> pd.Series:
+        """
+        Returns the latest row of the testing dataframe for the provided symbol.
+        """
+        if self.snapshot is not None:
+            return self.snapshot.get_latest_row(symbol)
+
+        return self.get_testing_df(symbol).iloc[-1]
+
+    def get_price(self, symbol: str) -> float:
+        """
+        Returns the latest volume-weighted average price (vwap) of the provided symbol.
+        """
+        if self.snapshot is not None:
+            return self.snapshot.get_price(symbol)
+
+        return self.get_latest_row(symbol).vwap
+
+    def take_snapshot(self) -> MarketSnapshot:
+        """
+        Starts a MarketSnapshot of the testing data of every watched asset on the latest tick, which
+        ``get_testing_df()``, ``get_latest_row()`` and ``get_price()`` read from until the dataframes are
+        incremented again. The snapshot only builds an asset's data once it is asked for.
+        """
+        self.snapshot = MarketSnapshot(
+            self.clock.latest_time,
+            self.latest_datetime,
+            list(self.watched_assets.keys()),
+            lambda symbol: self.watched_assets[symbol].testing_df)
+
+        return self.snapshot
+
     def items(self) -> ItemsView[str, CommonAssetData]:
         """
         Returns an ItemsView instance for all of the assets being watched by the asset_manager.
         """
         return self.watched_assets.items()
 
-    def threshold_date_to_start_using_testing_df(self) -> TradingDay:
+    def calculate_testing_threshold(self) -> tuple[int, int]:
         """
-        Returns the TradingDay where the AssetManager should switch to the test data phase from the training
-        data phase.
+        Returns the row of the simulation (counting the ticks of the simulation clock from the start date) where
+        the AssetManager should switch to the test data phase from the training data phase, along with the
+        time of that row in nanoseconds since the epoch. The first ``training_data_percentage`` of the rows
+        are training data.
         """
-        # TODO: Make this threshold be in terms of rows instead of days
-        trading_days = get_list_of_trading_days_in_range(
-            self.machine_settings,
-            self.machine_settings.start_date,
-            self.machine_settings.end_date)
-
-        # An extra trading day must be added for off-by-one reasons
-        extra_trading_day = get_list_of_trading_days_in_range(
-            self.machine_settings,
-            self.machine_settings.end_date,
-            self.machine_settings.end_date + timedelta(days=30)
-        )[0]
-
-        trading_days.append(extra_trading_day)
+        ticks = self.clock.get_ticks(self.machine_settings.start_date, self.machine_settings.end_date)
+        threshold_row = int(self.machine_settings.training_data_percentage * len(ticks))
 
-        threshold_index = int(self.machine_settings.training_data_percentage *
-                              (len(trading_days) - 1))
+        # If every row is training data, the threshold is never reached
+        if threshold_row >= len(ticks):
+            return threshold_row, np.iinfo(np.int64).max
 
-        return trading_days[threshold_index]
+        return threshold_row, int(ticks[threshold_row])
 
     def increment_dataframes(self):
         """
         Increments the dataframes of all assets forward by one row/time_frame. Raises a StopIteration
         exception when complete.
         """
+        # The snapshot of the previous tick is out of date once the dataframes change
+        self.snapshot = None
+
+        self._fill_buffer_panel()
+
+        # If the top row of the buffer panel is at or after the threshold row, switch the data destination to be
+        # testing data
+        if (self.data_destination is DataDestination.TRAINING_DATA and
+                self.buffer_panel.peek_time() >= self._testing_df_threshold_ns):
+
+            self._switch_to_testing_data()
+
+        # Then, add the next row of buffered data to the watched assets (update the asset DFs)
+        self._increment_assets(self.buffer_panel)
+
+    def fast_forward_training_data(self):
+        """
+        Adds all of the remaining training data to the watched assets in bulk, one buffer at a time, instead of
+        one row at a time. Stops right before the first row of the testing data, so that the next call to
+        ``increment_dataframes()`` switches to the testing data. Raises a StopIteration exception if the data
+        runs out first.
+        """
+        while self.data_destination is DataDestination.TRAINING_DATA:
+            self._fill_buffer_panel()
+
+            num_training_rows = self.buffer_panel.count_rows_before(self._testing_df_threshold_ns)
+            if num_training_rows == 0:
+                return
+
+            self._add_training_rows(self.buffer_panel, num_training_rows)
+
+    def _fill_buffer_panel(self):
+        """
+        Makes sure the buffer panel has rows left to read. Raises a StopIteration exception when there is no
+        more data.
+        """
         try:
-            # If any asset's data buffer is empty, populate all assets with new data
-            if any(asset.buffer.empty for asset in self.watched_assets.values()):
+            # If the buffer panel is empty, populate it with new data for all assets. Buffers without any
+            # rows are skipped.
+            while self.buffer_panel is None or self.buffer_panel.empty:
                 self._populate_buffers()
 
         except StopIteration:
@@ -439,22 +1294,46 @@ class AssetManager:
                 for asset in self.watched_assets.values():
                     asset._remove_start_buffer_data_from_training_df()
 
+                if self.asset_workers is not None:
+                    self.asset_workers.remove_start_buffer_data()
+
             # Re-raise the StopItertion exception
             raise
 
-        # If the top row of the reference asset's buffer has a date that matches the testing_df_threshold
-        # date, switch the data destination to be testing data
-        latest_date_in_buffer = self.watched_assets[self._reference_symbol]\
-                                    .buffer.head(1).iloc[0].datetime.date()
+    def _increment_assets(self, panel: BarPanel):
+        """
+        Moves the cursor of ``panel`` forward by one row and adds that row to every watched asset.
+        """
+        # The asset workers calculate the derived columns of the row first
+        derived_column_values = {}
+        if self.asset_workers is not None:
+            self.asset_workers.set_panel(panel)
+            derived_column_values = self.asset_workers.increment(self.data_destination)
 
-        if (self.data_destination is DataDestination.TRAINING_DATA and
-                latest_date_in_buffer >= self.testing_df_threshold.date):
+        row_index = panel.advance()
+        self.clock.advance_to(panel.times[row_index])
 
-            self._switch_to_testing_data()
+        for symbol, asset in self.watched_assets.items():
+            asset.increment_dataframe(
+                self.data_destination, panel.get_row(row_index, symbol), derived_column_values.get(symbol))
 
-        # Then, add the next row of buffered data to the watched assets (update the asset DFs)
-        for asset in self.watched_assets.values():
-            asset.increment_dataframe(self.data_destination)
+    def _add_training_rows(self, panel: BarPanel, num_rows: int):
+        """
+        Moves the cursor of ``panel`` forward by ``num_rows`` rows and adds those rows to the training data of
+        every watched asset in bulk.
+        """
+        # The asset workers calculate the derived columns of the rows first
+        derived_column_values = {}
+        if self.asset_workers is not None:
+            self.asset_workers.set_panel(panel)
+            derived_column_values = self.asset_workers.add_training_rows(num_rows)
+
+        rows = panel.advance_rows(num_rows)
+        if num_rows:
+            self.clock.advance_to(panel.times[rows.stop - 1])
+
+        for symbol, asset in self.watched_assets.items():
+            asset.add_training_rows(panel.get_rows(rows, symbol), derived_column_values.get(symbol))
 
     def _populate_buffers(self):
         """
@@ -463,9 +1342,16 @@ class AssetManager:
         """
         new_data = self.buffered_df_queue.get()
 
-        if isinstance(new_data, dict):
-            for symbol, new_buffer in new_data.items():
-                self.watched_assets[symbol].buffer = new_buffer
+        if isinstance(new_data, SharedBufferDescriptor):
+            shm, self.buffer_panel = attach_buffer(new_data)
+
+            # The previous buffers have been replaced, so their segments can usually be freed now. Segments
+            # that still have views into them (i.e. rows that haven't been copied out yet) are kept around
+            # and released on a later call.
+            self._attached_segments = [
+                segment for segment in self._attached_segments if not release_segment(segment)]
+            self._attached_segments.append(shm)
+
         elif isinstance(new_data, str) and new_data == "DONE":
             raise StopIteration("Reached the end of simulation. No more trading days to run.")
         else:
@@ -480,26 +1366,23 @@ class AssetManager:
         for asset in self.watched_assets.values():
             asset._switch_to_testing_data()
 
+        if self.asset_workers is not None:
+            self.asset_workers.switch_to_testing_data()
+
     def add_start_buffer_data(self):
         """
-        Adds a start buffer's worth of data to the currently watched Assets at the current data_destination.
+        Adds the warmup rows (see ``MachineSettings.calculate_warmup_rows()``) from right before the start date
+        to the currently watched Assets at the current data_destination. Only the trading days those rows are
+        on are requested from the data source.
         """
-        # Go back and get a lot of trading days from before the start_date
-        trading_days_before_current = get_list_of_trading_days_in_range(
-            self.machine_settings,
-            (
-                self.machine_settings.start_date -
-                timedelta(days=self.machine_settings.start_buffer_days) -
-                timedelta(days=30)
-            ),
-            (
-                self.machine_settings.start_date -
-                timedelta(days=1)
-            ))
-
-        # Get a start and end date for the buffer that makes the buffer the correct size
-        buffer_start_date = trading_days_before_current[-self.machine_settings.start_buffer_days].date
-        buffer_end_date = trading_days_before_current[-1].date
+        # The exact ticks of the warmup rows, from the calendar
+        warmup_ticks = self.clock.get_ticks_before(
+            self.machine_settings.start_date, self.machine_settings.warmup_rows)
+
+        if len(warmup_ticks) == 0:
+            return
+
+        buffer_start_date, buffer_end_date = self.clock.get_tick_date_range(warmup_ticks)
 
         # Get the start buffer data
         start_buffer_data = _get_alpaca_data(
@@ -508,14 +1391,17 @@ class AssetManager:
             buffer_start_date,
             buffer_end_date)
 
-        # Add the start buffer data to the buffers of each asset and increment the asset's dataframes
-        # until its buffers are empty
-        for symbol, buffer_df in start_buffer_data.items():
+        # Align the start buffer data onto the warmup ticks and increment the assets' dataframes until all of it
+        # has been added
+        start_buffer_panel = BarAligner(self.machine_settings.missing_bar_policy).align(
+            start_buffer_data, warmup_ticks)
 
-            self.watched_assets[symbol].buffer = buffer_df
+        # The start buffer always goes into the training data, so it can be added in bulk
+        if self.machine_settings.fast_forward_training and self.data_destination is DataDestination.TRAINING_DATA:
+            self._add_training_rows(start_buffer_panel, len(start_buffer_panel))
 
-            while not self.watched_assets[symbol].buffer.empty:
-                self.watched_assets[symbol].increment_dataframe(self.data_destination)
+        while not start_buffer_panel.empty:
+            self._increment_assets(start_buffer_panel)
 
     def watch_asset(self, symbol: str):
         """
@@ -536,35 +1422,24 @@ class AssetManager:
 
     def unwatch_asset(self, symbol: str) -> bool:
         """
-        Removes a given asset from the AssetManager.
+        Removes a given asset from the AssetManager. Returns False if the asset wasn't being watched.
         """
         if self.is_watching_asset(symbol):
-            if symbol != self._reference_symbol:
-                self.watched_assets.pop(symbol)
-
-            # This still returns true so the user thinks the reference symbol has been removed
+            self.watched_assets.pop(symbol)
             return True
         else:
             return False
 
-    def _get_reference_asset(self) -> CommonAssetData:
-        """
-        Returns the reference asset, used to keep the AssetManager running even when there are no assets.
-        Also used to return the current timestamp and datetime.
-        """
-        # TODO: Get rid of reference asset
-        return self.watched_assets[self._reference_symbol]
-
     @property
     def latest_timestamp(self) -> str:
         """
         Returns the timestamp of the most recent time_frame.
         """
-        return self._get_reference_asset().timestamp()
+        return self.clock.latest_timestamp
 
     @property
     def latest_datetime(self) -> datetime:
         """
         Returns the datetime of the most recent time_frame.
         """
-        return self._get_reference_asset().datetime()
+        return self.clock.latest_datetime
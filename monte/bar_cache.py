@@ -0,0 +1,278 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+from collections.abc import Callable
+from datetime import date, datetime, timedelta
+from typing import Any, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from alpaca_trade_api import TimeFrame
+from pytz import timezone
+
+# The DST-aware timezone object for eastern time, which market open and close times are given in
+MARKET_TIME_ZONE = timezone("America/New_York")
+
+# Bump this whenever the layout of the cached partitions changes so that stale caches are ignored
+CACHE_VERSION = 3
+
+# The names of the columns in a raw bars dataframe, exactly as the Alpaca API returns them. The ``t`` column
+# holds UTC datetimes.
+RAW_BAR_COLUMNS = ["t", "o", "h", "l", "c", "v", "n", "vw"]
+
+# The file extension of the data partitions. Days that Alpaca sent back no bars for (weekends, holidays, etc.)
+# have no partition, the manifest records that they are covered instead.
+DATA_PARTITION_EXTENSION = ".parquet"
+
+# The name of the file in each key's directory that lists the date ranges the cache covers
+MANIFEST_FILE_NAME = "manifest.json"
+
+
+class BarCache():
+    """
+    A persistent, on-disk cache of raw Alpaca bars. The bars are stored as Parquet files keyed by
+    (symbol, time_frame, adjustment) and partitioned by date, so only the dates that are missing from the
+    cache ever need to be requested from Alpaca. Each key's manifest lists the date ranges that have been
+    requested, so days without any bars don't need a file of their own.
+
+    Only days before the current market date are cached, since the bars of today (and later) can still change.
+    Those days are requested again every time they are needed.
+    """
+
+    cache_dir: str
+    _manifest_lock: threading.Lock
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+
+        # Manifests are read, updated and written back, so threads writing the same key must take turns
+        self._manifest_lock = threading.Lock()
+
+    def get_bulk_bars(
+            self, download_func: Callable[..., dict[str, pd.DataFrame]], symbols: list[str],
+            time_frame: TimeFrame, start_date: Union[date, datetime], end_date: Union[date, datetime],
+            adjustment: str = 'all', limit: int = 10000) -> dict[str, pd.DataFrame]:
+        """
+        Returns raw bar data for all of the ``symbols`` between ``start_date`` and ``end_date`` (inclusive).
+        Any dates that are not in the cache yet are downloaded with ``download_func``, which must have the
+        same signature as ``AsyncAlpacaBars.get_bulk_bars()``, and written to the cache before returning.
+        Symbols that are missing from the downloaded data aren't cached, so their dates are requested again
+        next time.
+        """
+        start_date = as_date(start_date)
+        end_date = as_date(end_date)
+
+        # Figure out which contiguous date ranges are missing for each symbol, then group the symbols by
+        # missing range so that each range is only requested once for all of the symbols that need it.
+        symbols_by_gap: dict[tuple[date, date], list[str]] = {}
+        for symbol in symbols:
+            for gap in self._get_missing_ranges(symbol, time_frame, adjustment, start_date, end_date):
+                symbols_by_gap.setdefault(gap, []).append(symbol)
+
+        # Days up to and including the current market date aren't over yet, so they are only served, not cached
+        last_cacheable_date = datetime.now(MARKET_TIME_ZONE).date() - timedelta(days=1)
+        uncached_bars: dict[str, list[pd.DataFrame]] = {symbol: [] for symbol in symbols}
+
+        # Fill in the gaps
+        for (gap_start_date, gap_end_date), gap_symbols in symbols_by_gap.items():
+            downloaded_data = download_func(
+                gap_symbols, time_frame, gap_start_date, gap_end_date, adjustment, limit)
+
+            for symbol in gap_symbols:
+
+                # A symbol missing from the downloaded data doesn't mean that it has no bars on these dates
+                if symbol not in downloaded_data:
+                    continue
+
+                bars = downloaded_data[symbol]
+
+                if gap_start_date <= last_cacheable_date:
+                    self._write_partitions(
+                        symbol, time_frame, adjustment, gap_start_date, min(gap_end_date, last_cacheable_date),
+                        bars)
+
+                if gap_end_date > last_cacheable_date and not bars.empty:
+                    uncached_bars[symbol].append(
+                        bars[(_get_bar_dates(bars) > last_cacheable_date.isoformat()).to_numpy()])
+
+        # The cached days are served from disk, along with the days that couldn't be cached
+        return {
+            symbol: self._merge_bars(
+                [self._read_partitions(symbol, time_frame, adjustment, start_date, end_date)] +
+                uncached_bars[symbol])
+            for symbol in symbols
+        }
+
+    def _get_key_dir(self, symbol: str, time_frame: TimeFrame, adjustment: str) -> str:
+        """
+        Returns the directory that holds all of the date partitions for one (symbol, time_frame, adjustment)
+        key.
+        """
+        return os.path.join(
+            self.cache_dir, f"v{CACHE_VERSION}", symbol, f"{time_frame}_{adjustment}")
+
+    def _read_manifest(self, key_dir: str) -> list[tuple[date, date]]:
+        """
+        Returns the sorted, non-overlapping (start, end) date ranges (inclusive) that the cache covers for the
+        key in ``key_dir``.
+        """
+        path = os.path.join(key_dir, MANIFEST_FILE_NAME)
+        if not os.path.exists(path):
+            return []
+
+        with open(path, "r") as manifest_file:
+            manifest_dict = json.load(manifest_file)
+
+        return [(date.fromisoformat(start), date.fromisoformat(end)) for start, end in manifest_dict["ranges"]]
+
+    def _add_to_manifest(self, key_dir: str, start_date: date, end_date: date):
+        """
+        Records that the cache covers ``start_date`` to ``end_date`` (inclusive) for the key in ``key_dir``.
+        """
+        with self._manifest_lock:
+            ranges = _merge_ranges(self._read_manifest(key_dir) + [(start_date, end_date)])
+            manifest_dict = {"ranges": [[start.isoformat(), end.isoformat()] for start, end in ranges]}
+
+            path = os.path.join(key_dir, MANIFEST_FILE_NAME)
+            _atomic_write(path, lambda temp_path: _write_json(temp_path, manifest_dict))
+
+    def _get_missing_ranges(self, symbol: str, time_frame: TimeFrame, adjustment: str,
+                            start_date: date, end_date: date) -> list[tuple[date, date]]:
+        """
+        Returns a list of contiguous (start, end) date ranges between ``start_date`` and ``end_date`` that
+        the cache doesn't cover yet.
+        """
+        covered_ranges = self._read_manifest(self._get_key_dir(symbol, time_frame, adjustment))
+
+        missing_ranges = []
+        gap_start_date = start_date
+
+        for covered_start_date, covered_end_date in covered_ranges:
+            if covered_end_date < gap_start_date:
+                continue
+            if covered_start_date > end_date:
+                break
+
+            if covered_start_date > gap_start_date:
+                missing_ranges.append((gap_start_date, covered_start_date - timedelta(days=1)))
+
+            gap_start_date = covered_end_date + timedelta(days=1)
+
+        # Close out a gap that runs until the end of the requested range
+        if gap_start_date <= end_date:
+            missing_ranges.append((gap_start_date, end_date))
+
+        return missing_ranges
+
+    def _write_partitions(self, symbol: str, time_frame: TimeFrame, adjustment: str,
+                          start_date: date, end_date: date, bars: pd.DataFrame):
+        """
+        Splits ``bars`` into one partition per date, writes the partitions between ``start_date`` and
+        ``end_date`` and marks the whole range as covered. ``bars`` must be everything Alpaca sent back for the
+        symbol, since the dates in the range that it has no bars for are treated as empty for good.
+        """
+        key_dir = self._get_key_dir(symbol, time_frame, adjustment)
+        os.makedirs(key_dir, exist_ok=True)
+
+        if not bars.empty:
+            bar_dates = _get_bar_dates(bars)
+
+            for date_str, day_bars in bars.groupby(bar_dates, sort=False):
+                if not start_date.isoformat() <= date_str <= end_date.isoformat():
+                    continue
+
+                path = os.path.join(key_dir, date_str + DATA_PARTITION_EXTENSION)
+                table = pa.Table.from_pandas(day_bars.reset_index(drop=True), preserve_index=False)
+                _atomic_write(path, lambda temp_path: pq.write_table(table, temp_path))
+
+        # The manifest is only updated once every partition is in place, so the range is never covered early
+        self._add_to_manifest(key_dir, start_date, end_date)
+
+    def _merge_bars(self, bars_list: list[pd.DataFrame]) -> pd.DataFrame:
+        """
+        Combines several raw bars dataframes into one sorted by timestamp.
+        """
+        bars_list = [bars for bars in bars_list if not bars.empty]
+
+        if len(bars_list) <= 1:
+            return bars_list[0] if bars_list else pd.DataFrame({}, columns=RAW_BAR_COLUMNS)
+
+        df = pd.concat(bars_list, ignore_index=True)
+        df.sort_values("t", inplace=True, kind="stable")
+        df.reset_index(drop=True, inplace=True)
+
+        return df
+
+    def _read_partitions(self, symbol: str, time_frame: TimeFrame, adjustment: str,
+                         start_date: date, end_date: date) -> pd.DataFrame:
+        """
+        Reads all of the data partitions between ``start_date`` and ``end_date`` for one key and returns them
+        as a single raw bars dataframe sorted by timestamp.
+        """
+        key_dir = self._get_key_dir(symbol, time_frame, adjustment)
+        file_names = os.listdir(key_dir) if os.path.isdir(key_dir) else []
+
+        # ISO-8601 dates sort the same way as the dates themselves
+        paths = sorted(
+            os.path.join(key_dir, file_name) for file_name in file_names
+            if file_name.endswith(DATA_PARTITION_EXTENSION) and
+            start_date.isoformat() <= os.path.splitext(file_name)[0] <= end_date.isoformat())
+
+        if not paths:
+            return pd.DataFrame({}, columns=RAW_BAR_COLUMNS)
+
+        df = pq.read_table(paths).to_pandas()
+        df.sort_values("t", inplace=True, kind="stable")
+        df.reset_index(drop=True, inplace=True)
+
+        return df
+
+
+def as_date(value: Union[date, datetime]) -> date:
+    """
+    Returns ``value`` as a date, dropping the time (and timezone) if it is a datetime.
+    """
+    return value.date() if isinstance(value, datetime) else value
+
+
+def _merge_ranges(ranges: list[tuple[date, date]]) -> list[tuple[date, date]]:
+    """
+    Sorts (start, end) date ranges (inclusive) and merges the ones that overlap or touch.
+    """
+    merged_ranges = []
+
+    for start_date, end_date in sorted(ranges):
+        if merged_ranges and start_date <= merged_ranges[-1][1] + timedelta(days=1):
+            merged_ranges[-1] = (merged_ranges[-1][0], max(merged_ranges[-1][1], end_date))
+        else:
+            merged_ranges.append((start_date, end_date))
+
+    return merged_ranges
+
+
+def _get_bar_dates(bars: pd.DataFrame) -> pd.Series:
+    """
+    Returns the UTC date (as an ISO-8601 string) of every bar in a raw bars dataframe.
+    """
+    return pd.to_datetime(bars["t"], utc=True).dt.strftime("%Y-%m-%d")
+
+
+def _write_json(path: str, value: Any):
+    """
+    Writes ``value`` to a JSON file at ``path``.
+    """
+    with open(path, "w") as json_file:
+        json.dump(value, json_file)
+
+
+def _atomic_write(path: str, write_func: Callable[[str], None]):
+    """
+    Writes a file by calling ``write_func`` on a temporary path and then moving it into place, so that other
+    processes reading the cache never see a half-written partition.
+    """
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    write_func(temp_path)
+    os.replace(temp_path, path)
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import io
+from typing import Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.json as pa_json
+
+from monte.bar_cache import RAW_BAR_COLUMNS
+
+# The type of every column in a page of bars. Timestamps are parsed straight into nanoseconds since the epoch
+# (UTC). Volumes and trade counts are whole numbers, unless Alpaca sends one that isn't.
+BAR_COLUMN_TYPES = {
+    "t": pa.timestamp("ns", tz="UTC"),
+    "o": pa.float64(),
+    "h": pa.float64(),
+    "l": pa.float64(),
+    "c": pa.float64(),
+    "v": pa.int64(),
+    "n": pa.int64(),
+    "vw": pa.float64(),
+}
+
+# Page schemas, first with whole-number volumes and trade counts and then with fractional ones
+_PAGE_SCHEMAS = [
+    pa.schema([
+        ("bars", pa.list_(pa.struct(list(column_types.items())))),
+        ("next_page_token", pa.string()),
+    ])
+    for column_types in (
+        BAR_COLUMN_TYPES,
+        {**BAR_COLUMN_TYPES, "v": pa.float64(), "n": pa.float64()},
+    )
+]
+
+
+class BarColumnBuilder():
+    """
+    Decodes pages of bars from the Alpaca API straight into one growable, typed array per column, without
+    ever creating a Python object per bar. Pages are parsed with pyarrow's JSON reader, appended to the
+    arrays, and turned into a raw bars dataframe once every page has been received.
+    """
+
+    num_rows: int
+    _columns: dict[str, np.ndarray]
+
+    def __init__(self, initial_capacity: int = 10000):
+        self.num_rows = 0
+        self._columns = {
+            column_name: np.empty(initial_capacity, dtype=_get_numpy_dtype(column_type))
+            for column_name, column_type in BAR_COLUMN_TYPES.items()
+        }
+
+    def append_page(self, body: bytes) -> Union[str, None]:
+        """
+        Decodes the body of one page of bars and appends its bars to the columns. Returns the token for the
+        next page, or None if this was the last page.
+        """
+        page = _parse_page(body)
+
+        bars = page.column("bars").combine_chunks().values
+        num_new_rows = len(bars)
+
+        self._reserve(self.num_rows + num_new_rows)
+
+        for column_name in RAW_BAR_COLUMNS:
+            values = bars.field(column_name).to_numpy(zero_copy_only=False)
+            if column_name == "t":
+                values = values.view(np.int64)
+
+            column = self._columns[column_name]
+
+            # Switch the column to floats if a page had a fractional volume or trade count
+            if values.dtype != column.dtype:
+                column = column.astype(np.result_type(column.dtype, values.dtype))
+                self._columns[column_name] = column
+
+            column[self.num_rows:self.num_rows + num_new_rows] = values
+
+        self.num_rows += num_new_rows
+
+        return page.column("next_page_token")[0].as_py()
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        Returns every bar appended so far as a raw bars dataframe.
+        """
+        output_dict = {}
+        for column_name in RAW_BAR_COLUMNS:
+            values = self._columns[column_name][:self.num_rows]
+
+            if column_name == "t":
+                output_dict[column_name] = pd.DatetimeIndex(values.view("datetime64[ns]")).tz_localize("UTC")
+            else:
+                output_dict[column_name] = values
+
+        return pd.DataFrame(output_dict)
+
+    def _reserve(self, num_rows: int):
+        """
+        Grows every column so that it can hold at least ``num_rows`` rows. The capacity at least doubles each
+        time so that appending pages stays linear overall.
+        """
+        capacity = len(self._columns["t"])
+        if num_rows <= capacity:
+            return
+
+        new_capacity = max(num_rows, capacity * 2)
+        for column_name, column in self._columns.items():
+            new_column = np.empty(new_capacity, dtype=column.dtype)
+            new_column[:self.num_rows] = column[:self.num_rows]
+            self._columns[column_name] = new_column
+
+
+def _parse_page(body: bytes) -> pa.Table:
+    """
+    Parses the body of one page of bars into a single-row table, trying each of the page schemas in order.
+    """
+    for schema in _PAGE_SCHEMAS[:-1]:
+        try:
+            return _read_page(body, schema)
+        except pa.ArrowInvalid:
+            continue
+
+    return _read_page(body, _PAGE_SCHEMAS[-1])
+
+
+def _read_page(body: bytes, schema: pa.Schema) -> pa.Table:
+    """
+    Parses the body of one page of bars with an explicit schema. Fields that aren't in the schema (like the
+    symbol) are ignored.
+    """
+    return pa_json.read_json(
+        io.BytesIO(body),
+        read_options=pa_json.ReadOptions(block_size=max(len(body), 1 << 20) + 1),
+        parse_options=pa_json.ParseOptions(explicit_schema=schema, unexpected_field_behavior="ignore"))
+
+
+def _get_numpy_dtype(column_type: pa.DataType) -> np.dtype:
+    """
+    Returns the numpy dtype a column of ``column_type`` is stored as. Timestamps are stored as int64
+    nanoseconds.
+    """
+    if pa.types.is_timestamp(column_type):
+        return np.dtype(np.int64)
+
+    return np.dtype(column_type.to_pandas_dtype())
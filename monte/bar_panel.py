@@ -0,0 +1,270 @@
+from __future__ import annotations
+
+from functools import reduce
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from monte.dates import to_epoch_ns
+from monte.machine_settings import MissingBarPolicy
+
+# The fields of a panel, each of which is stored as one (time x symbol) array
+PANEL_FIELDS = ["open", "high", "low", "close", "volume", "trade_count", "vwap"]
+
+# Fields that are set to the previous close when a bar is forward-filled
+FORWARD_FILLED_PRICE_FIELDS = ["open", "high", "low", "close"]
+
+# Fields that are set to 0 when a bar is forward-filled, since nothing was traded
+FORWARD_FILLED_ZERO_FIELDS = ["volume", "trade_count"]
+
+
+class BarPanel():
+    """
+    One buffer's worth of bars for every watched symbol, aligned to a single sorted time index. Every field is
+    stored as a 2-D (time x symbol) array, so all of the symbols advance together by moving one read cursor.
+
+    ``times`` holds the bar times as nanoseconds since the epoch (UTC) and ``timestamps`` holds the same times
+    as ISO-8601 byte strings, the way Alpaca formats them.
+    """
+
+    symbols: list[str]
+    times: np.ndarray
+    timestamps: np.ndarray
+    fields: dict[str, np.ndarray]
+    symbol_indices: dict[str, int]
+    _cursor: int
+
+    def __init__(self, symbols: list[str], times: np.ndarray, timestamps: np.ndarray,
+                 fields: dict[str, np.ndarray]):
+        self.symbols = list(symbols)
+        self.times = times
+        self.timestamps = timestamps
+        self.fields = fields
+
+        self.symbol_indices = {symbol: index for index, symbol in enumerate(self.symbols)}
+        self._cursor = 0
+
+    def __len__(self) -> int:
+        return len(self.times) - self._cursor
+
+    @property
+    def num_rows(self) -> int:
+        """
+        The total number of rows in the panel, including rows that have already been read.
+        """
+        return len(self.times)
+
+    @property
+    def empty(self) -> bool:
+        """
+        True if every row in the panel has been read.
+        """
+        return self._cursor >= len(self.times)
+
+    def peek_time(self) -> int:
+        """
+        Returns the time of the next row (in nanoseconds since the epoch) without moving the cursor.
+        """
+        if self.empty:
+            raise IndexError("Cannot peek into an empty panel.")
+
+        return int(self.times[self._cursor])
+
+    def advance(self) -> int:
+        """
+        Moves the cursor past the next row and returns that row's index.
+        """
+        if self.empty:
+            raise IndexError("Cannot advance past the end of a panel.")
+
+        row_index = self._cursor
+        self._cursor += 1
+
+        return row_index
+
+    def count_rows_before(self, time_ns: int) -> int:
+        """
+        Returns the number of unread rows whose time is before ``time_ns`` (in nanoseconds since the epoch).
+        """
+        return int(np.searchsorted(self.times[self._cursor:], time_ns, side="left"))
+
+    def advance_rows(self, num_rows: int) -> slice:
+        """
+        Moves the cursor past the next ``num_rows`` rows and returns a slice of those rows.
+        """
+        if num_rows > len(self):
+            raise IndexError("Cannot advance past the end of a panel.")
+
+        rows = slice(self._cursor, self._cursor + num_rows)
+        self._cursor += num_rows
+
+        return rows
+
+    def select_symbols(self, symbols: list[str]) -> BarPanel:
+        """
+        Returns a new panel with the unread rows of only ``symbols``, in the order they are given.
+        """
+        symbol_indices = [self.symbol_indices[symbol] for symbol in symbols]
+        rows = slice(self._cursor, None)
+
+        return BarPanel(
+            symbols, self.times[rows], self.timestamps[rows],
+            {field: values[rows][:, symbol_indices] for field, values in self.fields.items()})
+
+    def get_row(self, row_index: int, symbol: str) -> dict[str, Any]:
+        """
+        Returns one symbol's bar at ``row_index`` as a dictionary of base column names to values. The datetime
+        is returned as nanoseconds since the epoch (UTC).
+        """
+        symbol_index = self.symbol_indices[symbol]
+
+        row = {field: values[row_index, symbol_index] for field, values in self.fields.items()}
+        row["timestamp"] = self.timestamps[row_index].decode()
+        row["datetime"] = self.times[row_index]
+        row["symbol"] = symbol
+
+        return row
+
+    def get_rows(self, rows: slice, symbol: str) -> dict[str, np.ndarray]:
+        """
+        Returns one symbol's bars in ``rows`` as a dictionary of base column names to arrays, with the same
+        values ``get_row()`` would return for each row.
+        """
+        symbol_index = self.symbol_indices[symbol]
+        times = self.times[rows]
+
+        columns = {field: values[rows, symbol_index] for field, values in self.fields.items()}
+        columns["timestamp"] = np.char.decode(self.timestamps[rows]).astype(object)
+        columns["datetime"] = times
+        columns["symbol"] = np.full(len(times), symbol, dtype=object)
+
+        return columns
+
+
+class BarAligner():
+    """
+    Aligns buffers of bars for several symbols onto the ticks of the simulation clock and turns them into
+    BarPanels. Ticks that a symbol has no bar for are handled according to ``policy``:
+
+    - ``FORWARD_FILL``: the open, high, low and close are set to the previous close, the vwap is set to the
+      previous vwap and the volume and trade count are set to 0. The previous values are carried over from the
+      buffers that were aligned before, so buffers must be aligned in chronological order.
+    - ``NAN``: every field of the missing bar is set to NaN.
+    - ``DROP``: ticks that any symbol is missing are dropped for every symbol.
+    """
+
+    policy: MissingBarPolicy
+    _previous_values: dict[str, dict[str, Any]]
+
+    def __init__(self, policy: MissingBarPolicy):
+        self.policy = policy
+
+        # The latest close and vwap of every symbol, used to forward-fill bars at the start of a buffer
+        self._previous_values = {}
+
+    def align(self, buffer_data: dict[str, pd.DataFrame], ticks: np.ndarray) -> BarPanel:
+        """
+        Aligns the cleaned buffer dataframes of every symbol in ``buffer_data`` onto ``ticks`` (the times of the
+        simulation clock during the buffer, see ``SimulationClock.get_ticks()``) and returns them as a panel.
+        Bars that aren't on a tick are left out.
+        """
+        symbols = list(buffer_data.keys())
+        symbol_times = [to_epoch_ns(buffer_data[symbol]["datetime"]) for symbol in symbols]
+
+        # Build the shared time index
+        if self.policy is MissingBarPolicy.DROP:
+            times = reduce(np.intersect1d, symbol_times, np.asarray(ticks, dtype=np.int64))
+        else:
+            times = np.asarray(ticks, dtype=np.int64)
+
+        num_rows = len(times)
+
+        # Find the row of the shared time index that every bar belongs to, along with which rows each symbol
+        # has a bar for
+        present = np.zeros((num_rows, len(symbols)), dtype=bool)
+        row_indices = []
+        bar_masks = []
+        for symbol_index, bar_times in enumerate(symbol_times):
+            bar_mask = np.isin(bar_times, times)
+            indices = np.searchsorted(times, bar_times[bar_mask])
+            present[indices, symbol_index] = True
+
+            row_indices.append(indices)
+            bar_masks.append(bar_mask)
+
+        has_missing_bars = not present.all()
+
+        fields = {}
+        for field in PANEL_FIELDS:
+            columns = [buffer_data[symbol][field].to_numpy() for symbol in symbols]
+
+            non_empty_columns = [column for column in columns if len(column)]
+            dtype = np.result_type(*non_empty_columns) if non_empty_columns else np.dtype(np.float64)
+
+            # Missing bars are filled with NaN, except for volumes and trade counts that are forward-filled
+            if has_missing_bars and (self.policy is MissingBarPolicy.NAN or
+                                     field not in FORWARD_FILLED_ZERO_FIELDS):
+                dtype = np.result_type(dtype, np.float64)
+
+            values = np.full((num_rows, len(symbols)), np.nan if dtype.kind == "f" else 0, dtype=dtype)
+            for symbol_index, column in enumerate(columns):
+                values[row_indices[symbol_index], symbol_index] = column[bar_masks[symbol_index]]
+
+            fields[field] = values
+
+        if has_missing_bars and self.policy is MissingBarPolicy.FORWARD_FILL:
+            self._forward_fill(symbols, fields, present)
+
+        self._remember_previous_values(symbols, fields, present)
+
+        timestamps = np.char.add(
+            np.datetime_as_string(times.view("datetime64[ns]"), unit="s"), "Z").astype(np.bytes_)
+
+        return BarPanel(symbols, times, timestamps, fields)
+
+    def _forward_fill(self, symbols: list[str], fields: dict[str, np.ndarray], present: np.ndarray):
+        """
+        Fills in the missing bars of every symbol with the symbol's previous close and vwap.
+        """
+        num_rows = len(present)
+
+        # For every row, the index of the latest row at or before it that has a bar (-1 if there isn't one)
+        latest_present_rows = np.maximum.accumulate(
+            np.where(present, np.arange(num_rows)[:, np.newaxis], -1), axis=0)
+
+        for symbol_index, symbol in enumerate(symbols):
+            missing = ~present[:, symbol_index]
+            if not missing.any():
+                continue
+
+            previous_values = self._previous_values.get(symbol, {})
+            source_rows = latest_present_rows[missing, symbol_index]
+            has_source = source_rows >= 0
+
+            previous_close = np.full(len(source_rows), previous_values.get("close", np.nan))
+            previous_close[has_source] = fields["close"][source_rows[has_source], symbol_index]
+
+            previous_vwap = np.full(len(source_rows), previous_values.get("vwap", np.nan))
+            previous_vwap[has_source] = fields["vwap"][source_rows[has_source], symbol_index]
+
+            for field in FORWARD_FILLED_PRICE_FIELDS:
+                fields[field][missing, symbol_index] = previous_close
+            fields["vwap"][missing, symbol_index] = previous_vwap
+
+            for field in FORWARD_FILLED_ZERO_FIELDS:
+                fields[field][missing, symbol_index] = 0
+
+    def _remember_previous_values(self, symbols: list[str], fields: dict[str, np.ndarray],
+                                  present: np.ndarray):
+        """
+        Stores the close and vwap of the last bar every symbol has, for forward-filling the next buffer.
+        """
+        for symbol_index, symbol in enumerate(symbols):
+            present_rows = np.flatnonzero(present[:, symbol_index])
+            if len(present_rows):
+                self._previous_values[symbol] = {
+                    "close": fields["close"][present_rows[-1], symbol_index],
+                    "vwap": fields["vwap"][present_rows[-1], symbol_index],
+                }
+
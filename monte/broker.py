@@ -24,7 +24,7 @@ class Asset():
         """
         DOC:
         """
-        return self.asset_manager.get_testing_df(self.symbol).iloc[-1].vwap
+        return self.asset_manager.get_price(self.symbol)
 
     @property
     def training_df(self) -> pd.DataFrame:
@@ -40,6 +40,13 @@ class Asset():
         """
         return self.asset_manager.get_testing_df(self.symbol)
 
+    @property
+    def latest_row(self) -> pd.Series:
+        """
+        Returns the latest row of the testing dataframe for the Asset this Position represents.
+        """
+        return self.asset_manager.get_latest_row(self.symbol)
+
 
 class Broker():
 
@@ -139,6 +146,13 @@ class Broker():
 
         return (was_order_successfully_cancelled, cancelled_order)
 
+    @property
+    def has_pending_orders(self) -> bool:
+        """
+        True if there are orders in the order queue waiting to be processed.
+        """
+        return len(self._order_queue) > 0
+
     def process_pending_orders(self) -> list[Order]:
         """
         Process orders that are currently in the order queue. Returns any orders that were attempted and
@@ -174,7 +188,7 @@ class Broker():
         """
         Attempts to execute a buy order.
         """
-        unit_price = self.asset_manager.get_testing_df(order.symbol).iloc[-1].vwap
+        unit_price = self.asset_manager.get_price(order.symbol)
         order_cost = unit_price * order.quantity
 
         # If the portfolio has insufficient funds to make the purchase, the order fails
@@ -213,6 +227,6 @@ class Broker():
             else:
                 self.portfolio.positions[order.symbol].quantity -= order.quantity
 
-                unit_price = self.asset_manager.get_testing_df(order.symbol).iloc[-1].vwap
+                unit_price = self.asset_manager.get_price(order.symbol)
                 self.portfolio.cash += unit_price * order.quantity
                 order.status = OrderStatus.COMPLETED
@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from multiprocessing import Condition, Queue, Value
+from typing import Any
+
+
+@dataclass
+class BufferQueueStats():
+    """
+    A snapshot of the counters kept by a BufferQueue. Times are in seconds.
+    """
+    max_bytes: int
+    bytes_queued: int
+    peak_bytes_queued: int
+    items_queued: int
+    num_puts: int
+    num_gets: int
+    put_wait_time: float
+    get_wait_time: float
+
+    @property
+    def fill_level(self) -> float:
+        """
+        The fraction of the byte budget that is currently in use.
+        """
+        return self.bytes_queued / self.max_bytes
+
+
+class BufferQueue():
+    """
+    A multiprocessing queue that is bounded by the number of bytes it holds instead of by the number of items.
+    When the queue is over its byte budget, ``put()`` blocks until the consumer has taken enough items off of
+    it. This keeps the data getter process from downloading far ahead of a slow simulation.
+
+    The number of bytes each item takes up is passed into ``put()`` by the producer. A single item that is
+    bigger than the whole budget is still let through once the queue is empty, so the queue can never
+    deadlock.
+
+    Must be created before the producer process is started, since it is shared through the process args.
+
+    The consumer can ``close()`` the queue when it stops early. Once the queue is closed, ``put()`` stops
+    blocking and turns items away, and the items that were never taken can be collected with ``drain()``.
+    """
+
+    max_bytes: int
+
+    def __init__(self, max_bytes: int):
+        if max_bytes < 1:
+            raise ValueError(
+                f"The byte budget of a BufferQueue must be at least 1. The current value is {max_bytes}")
+
+        self.max_bytes = max_bytes
+
+        self._queue = Queue()
+        self._condition = Condition()
+
+        # Counters shared between the producer and consumer. They are only changed while holding
+        # self._condition, so they don't need their own locks.
+        self._bytes_queued = Value("q", 0, lock=False)
+        self._peak_bytes_queued = Value("q", 0, lock=False)
+        self._items_queued = Value("q", 0, lock=False)
+        self._num_puts = Value("q", 0, lock=False)
+        self._num_gets = Value("q", 0, lock=False)
+        self._put_wait_time = Value("d", 0.0, lock=False)
+        self._get_wait_time = Value("d", 0.0, lock=False)
+        self._closed = Value("b", False, lock=False)
+
+    def put(self, item: Any, num_bytes: int = 0) -> bool:
+        """
+        Puts ``item`` on the queue, blocking while the queue doesn't have room for another ``num_bytes``
+        bytes. Returns False without putting ``item`` on the queue if the queue is closed, in which case the
+        producer is still responsible for ``item``.
+        """
+        wait_start_time = time.perf_counter()
+
+        with self._condition:
+            self._condition.wait_for(
+                lambda: (self._closed.value or self._items_queued.value == 0 or
+                         self._bytes_queued.value + num_bytes <= self.max_bytes))
+
+            if self._closed.value:
+                return False
+
+            self._bytes_queued.value += num_bytes
+            self._peak_bytes_queued.value = max(self._peak_bytes_queued.value, self._bytes_queued.value)
+            self._items_queued.value += 1
+            self._num_puts.value += 1
+            self._put_wait_time.value += time.perf_counter() - wait_start_time
+
+        self._queue.put((item, num_bytes))
+
+        return True
+
+    def get(self) -> Any:
+        """
+        Removes and returns the oldest item on the queue, blocking until there is one.
+        """
+        wait_start_time = time.perf_counter()
+
+        item, num_bytes = self._queue.get()
+
+        with self._condition:
+            self._bytes_queued.value -= num_bytes
+            self._items_queued.value -= 1
+            self._num_gets.value += 1
+            self._get_wait_time.value += time.perf_counter() - wait_start_time
+
+            # Wake up the producer if it is waiting for room
+            self._condition.notify_all()
+
+        return item
+
+    def close(self):
+        """
+        Stops the queue from taking any more items and wakes up the producer if it is waiting for room.
+        """
+        with self._condition:
+            self._closed.value = True
+            self._condition.notify_all()
+
+    def drain(self) -> list[Any]:
+        """
+        Removes and returns every item left on the queue. The queue must be closed and the producer must have
+        stopped, so that no more items can show up.
+        """
+        items = []
+        while self.get_stats().items_queued > 0:
+            items.append(self.get())
+
+        return items
+
+    def get_stats(self) -> BufferQueueStats:
+        """
+        Returns a snapshot of the fill level and wait time counters.
+        """
+        with self._condition:
+            return BufferQueueStats(
+                self.max_bytes,
+                self._bytes_queued.value,
+                self._peak_bytes_queued.value,
+                self._items_queued.value,
+                self._num_puts.value,
+                self._num_gets.value,
+                self._put_wait_time.value,
+                self._get_wait_time.value)
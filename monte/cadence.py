@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime
+from enum import Enum
+
+from monte.asset_manager import AssetManager
+
+
+class CrossingDirection(Enum):
+    """
+    An Enum holding the directions a column can cross a threshold in.
+    """
+    UP = 'up'
+    DOWN = 'down'
+    EITHER = 'either'
+
+
+@dataclass(frozen=True)
+class Tick():
+    """
+    Everything a cadence can look at to decide whether an algorithm runs on the current tick of the testing
+    phase.
+    """
+    index: int
+    datetime: datetime
+    is_session_open: bool
+    is_session_close: bool
+    asset_manager: AssetManager
+
+
+class Cadence(ABC):
+    """
+    Abstract base class for the cadences algorithms run on. An algorithm's cadence (see
+    ``Algorithm.get_cadence()``) decides on which ticks of the testing phase ``run_one_time_frame()`` is
+    called. On the other ticks, the algorithm isn't called at all, but its pending orders are still processed
+    and the processed orders are passed in on its next run.
+
+    Cadences are hashable, so algorithms with equal cadences are grouped and each cadence is only checked once
+    per tick no matter how many algorithms use it. Cadences can be combined with ``|``, which runs an algorithm
+    on the ticks that any of the cadences is due on.
+    """
+
+    # Cadences that depend on an algorithm's own orders set this, so that they are checked for every
+    # algorithm with processed orders instead of once for all algorithms
+    depends_on_orders: bool = False
+
+    @abstractmethod
+    def is_due(self, tick: Tick, has_processed_orders: bool) -> bool:
+        """
+        Returns True if an algorithm with this cadence runs on ``tick``. ``has_processed_orders`` is True if
+        the algorithm has processed orders that it hasn't been passed yet. It is always False for cadences that
+        don't depend on orders.
+        """
+        ...
+
+    def __or__(self, other: Cadence) -> AnyCadence:
+        if not isinstance(other, Cadence):
+            return NotImplemented
+
+        return AnyCadence((self, other))
+
+
+@dataclass(frozen=True)
+class EveryTimeFrame(Cadence):
+    """
+    Runs an algorithm on every tick. This is the default cadence.
+    """
+
+    def is_due(self, tick: Tick, has_processed_orders: bool) -> bool:
+        return True
+
+
+@dataclass(frozen=True)
+class EveryNTimeFrames(Cadence):
+    """
+    Runs an algorithm on every ``num_time_frames``-th tick of the testing phase, starting with tick number
+    ``offset`` (counting from 0).
+    """
+    num_time_frames: int
+    offset: int = 0
+
+    def __post_init__(self):
+        if self.num_time_frames < 1:
+            raise ValueError(
+                f"An algorithm must run at least once every 1 time frame. The current value is "
+                f"{self.num_time_frames}")
+
+        if not 0 <= self.offset < self.num_time_frames:
+            raise ValueError(
+                f"The offset must be at least 0 and less than the number of time frames. The current value is "
+                f"{self.offset}")
+
+    def is_due(self, tick: Tick, has_processed_orders: bool) -> bool:
+        return tick.index % self.num_time_frames == self.offset
+
+
+@dataclass(frozen=True)
+class SessionOpen(Cadence):
+    """
+    Runs an algorithm on the first tick of every trading day.
+    """
+
+    def is_due(self, tick: Tick, has_processed_orders: bool) -> bool:
+        return tick.is_session_open
+
+
+@dataclass(frozen=True)
+class SessionClose(Cadence):
+    """
+    Runs an algorithm on the last tick of every trading day.
+    """
+
+    def is_due(self, tick: Tick, has_processed_orders: bool) -> bool:
+        return tick.is_session_close
+
+
+@dataclass(frozen=True)
+class OnProcessedOrders(Cadence):
+    """
+    Runs an algorithm only on ticks where some of its orders were processed (completed or failed).
+    """
+    depends_on_orders = True
+
+    def is_due(self, tick: Tick, has_processed_orders: bool) -> bool:
+        return has_processed_orders
+
+
+@dataclass(frozen=True)
+class OnColumnCrossing(Cadence):
+    """
+    Runs an algorithm on ticks where the column ``column`` of ``symbol``'s testing data crosses ``threshold``
+    in ``direction``, i.e. where the previous value was on one side of the threshold and the latest value is on
+    (or at) the other. The symbol must be watched.
+    """
+    symbol: str
+    column: str
+    threshold: float
+    direction: CrossingDirection = CrossingDirection.EITHER
+
+    def __post_init__(self):
+        if not isinstance(self.direction, CrossingDirection):
+            raise TypeError("The direction must be a member of the CrossingDirection enum.")
+
+    def is_due(self, tick: Tick, has_processed_orders: bool) -> bool:
+        values = tick.asset_manager.watched_assets[self.symbol].testing_data.get_column(self.column, last_n=2)
+        if len(values) < 2:
+            return False
+
+        previous_value, latest_value = values
+
+        crossed_up = previous_value < self.threshold <= latest_value
+        crossed_down = previous_value > self.threshold >= latest_value
+
+        if self.direction is CrossingDirection.UP:
+            return bool(crossed_up)
+        elif self.direction is CrossingDirection.DOWN:
+            return bool(crossed_down)
+        else:
+            return bool(crossed_up or crossed_down)
+
+
+@dataclass(frozen=True)
+class AnyCadence(Cadence):
+    """
+    Runs an algorithm on the ticks that any of ``cadences`` is due on.
+    """
+    cadences: tuple[Cadence, ...]
+
+    @property
+    def depends_on_orders(self) -> bool:
+        return any(cadence.depends_on_orders for cadence in self.cadences)
+
+    def is_due(self, tick: Tick, has_processed_orders: bool) -> bool:
+        return any(cadence.is_due(tick, has_processed_orders) for cadence in self.cadences)
+
+    def __or__(self, other: Cadence) -> AnyCadence:
+        if not isinstance(other, Cadence):
+            return NotImplemented
+
+        return AnyCadence(self.cadences + (other,))
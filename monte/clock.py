@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import math
+from datetime import date, datetime
+from typing import Union
+
+import numpy as np
+import pandas as pd
+from alpaca_trade_api import TimeFrameUnit
+
+from monte.dates import MARKET_TIME_ZONE, get_trading_day_table_in_range, get_trading_days_before, to_epoch_ns
+from monte.machine_settings import MachineSettings
+
+NANOSECONDS_PER_MINUTE = 60 * 1_000_000_000
+NANOSECONDS_PER_HOUR = 60 * NANOSECONDS_PER_MINUTE
+NANOSECONDS_PER_DAY = 24 * NANOSECONDS_PER_HOUR
+
+
+class SimulationClock():
+    """
+    Owns the sequence of ticks (the times of the rows) of a simulation, which comes from the market calendar
+    instead of from the bars of any one asset. Intraday ticks are every multiple of the time frame from the
+    market open to the market close (inclusive) of each trading day, which is where the data source's bars
+    start. A daily tick is midnight (market time) of each trading day.
+
+    The clock also keeps track of the latest tick the simulation has reached.
+    """
+
+    machine_settings: MachineSettings
+    latest_time: Union[int, None]
+
+    def __init__(self, machine_settings: MachineSettings):
+        self.machine_settings = machine_settings
+
+        # Nanoseconds since the epoch (UTC), or None before the first tick
+        self.latest_time = None
+
+    def get_ticks(self, start_date: date, end_date: date) -> np.ndarray:
+        """
+        Returns the ticks between ``start_date`` and ``end_date`` (inclusive) as a sorted int64 array of
+        nanoseconds since the epoch (UTC).
+        """
+        first_ticks, last_ticks, tick_length = self._get_session_bounds(start_date, end_date)
+
+        ticks = [np.arange(first_tick, last_tick + 1, tick_length, dtype=np.int64)
+                 for first_tick, last_tick in zip(first_ticks, last_ticks)]
+
+        return np.concatenate(ticks) if ticks else np.array([], dtype=np.int64)
+
+    def get_session_ticks(self, start_date: date, end_date: date) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the first tick (the session open) and the last tick (the session close) of every trading day
+        between ``start_date`` and ``end_date`` (inclusive) that has any ticks. With a daily time frame, the
+        only tick of a day is both.
+        """
+        first_ticks, last_ticks, _ = self._get_session_bounds(start_date, end_date)
+        return first_ticks, last_ticks
+
+    def _get_session_bounds(self, start_date: date, end_date: date) -> tuple[np.ndarray, np.ndarray, int]:
+        """
+        Returns the first and last tick of every trading day between ``start_date`` and ``end_date``
+        (inclusive) that has any ticks, along with the length of a tick in nanoseconds.
+        """
+        trading_day_table = get_trading_day_table_in_range(self.machine_settings, start_date, end_date)
+        time_frame = self.machine_settings.time_frame
+
+        if time_frame.unit == TimeFrameUnit.Day:
+            ticks = to_epoch_ns(pd.DatetimeIndex(trading_day_table.dates).tz_localize(MARKET_TIME_ZONE))
+            return ticks, ticks, NANOSECONDS_PER_DAY
+
+        elif time_frame.unit == TimeFrameUnit.Hour:
+            tick_length = time_frame.amount * NANOSECONDS_PER_HOUR
+
+        elif time_frame.unit == TimeFrameUnit.Minute:
+            tick_length = time_frame.amount * NANOSECONDS_PER_MINUTE
+
+        else:
+            raise ValueError(
+                "machine_settings.time_frame.unit must be one of (TimeFrameUnit.Minute, "
+                "TimeFrameUnit.Hour, TimeFrameUnit.Day)")
+
+        # The first and last multiple of the tick length during market hours on each day
+        first_ticks = -(-trading_day_table.open_times // tick_length) * tick_length
+        last_ticks = trading_day_table.close_times // tick_length * tick_length
+
+        has_ticks = first_ticks <= last_ticks
+        return first_ticks[has_ticks], last_ticks[has_ticks], tick_length
+
+    def get_ticks_before(self, day: date, num_ticks: int) -> np.ndarray:
+        """
+        Returns the last ``num_ticks`` ticks before ``day`` (not including any ticks on ``day`` itself). Fewer
+        ticks are returned if the calendar runs out first.
+        """
+        if num_ticks <= 0:
+            return np.array([], dtype=np.int64)
+
+        # Start from a guess of the number of trading days needed, and look further back if early closes (or
+        # an uneven number of ticks per day) leave too few ticks
+        num_days = math.ceil(num_ticks / self.machine_settings.get_rows_per_day()) + 1
+        while True:
+            trading_days = get_trading_days_before(self.machine_settings, day, num_days)
+            ticks = self.get_ticks(trading_days[0].date, trading_days[-1].date) if trading_days else \
+                np.array([], dtype=np.int64)
+
+            if len(ticks) >= num_ticks or len(trading_days) < num_days:
+                return ticks[-num_ticks:]
+
+            num_days *= 2
+
+    def get_tick_date_range(self, ticks: np.ndarray) -> tuple[date, date]:
+        """
+        Returns the (market time) dates of the first and last of ``ticks``.
+        """
+        first_tick, last_tick = pd.to_datetime(ticks[[0, -1]], utc=True).tz_convert(MARKET_TIME_ZONE)
+        return first_tick.date(), last_tick.date()
+
+    def advance_to(self, time_ns: int):
+        """
+        Moves the clock forward to the tick at ``time_ns`` (nanoseconds since the epoch).
+        """
+        if self.latest_time is not None and time_ns < self.latest_time:
+            raise ValueError("The simulation clock cannot move backwards.")
+
+        self.latest_time = int(time_ns)
+
+    @property
+    def latest_datetime(self) -> datetime:
+        """
+        The datetime (in ``machine_settings.time_zone``) of the latest tick.
+        """
+        if self.latest_time is None:
+            raise RuntimeError("The simulation clock has not reached its first tick yet.")
+
+        return pd.Timestamp(self.latest_time, tz="UTC").tz_convert(self.machine_settings.time_zone)
+
+    @property
+    def latest_timestamp(self) -> str:
+        """
+        The timestamp of the latest tick, formatted the way Alpaca formats timestamps.
+        """
+        if self.latest_time is None:
+            raise RuntimeError("The simulation clock has not reached its first tick yet.")
+
+        return f"{np.datetime_as_string(np.datetime64(self.latest_time, 'ns'), unit='s')}Z"
@@ -1,63 +1,248 @@
 from __future__ import annotations
 
+import copy
+import inspect
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
 from collections.abc import Callable
 from dataclasses import dataclass
 from functools import wraps
 from typing import Any
 
+import numpy as np
 import pandas as pd
 
 
-def wrap_column():
+# The default number of results each column function keeps cached
+DEFAULT_COLUMN_CACHE_SIZE = 4096
+
+# Every column function's cache, keyed by the function's module and name
+_column_caches: dict[str, ColumnCache] = {}
+
+
+def wrap_column(max_cache_size: int = DEFAULT_COLUMN_CACHE_SIZE):
     """
     Wraps around a column function to add caching in a way compatible with dataframes.
+
+    Results are cached by the symbol and timestamp of the last row of the dataframe along with the rest of the
+    arguments, normalized so that passing an argument positionally or by keyword (or leaving it at its default)
+    hits the same entry. The cache holds at most ``max_cache_size`` results and evicts the least recently used
+    one when it is full, so results for several symbols (or several ticks) can be cached at once. That way,
+    column functions that call each other (like ``mean()`` inside ``infimum()``) reuse each other's results.
+
+    The wrapped function also gets a ``batch`` decorator that registers a whole-series implementation of the
+    column function. A batch function takes the same arguments as the column function, except that the
+    dataframe holds a whole span of rows, and returns an array with one value per row. The value for each row
+    must be exactly what the column function returns when that row is the last row of the dataframe it is
+    given. Rows that come before the column is ready (see ``PlannedColumn.ready_row_count``) can hold anything,
+    they are ignored.
+
+        @wrap_column()
+        def mean(df, num_rows, col):
+            ...
+
+        @mean.batch
+        def mean_batch(df, num_rows, col):
+            ...
     """
 
     def column_inner(func: Callable) -> Callable:
-        func.cache_ = {}
+        signature = inspect.signature(func)
+        df_parameter = next(iter(signature.parameters))
+
+        cache = ColumnCache(max_cache_size)
+        _column_caches[f"{func.__module__}.{func.__qualname__}"] = cache
+        func.cache_ = cache
 
         @wraps(func)
         def inner(df: pd.DataFrame, *args, **kwargs) -> Any:
 
-            # TODO: Make this identifier work properly if users pass an argument in either as arg or as kwarg
-            current_identifier = DFIdentifier(
-                df.iloc[-1].symbol, df.iloc[-1].timestamp, args, tuple(sorted(kwargs.items())))
+            bound_arguments = signature.bind(df, *args, **kwargs)
+            bound_arguments.apply_defaults()
+
+            try:
+                current_identifier = DFIdentifier(
+                    df.iat[-1, df.columns.get_loc("symbol")],
+                    df.iat[-1, df.columns.get_loc("timestamp")],
+                    tuple((name, _normalize_argument(value)) for name, value in bound_arguments.arguments.items()
+                          if name != df_parameter))
+                hash(current_identifier)
 
-            # Purge cache if incoming identifier's timestamp is different.
-            if any(existing_identifier.timestamp != current_identifier.timestamp
-                    for existing_identifier in func.cache_.keys()):
-                func.cache_ = {}
+            # Arguments that can't be hashed can't be cached
+            except TypeError:
+                cache.count_uncacheable()
+                return func(df, *args, **kwargs)
 
             # If the current identifier is not in the cache, add it to the cache
-            if current_identifier not in func.cache_:
-                func.cache_[current_identifier] = func(df, *args, **kwargs)
+            found, value = cache.get(current_identifier)
+            if not found:
+                value = func(df, *args, **kwargs)
+                cache.put(current_identifier, value)
+
+            return value
 
-            return func.cache_[current_identifier]
+        def batch(batch_func: Callable) -> Callable:
+            inner.batch_func_ = batch_func
+            return batch_func
+
+        inner.batch_func_ = None
+        inner.batch = batch
+        inner.cache_ = cache
 
         return inner
 
     return column_inner
 
 
+def get_column_cache_stats() -> dict[str, ColumnCacheStats]:
+    """
+    Returns the hit, miss and eviction counts of every column function's cache, keyed by the function's module
+    and name.
+    """
+    return {name: cache.get_stats() for name, cache in _column_caches.items()}
+
+
+def clear_column_caches():
+    """
+    Empties every column function's cache and resets its counters. Cached results are only valid for the
+    simulation they were calculated in, so this runs whenever a trading machine starts up.
+    """
+    for cache in _column_caches.values():
+        cache.clear()
+
+
+def _normalize_argument(value: Any) -> Any:
+    """
+    Turns a collected ``**kwargs`` dictionary into a hashable tuple. Other values are returned as-is.
+    """
+    if isinstance(value, dict):
+        return tuple(sorted(value.items()))
+
+    return value
+
+
 # Using eq=True and frozen=True makes the dataclass automatically hashable
 @dataclass(eq=True, frozen=True)
 class DFIdentifier():
     """
-    Hashable Dataclass that acts as an ID for a Pandas DataFrame
+    Hashable Dataclass that acts as an ID for a Pandas DataFrame and the arguments a column function was called
+    with
     """
     symbol: str
     timestamp: str
-    args: tuple
-    kwargs: tuple
+    arguments: tuple
+
+
+@dataclass
+class ColumnCacheStats():
+    """
+    A snapshot of how well a column function's cache is working.
+    """
+    size: int
+    max_size: int
+    hits: int
+    misses: int
+    evictions: int
+    uncacheable: int
+
+    @property
+    def hit_rate(self) -> float:
+        """
+        The fraction of cacheable calls that were answered from the cache.
+        """
+        num_calls = self.hits + self.misses
+        return self.hits / num_calls if num_calls else 0.0
+
+
+class ColumnCache():
+    """
+    A bounded, least-recently-used cache of a column function's results. Algorithms running on separate threads
+    can call the same column function, so the cache is guarded by a lock.
+    """
+
+    max_size: int
+    num_hits: int
+    num_misses: int
+    num_evictions: int
+    num_uncacheable: int
+    _entries: OrderedDict
+    _lock: threading.Lock
+
+    def __init__(self, max_size: int = DEFAULT_COLUMN_CACHE_SIZE):
+        if max_size < 1:
+            raise ValueError(f"A column cache must hold at least 1 result. The max size is {max_size}")
+
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, identifier: DFIdentifier) -> tuple[bool, Any]:
+        """
+        Returns (True, result) if a result is cached for ``identifier``, otherwise (False, None).
+        """
+        with self._lock:
+            if identifier in self._entries:
+                self._entries.move_to_end(identifier)
+                self.num_hits += 1
+                return True, self._entries[identifier]
+
+            self.num_misses += 1
+            return False, None
+
+    def put(self, identifier: DFIdentifier, value: Any):
+        """
+        Caches ``value`` for ``identifier``, evicting the least recently used result if the cache is full.
+        """
+        with self._lock:
+            self._entries[identifier] = value
+            self._entries.move_to_end(identifier)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.num_evictions += 1
+
+    def count_uncacheable(self):
+        """
+        Counts a call whose arguments couldn't be hashed, so its result couldn't be cached.
+        """
+        with self._lock:
+            self.num_uncacheable += 1
+
+    def clear(self):
+        """
+        Removes every cached result and resets the counters.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.num_hits = 0
+            self.num_misses = 0
+            self.num_evictions = 0
+            self.num_uncacheable = 0
+
+    def get_stats(self) -> ColumnCacheStats:
+        """
+        Returns the cache's current size and counters.
+        """
+        return ColumnCacheStats(
+            len(self._entries), self.max_size, self.num_hits, self.num_misses, self.num_evictions,
+            self.num_uncacheable)
 
 
 class Column():
     """
     Turns a function written to be a column into an instance of this class so it can be used in
     the trading machine.
-    """
 
-    # TODO: Derived columns that are called periodically, once every n-TimeFrames
+    By default, a column is calculated on every row. A column with a ``period`` of n is only calculated on every
+    n-th row, starting ``phase`` rows after the first row of the simulation (the first row after the warmup
+    rows), and the rows in between hold the last calculated value. Expensive columns can then be refreshed, for
+    example, once an hour in a simulation with a time frame of one minute.
+    """
 
     title: str
     func: Callable
@@ -65,9 +250,12 @@ class Column():
     args: tuple
     kwargs: dict
     column_dependencies: list[str]
+    period: int
+    phase: int
     _next_id: int = 100
 
-    def __init__(self, title: str, func: Callable, num_rows: int, *args, column_dependencies=[], **kwargs):
+    def __init__(self, title: str, func: Callable, num_rows: int, *args, column_dependencies=[], period: int = 1,
+                 phase: int = 0, **kwargs):
         self.title = title
         self.func = func
         self.num_rows_needed = num_rows
@@ -75,54 +263,139 @@ class Column():
         self.kwargs = kwargs
         self.column_dependencies = column_dependencies
 
+        if period < 1:
+            raise ValueError(f"The period of {title} must be at least 1 row. The current value is {period}")
+
+        if not 0 <= phase < period:
+            raise ValueError(
+                f"The phase of {title} must be at least 0 and less than its period. The current value is {phase}")
+
+        self.period = period
+        self.phase = phase
+
         self.id = Column._next_id
         Column._next_id += 1
 
     def __call__(self, df: pd.DataFrame) -> Any:
         return self.func(df, self.num_rows_needed, *self.args, **self.kwargs)
 
+    @property
+    def is_periodic(self) -> bool:
+        """
+        True if the column is only calculated on some of the rows (see ``period``).
+        """
+        return self.period > 1
+
+    @property
+    def has_batch_func(self) -> bool:
+        """
+        True if the column function has a whole-series implementation registered with ``batch``.
+        """
+        return getattr(self.func, "batch_func_", None) is not None
+
+    def call_batch(self, df: pd.DataFrame) -> np.ndarray:
+        """
+        Calculates the column's value for every row of ``df`` at once with the column function's whole-series
+        implementation. The value for each row is the same as calling the column on the rows up to and
+        including it.
+        """
+        if not self.has_batch_func:
+            raise ValueError(f"The column function of {self.title} has no batch implementation.")
+
+        values = np.asarray(self.func.batch_func_(df, self.num_rows_needed, *self.args, **self.kwargs))
+
+        if len(values) != len(df.index):
+            raise ValueError(
+                f"The batch implementation of {self.title} returned {len(values)} values for {len(df.index)} rows.")
+
+        return values
+
     def __eq__(self, __o: object) -> bool:
         # If the incoming object is not a Column, immediately return false
         if not isinstance(__o, Column):
             return False
 
         # Otherwise, check that all of the values of its attributes are the same
-        # Only include data that uniquely defines this Column. func, num_rows, args, and kwargs count
-        # for this, but other instance attributes don't because they don't define how the derived column
-        # function is called.
+        # Only include data that uniquely defines this Column. func, num_rows, args, kwargs, period and phase
+        # count for this, but other instance attributes don't because they don't define how (or on which rows)
+        # the derived column function is called.
         if (__o.func == self.func and
                 __o.num_rows_needed == self.num_rows_needed and
                 __o.args == self.args and
-                __o.kwargs == self.kwargs):
+                __o.kwargs == self.kwargs and
+                __o.period == self.period and
+                __o.phase == self.phase):
             return True
         else:
             return False
 
-    def dependencies_are_fulfilled(
-            self, df: pd.DataFrame, all_derived_columns_in_simulation: dict[str, Column]) -> bool:
+
+class OnlineState(ABC):
+    """
+    Abstract base class for the running state of an online column for one asset. Every new row's value of the
+    column's input column is passed to ``update()``, which updates the state in constant time and returns the
+    column's new value.
+    """
+
+    num_rows: int
+
+    def __init__(self, num_rows: int):
+        self.num_rows = num_rows
+
+    @property
+    @abstractmethod
+    def is_full(self) -> bool:
         """
-        Returns true if all of this derived column's dependencies have enough data to start calculating the
-        derived column.
+        True once the state has seen enough rows for its value to be used.
         """
-        # Check all of the dependent columns to see if they have enough data to be used
-        all_dependencies_fulfilled = True
-        for column_name, column_obj in all_derived_columns_in_simulation.items():
+        ...
 
-            # Skip the iteration if the column obj is the same as the current instance
-            if column_obj is self:
-                continue
+    @abstractmethod
+    def update(self, value: Any) -> Any:
+        """
+        Adds the newest row's input value to the state and returns the column's value for that row.
+        """
+        ...
 
-            # If the derived column is one of this column's dependencies but it hasn't been called enough
-            # times to fulfil the dependency
-            if column_name in self.column_dependencies and df[column_name].count() < self.num_rows_needed:
-                all_dependencies_fulfilled = False
-                break
+    def checkpoint(self) -> OnlineState:
+        """
+        Returns an independent copy of the state that can be restored later.
+        """
+        return copy.deepcopy(self)
 
-        # Check that the dataframe has enough rows for this derived column
-        if len(df.index) < self.num_rows_needed:
-            has_num_rows_needed = False
-        else:
-            has_num_rows_needed = True
 
-        fulfilled_dependencies = all_dependencies_fulfilled and has_num_rows_needed
-        return fulfilled_dependencies
+class OnlineColumn(Column):
+    """
+    A derived column that keeps its own running state (one per asset) instead of recalculating its value from a
+    window of rows. Each new row only updates the state, so calculating the column costs the same no matter how
+    many rows it looks back on.
+
+    ``state_type`` is an OnlineState subclass, which is created with ``state_type(num_rows, *args, **kwargs)``.
+    ``col`` is the column whose values are fed into the state, one row at a time. A periodic online column still
+    feeds every row into its state, only the column's value is held between its periods.
+    """
+
+    input_column: str
+
+    def __init__(self, title: str, state_type: type[OnlineState], num_rows: int, col: str, *args,
+                 column_dependencies=[], period: int = 1, phase: int = 0, **kwargs):
+        super().__init__(
+            title, state_type, num_rows, col, *args, column_dependencies=column_dependencies, period=period,
+            phase=phase, **kwargs)
+        self.input_column = col
+
+    def create_state(self) -> OnlineState:
+        """
+        Returns a new, empty state for one asset.
+        """
+        return self.func(self.num_rows_needed, *self.args[1:], **self.kwargs)
+
+    def __call__(self, df: pd.DataFrame) -> Any:
+        # Without an existing state, feed the last rows of the dataframe into a new one
+        state = self.create_state()
+
+        value = np.nan
+        for input_value in df[self.input_column].tail(self.num_rows_needed):
+            value = state.update(input_value)
+
+        return value if state.is_full else np.nan
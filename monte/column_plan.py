@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+from collections.abc import Iterator
+from dataclasses import dataclass
+from typing import Any
+
+from monte.column import Column, OnlineColumn
+
+
+@dataclass(frozen=True)
+class PlannedColumn():
+    """
+    One step of a ColumnPlan: a derived column along with the number of rows an asset needs to have before the
+    column can be calculated (``ready_row_count``) and before the column is sure to have a value
+    (``filled_row_count``). The two only differ for periodic columns, which might have to wait for their next
+    period after they are ready. ``aliases`` are the titles of other derived columns that are defined the same
+    way, which get a copy of this column's values instead of being calculated again.
+    """
+    title: str
+    column: Column
+    dependencies: tuple[str, ...]
+    ready_row_count: int
+    filled_row_count: int
+    aliases: tuple[str, ...] = ()
+
+    @property
+    def all_titles(self) -> tuple[str, ...]:
+        """
+        The title of the column followed by the titles of its aliases.
+        """
+        return (self.title,) + self.aliases
+
+
+class ColumnPlan():
+    """
+    The order the derived columns of a simulation are calculated in, compiled once from the derived columns.
+
+    Every column comes after all of the columns it depends on (the order is otherwise the order the columns
+    were added in), and circular dependencies are rejected. The plan also works out ahead of time after how
+    many rows each column has enough data to be calculated, so that nothing has to be checked while the
+    simulation runs. Columns that depend on a periodic column (see ``Column.period``) wait until it is sure to
+    have a value, which can be up to a period after it could first be calculated.
+
+    Derived columns that are defined the same way (the same function, number of rows, args and kwargs, see
+    ``Column.__eq__()``) under different titles, like when several algorithms ask for the same feature, are only
+    calculated once. The first of them is planned and the others become its aliases. Arguments that name a
+    derived column count as the same if they name aliases of the same column. The columns also have to depend
+    on the same derived columns, since a column's dependencies decide from which row on it is calculated.
+    """
+
+    steps: list[PlannedColumn]
+
+    def __init__(self, steps: list[PlannedColumn]):
+        self.steps = steps
+
+    def __iter__(self) -> Iterator[PlannedColumn]:
+        return iter(self.steps)
+
+    def __len__(self) -> int:
+        return len(self.steps)
+
+    @property
+    def titles(self) -> list[str]:
+        """
+        The titles of the derived columns in the order they are calculated in, not counting aliases.
+        """
+        return [step.title for step in self.steps]
+
+    @property
+    def aliases(self) -> dict[str, str]:
+        """
+        The title of every aliased derived column along with the title of the column that is calculated for it.
+        """
+        return {alias: step.title for step in self.steps for alias in step.aliases}
+
+    @classmethod
+    def compile(cls, derived_columns: dict[str, Column]) -> ColumnPlan:
+        """
+        Compiles a plan for ``derived_columns``. Raises a ValueError if the columns depend on each other in a
+        circle.
+        """
+        dependencies = {
+            column_title: tuple(_get_dependencies(column_title, column_obj, derived_columns))
+            for column_title, column_obj in derived_columns.items()
+        }
+
+        # Repeatedly take the first column (in the order they were added) whose dependencies have all been
+        # planned already
+        ordered_titles = []
+        planned_titles = set()
+        while len(ordered_titles) < len(derived_columns):
+            next_title = next(
+                (column_title for column_title in derived_columns if column_title not in planned_titles and
+                 all(dependency in planned_titles for dependency in dependencies[column_title])),
+                None)
+
+            if next_title is None:
+                cycle = _find_cycle(
+                    [column_title for column_title in derived_columns if column_title not in planned_titles],
+                    dependencies)
+                raise ValueError(
+                    f"The derived columns have a circular dependency: {' -> '.join(cycle)}")
+
+            ordered_titles.append(next_title)
+            planned_titles.add(next_title)
+
+        # Replace the columns that are defined the same way as an earlier column with that column. Dependencies
+        # come first in the order, so their canonical titles are known by the time a column is looked at.
+        canonical_titles = {}
+        aliases = {}
+        hashable_keys = {}
+        unhashable_keys = []
+        for column_title in ordered_titles:
+            canonical_key = _get_canonical_key(
+                derived_columns[column_title], dependencies[column_title], canonical_titles)
+
+            # Columns with arguments that can't be hashed are compared one by one
+            try:
+                equivalent_title = hashable_keys.get(canonical_key)
+                is_hashable = True
+            except TypeError:
+                equivalent_title = next((title for key, title in unhashable_keys if key == canonical_key), None)
+                is_hashable = False
+
+            if equivalent_title is None:
+                canonical_titles[column_title] = column_title
+                aliases[column_title] = []
+
+                if is_hashable:
+                    hashable_keys[canonical_key] = column_title
+                else:
+                    unhashable_keys.append((canonical_key, column_title))
+            else:
+                canonical_titles[column_title] = equivalent_title
+                aliases[equivalent_title].append(column_title)
+
+        # A column can be calculated once there are enough rows for it and each of its dependencies has had a
+        # value for at least as many rows as the column needs. A periodic column has a value by the end of its
+        # first period after that.
+        filled_row_counts = {}
+        steps = []
+        for column_title in aliases:
+            column_obj = derived_columns[column_title]
+            num_rows_needed = column_obj.num_rows_needed
+            column_dependencies = tuple(dict.fromkeys(
+                canonical_titles[dependency] for dependency in dependencies[column_title]))
+
+            ready_row_count = max(
+                [num_rows_needed] +
+                [filled_row_counts[dependency] + num_rows_needed - 1 for dependency in column_dependencies])
+            filled_row_counts[column_title] = ready_row_count + column_obj.period - 1
+
+            steps.append(PlannedColumn(
+                column_title, column_obj, column_dependencies, ready_row_count, filled_row_counts[column_title],
+                tuple(aliases[column_title])))
+
+        return cls(steps)
+
+
+def _get_dependencies(column_title: str, column_obj: Column, derived_columns: dict[str, Column]) -> list[str]:
+    """
+    Returns the derived columns ``column_obj`` reads. Dependencies on columns that aren't derived columns (like
+    the base columns) don't affect the plan and are left out.
+    """
+    dependencies = list(column_obj.column_dependencies)
+
+    # Online columns always read their input column
+    if isinstance(column_obj, OnlineColumn):
+        dependencies.append(column_obj.input_column)
+
+    return [dependency for dependency in dict.fromkeys(dependencies)
+            if dependency in derived_columns and dependency != column_title]
+
+
+def _find_cycle(remaining_titles: list[str], dependencies: dict[str, tuple[str, ...]]) -> list[str]:
+    """
+    Returns the titles of columns that depend on each other in a circle, starting and ending with the same
+    column. Every column in ``remaining_titles`` must have a dependency that is also in ``remaining_titles``.
+    """
+    remaining = set(remaining_titles)
+
+    # Following unplanned dependencies from any unplanned column has to come back around to a column that was
+    # already visited
+    path = [remaining_titles[0]]
+    while True:
+        next_title = next(dependency for dependency in dependencies[path[-1]] if dependency in remaining)
+
+        if next_title in path:
+            return path[path.index(next_title):] + [next_title]
+
+        path.append(next_title)
+
+
+def _get_canonical_key(column_obj: Column, column_dependencies: tuple[str, ...],
+                       canonical_titles: dict[str, str]) -> tuple:
+    """
+    Returns the values that define how (and on which rows) ``column_obj`` is calculated (the same ones
+    ``Column.__eq__()`` compares, plus the derived columns it depends on), with the titles of derived columns in
+    its arguments and dependencies replaced by the titles of the columns that are actually calculated for them.
+    """
+    dependencies = tuple(sorted({canonical_titles[dependency] for dependency in column_dependencies}))
+    args = tuple(_get_canonical_argument(arg, canonical_titles) for arg in column_obj.args)
+    kwargs = tuple(sorted(
+        (name, _get_canonical_argument(value, canonical_titles)) for name, value in column_obj.kwargs.items()))
+
+    return (type(column_obj), column_obj.func, column_obj.num_rows_needed, args, kwargs, column_obj.period,
+            column_obj.phase, dependencies)
+
+
+def _get_canonical_argument(value: Any, canonical_titles: dict[str, str]) -> Any:
+    """
+    Returns the title of the column that is calculated for ``value`` if it is the title of a derived column,
+    otherwise ``value`` itself.
+    """
+    if isinstance(value, str):
+        return canonical_titles.get(value, value)
+
+    return value
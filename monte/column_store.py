@@ -0,0 +1,419 @@
+from __future__ import annotations
+
+from collections.abc import Sequence
+from datetime import datetime
+from typing import Any, Union
+
+import numpy as np
+import pandas as pd
+import pytz
+
+# The number of rows a column store can hold before it first has to grow
+INITIAL_CAPACITY = 256
+
+
+class ColumnStore():
+    """
+    Stores rows of asset data as one preallocated, typed numpy array per column.
+
+    Rows are written at an end cursor and dropped from the front by moving a start cursor forward, so neither
+    appending nor trimming copies the rows that are already stored. When the arrays fill up, the live rows are
+    moved back to the front if at least half of the capacity has been dropped, otherwise the capacity is
+    doubled. A store that is trimmed to a fixed number of rows therefore works like a ring buffer that never
+    needs more than twice that many rows, while a store that only grows has amortized O(1) appends.
+
+    Each column takes the type of the first value written into it (int64, float64 or object) and switches to
+    a wider type the first time a value that doesn't fit is written. Datetime columns are stored as int64
+    nanoseconds since the epoch (UTC) and are converted back to ``time_zone`` when a dataframe is built.
+    """
+
+    columns: list[str]
+    datetime_columns: list[str]
+    time_zone: pytz.tzinfo.BaseTzInfo
+    _arrays: dict[str, np.ndarray]
+    _typed_columns: set[str]
+    _start: int
+    _end: int
+    _version: int
+    _cached_df: Union[pd.DataFrame, None]
+    _cached_df_version: int
+
+    def __init__(self, columns: list[str], datetime_columns: list[str], time_zone: pytz.tzinfo.BaseTzInfo,
+                 initial_capacity: int = INITIAL_CAPACITY):
+        self.columns = list(columns)
+        self.datetime_columns = list(datetime_columns)
+        self.time_zone = time_zone
+
+        self._arrays = {
+            column: self._empty_array(column, max(initial_capacity, 1), np.dtype(np.float64))
+            for column in self.columns
+        }
+
+        # Columns only get their type once a value that isn't missing has been written into them
+        self._typed_columns = set()
+
+        self._start = 0
+        self._end = 0
+
+        # Dataframes are only rebuilt after the store changes
+        self._version = 0
+        self._cached_df = None
+        self._cached_df_version = -1
+
+    def __len__(self) -> int:
+        return self._end - self._start
+
+    @property
+    def capacity(self) -> int:
+        """
+        The number of rows the arrays can hold before they have to be compacted or grown.
+        """
+        return len(self._arrays[self.columns[0]]) if self.columns else 0
+
+    def append_row(self, row: dict[str, Any]):
+        """
+        Appends one row to the end of the store. Columns that are missing from ``row`` are set to NaN.
+        """
+        if self._end == self.capacity:
+            self._make_room()
+
+        for column in self.columns:
+            self._write_value(column, self._end, row.get(column, np.nan))
+
+        self._end += 1
+        self._version += 1
+
+    def append_rows(self, rows: dict[str, Sequence]):
+        """
+        Appends several rows to the end of the store at once. ``rows`` maps column names to equally long arrays
+        of values, and columns that are missing from it are set to NaN. The columns end up with the same values
+        and types as if every row had been appended with ``append_row()``.
+        """
+        num_new_rows = len(next(iter(rows.values()))) if rows else 0
+        if num_new_rows == 0:
+            return
+
+        if self._end + num_new_rows > self.capacity:
+            self._make_room(num_new_rows)
+
+        for column in self.columns:
+            values = rows[column] if column in rows else np.full(num_new_rows, np.nan)
+            self._write_values(column, self._end, np.asarray(values))
+
+        self._end += num_new_rows
+        self._version += 1
+
+    def set_value(self, column: str, position: int, value: Any):
+        """
+        Overwrites the value of ``column`` in the row at ``position``, counting from the oldest stored row.
+        """
+        self._write_value(column, self._start + position, value)
+        self._version += 1
+
+    def set_values(self, column: str, position: int, values: Sequence):
+        """
+        Overwrites the values of ``column`` in consecutive rows, starting with the row at ``position``
+        (counting from the oldest stored row).
+        """
+        self._write_values(column, self._start + position, np.asarray(values))
+        self._version += 1
+
+    def set_last_value(self, column: str, value: Any):
+        """
+        Overwrites the value of ``column`` in the last row.
+        """
+        self.set_value(column, len(self) - 1, value)
+
+    def get_last_value(self, column: str) -> Any:
+        """
+        Returns the value of ``column`` in the last row.
+        """
+        if len(self) == 0:
+            raise IndexError("Cannot get the last value of an empty column store.")
+
+        value = self._arrays[column][self._end - 1]
+
+        if column in self.datetime_columns:
+            return pd.Timestamp(int(value), tz="UTC").tz_convert(self.time_zone)
+
+        return value
+
+    def get_column(self, column: str, last_n: Union[int, None] = None) -> np.ndarray:
+        """
+        Returns a view of the stored values of ``column``, or only of its last ``last_n`` values. Datetimes are
+        returned as int64 nanoseconds since the epoch (UTC).
+        """
+        start = self._start if last_n is None else max(self._start, self._end - last_n)
+        return self._arrays[column][start:self._end]
+
+    def get_local_dates(self, column: str) -> np.ndarray:
+        """
+        Returns the date (in ``time_zone``) of every value in the datetime column ``column``.
+        """
+        local_datetimes = pd.DatetimeIndex(self.get_column(column).view("datetime64[ns]"))\
+            .tz_localize("UTC").tz_convert(self.time_zone).tz_localize(None)
+
+        return np.asarray(local_datetimes, dtype="datetime64[ns]").astype("datetime64[D]")
+
+    def drop_first_rows(self, num_rows: int):
+        """
+        Drops the oldest ``num_rows`` rows.
+        """
+        self._start = min(self._end, self._start + num_rows)
+        self._version += 1
+
+    def drop_rows_through(self, column: str, last_datetime: datetime):
+        """
+        Drops every row at the front of the store whose value in the (sorted) datetime column ``column`` is
+        on or before ``last_datetime``.
+        """
+        cutoff = pd.Timestamp(last_datetime).tz_convert("UTC").value
+        self.drop_first_rows(int(np.searchsorted(self.get_column(column), cutoff, side="right")))
+
+    def copy_tail(self, num_rows: int) -> ColumnStore:
+        """
+        Returns a new store holding a copy of the last ``num_rows`` rows.
+        """
+        tail_store = ColumnStore(self.columns, self.datetime_columns, self.time_zone,
+                                 initial_capacity=max(num_rows * 2, INITIAL_CAPACITY))
+
+        num_rows = min(num_rows, len(self))
+        tail_store._typed_columns = set(self._typed_columns)
+        for column in self.columns:
+            tail_store._arrays[column] = np.empty(tail_store.capacity, dtype=self._arrays[column].dtype)
+            tail_store._arrays[column][:num_rows] = self.get_column(column, num_rows)
+
+        tail_store._end = num_rows
+
+        return tail_store
+
+    def to_dataframe(self, last_n: Union[int, None] = None, as_objects: bool = False) -> pd.DataFrame:
+        """
+        Returns the stored rows (or only the last ``last_n`` rows) as a dataframe. The full dataframe is
+        cached until the store changes, so calling this repeatedly is cheap.
+
+        If ``as_objects`` is True, every column of the dataframe has the object dtype. All of the values then
+        live in one block, which makes getting whole rows (i.e. ``df.iloc[-1]``) much faster.
+        """
+        if last_n is None and not as_objects and self._cached_df_version == self._version:
+            return self._cached_df  # type: ignore
+
+        num_rows = len(self) if last_n is None else min(last_n, len(self))
+
+        if as_objects:
+            return pd.DataFrame(self.get_object_values(num_rows), columns=self.columns, dtype=object, copy=False)
+
+        df = pd.DataFrame(
+            {column: self._get_column_values(column, num_rows) for column in self.columns},
+            columns=self.columns)
+
+        if last_n is None:
+            self._cached_df = df
+            self._cached_df_version = self._version
+
+        return df
+
+    def get_object_values(self, last_n: Union[int, None] = None) -> np.ndarray:
+        """
+        Returns a new 2-D object array (rows x columns) holding the stored rows, or only the last ``last_n``
+        rows. Datetimes are converted to timestamps in ``time_zone``.
+        """
+        num_rows = len(self) if last_n is None else min(last_n, len(self))
+
+        values = np.empty((num_rows, len(self.columns)), dtype=object)
+        for column_index, column in enumerate(self.columns):
+            values[:, column_index] = self._get_column_values(column, num_rows)
+
+        return values
+
+    def _get_column_values(self, column: str, num_rows: int) -> Union[np.ndarray, pd.DatetimeIndex]:
+        """
+        Returns a copy of the last ``num_rows`` values of ``column``, with datetimes converted to
+        ``time_zone``.
+        """
+        values = self.get_column(column, num_rows)
+
+        if column in self.datetime_columns:
+            return pd.DatetimeIndex(values.view("datetime64[ns]")).tz_localize("UTC").tz_convert(self.time_zone)
+
+        return values.copy()
+
+    def _write_value(self, column: str, index: int, value: Any):
+        """
+        Writes one value into a column, widening the column's type first if the value doesn't fit.
+        """
+        array = self._arrays[column]
+
+        if column in self.datetime_columns:
+            # Datetimes can also be passed in as nanoseconds since the epoch (UTC)
+            if not _is_integer(value):
+                value = pd.Timestamp(value).tz_convert("UTC").value if not pd.isna(value) else \
+                    np.iinfo(np.int64).min
+
+        elif column not in self._typed_columns:
+            if not _is_missing(value):
+                dtype = _infer_dtype(value)
+
+                # Integers can't hold the missing values of the rows before this one
+                if dtype.kind == "i" and index > self._start:
+                    dtype = np.dtype(np.float64)
+
+                array = self._type_column(column, dtype)
+
+        elif not _fits_in(array.dtype, value):
+            array = array.astype(_get_wider_dtype(array.dtype, value))
+            self._arrays[column] = array
+
+        array[index] = value
+
+    def _write_values(self, column: str, index: int, values: np.ndarray):
+        """
+        Writes several consecutive values into a column starting at ``index``, typing or widening the column
+        the same way writing them one at a time with ``_write_value()`` would.
+        """
+        array = self._arrays[column]
+        end = index + len(values)
+
+        if column in self.datetime_columns:
+            if values.dtype.kind == "i":
+                array[index:end] = values
+                return
+
+            if values.dtype.kind == "M":
+                array[index:end] = values.astype("datetime64[ns]").view(np.int64)
+                return
+
+        elif values.dtype.kind in "if" and array.dtype != object:
+            if column not in self._typed_columns:
+                present_positions = np.flatnonzero(~np.isnan(values)) if values.dtype.kind == "f" else [0]
+
+                # A column stays untyped (and a float array) until a value that isn't missing is written
+                if len(present_positions) == 0:
+                    array[index:end] = values
+                    return
+
+                # Integers can't hold the missing values of the rows before the first value
+                dtype = np.dtype(np.int64) if values.dtype.kind == "i" and \
+                    index + present_positions[0] == self._start else np.dtype(np.float64)
+
+                array = self._type_column(column, dtype)
+
+            # Integer columns switch to floats as soon as a float is written into them
+            elif array.dtype.kind == "i" and values.dtype.kind == "f":
+                array = array.astype(np.float64)
+
+            array[index:end] = values
+            self._arrays[column] = array
+            return
+
+        elif values.dtype == object and array.dtype == object and column in self._typed_columns:
+            array[index:end] = values
+            return
+
+        for offset, value in enumerate(values):
+            self._write_value(column, index + offset, value)
+
+    def _type_column(self, column: str, dtype: np.dtype) -> np.ndarray:
+        """
+        Gives the untyped ``column`` the type ``dtype`` and returns its new array. Its rows only hold missing
+        values, which are kept unless the type is an integer type that can't hold them.
+        """
+        array = self._arrays[column]
+        typed_array = self._empty_array(column, len(array), dtype)
+
+        if dtype.kind != "i":
+            typed_array[self._start:self._end] = array[self._start:self._end]
+
+        self._arrays[column] = typed_array
+        self._typed_columns.add(column)
+
+        return typed_array
+
+    def _make_room(self, num_new_rows: int = 1):
+        """
+        Makes room for at least ``num_new_rows`` more rows at the end of the arrays.
+        """
+        num_rows = len(self)
+
+        # If at least half of the capacity is taken up by dropped rows (and that is enough room), move the live
+        # rows back to the front. Otherwise, double the capacity.
+        if self._start >= self.capacity // 2 and self._start > 0 and num_rows + num_new_rows <= self.capacity:
+            new_capacity = self.capacity
+        else:
+            new_capacity = max(self.capacity * 2, num_rows + num_new_rows)
+
+        for column in self.columns:
+            array = self._arrays[column]
+            new_array = self._empty_array(column, new_capacity, array.dtype)
+            new_array[:num_rows] = array[self._start:self._end]
+            self._arrays[column] = new_array
+
+        self._start = 0
+        self._end = num_rows
+
+    def _empty_array(self, column: str, capacity: int, dtype: np.dtype) -> np.ndarray:
+        """
+        Returns a new array for ``column`` that can hold ``capacity`` rows.
+        """
+        if column in self.datetime_columns:
+            return np.empty(capacity, dtype=np.int64)
+
+        return np.empty(capacity, dtype=dtype)
+
+
+def _is_missing(value: Any) -> bool:
+    """
+    Returns True if ``value`` is None or NaN.
+    """
+    return value is None or (isinstance(value, float) and np.isnan(value))
+
+
+def _is_integer(value: Any) -> bool:
+    """
+    Returns True if ``value`` is an integer (but not a bool).
+    """
+    return isinstance(value, (int, np.integer)) and not isinstance(value, (bool, np.bool_))
+
+
+def _is_real_number(value: Any) -> bool:
+    """
+    Returns True if ``value`` is an integer or a float (but not a bool or a complex number).
+    """
+    return _is_integer(value) or isinstance(value, (float, np.floating))
+
+
+def _infer_dtype(value: Any) -> np.dtype:
+    """
+    Returns the type of column that a column whose first value is ``value`` should have.
+    """
+    if _is_integer(value):
+        return np.dtype(np.int64)
+
+    if _is_real_number(value):
+        return np.dtype(np.float64)
+
+    return np.dtype(object)
+
+
+def _fits_in(dtype: np.dtype, value: Any) -> bool:
+    """
+    Returns True if ``value`` can be stored in a column of ``dtype`` without losing information.
+    """
+    if dtype == object:
+        return True
+
+    if dtype.kind == "i":
+        return _is_integer(value)
+
+    return _is_missing(value) or _is_real_number(value)
+
+
+def _get_wider_dtype(dtype: np.dtype, value: Any) -> np.dtype:
+    """
+    Returns the narrowest type of column that can hold the values of a column of ``dtype`` as well as
+    ``value``.
+    """
+    if dtype.kind == "i" and (_is_missing(value) or _is_real_number(value)):
+        return np.dtype(np.float64)
+
+    return np.dtype(object)
@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+import os
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import date, time
+from typing import Union
+
+import numpy as np
+import pandas as pd
+from alpaca_trade_api import TimeFrame
+
+from monte.api import AlpacaAPIBundle
+from monte.bar_cache import RAW_BAR_COLUMNS, as_date
+
+# Maps the human-friendly column names used in the training/testing dataframes back to the raw column names
+# that Alpaca uses. Bar files can use either set of names.
+LONG_TO_RAW_COLUMN_NAMES = {
+    "timestamp": "t",
+    "open": "o",
+    "high": "h",
+    "low": "l",
+    "close": "c",
+    "volume": "v",
+    "trade_count": "n",
+    "vwap": "vw",
+}
+
+
+@dataclass
+class CalendarDay():
+    """
+    A dataclass holding one day of the market calendar, as returned by a DataSource. The open and close
+    times are local to the exchange (U.S. Eastern time).
+    """
+    date: date
+    open: time
+    close: time
+
+
+class DataSource(ABC):
+    """
+    Abstract base class for everything the trading machine needs from the outside world: historical bars
+    and the market calendar.
+    """
+
+    @abstractmethod
+    def get_bulk_bars(self, symbols: list[str], time_frame: TimeFrame, start_date: date,
+                      end_date: date) -> dict[str, pd.DataFrame]:
+        """
+        Returns a dictionary mapping each of the ``symbols`` to a dataframe of raw bars between
+        ``start_date`` and ``end_date`` (inclusive). The dataframes use Alpaca's raw column names
+        (t, o, h, l, c, v, n, vw), where ``t`` is either a timezone-aware (UTC) datetime column or an
+        ISO-8601 UTC timestamp string.
+        """
+        ...
+
+    @abstractmethod
+    def get_calendar(self, start_date: date, end_date: date) -> list[CalendarDay]:
+        """
+        Returns the days that U.S. markets are open between ``start_date`` and ``end_date`` (inclusive).
+        """
+        ...
+
+    def get_max_concurrent_requests(self) -> int:
+        """
+        Returns the number of ``get_bulk_bars()`` calls this data source can usefully serve at the same time.
+        """
+        return 1
+
+    def get_calendar_cache_key(self) -> str:
+        """
+        Returns a key that identifies this data source's market calendar. Data sources with the same key
+        share one in-process calendar index.
+        """
+        return type(self).__name__
+
+    def get_calendar_cache_path(self) -> Union[str, None]:
+        """
+        Returns the path of the file the calendar index is saved to between runs, or None if the calendar
+        should not be saved to disk.
+        """
+        return None
+
+
+class AlpacaDataSource(DataSource):
+    """
+    Gets bars and the market calendar from the Alpaca API.
+    """
+
+    alpaca_api: AlpacaAPIBundle
+
+    def __init__(self, alpaca_api: AlpacaAPIBundle):
+        self.alpaca_api = alpaca_api
+
+    def get_bulk_bars(self, symbols: list[str], time_frame: TimeFrame, start_date: date,
+                      end_date: date) -> dict[str, pd.DataFrame]:
+        """
+        Downloads raw bars for all ``symbols`` from Alpaca (or the bar cache, if one is configured).
+        """
+        return self.alpaca_api.get_bulk_bars(symbols, time_frame, start_date, end_date)
+
+    def get_calendar(self, start_date: date, end_date: date) -> list[CalendarDay]:
+        """
+        Downloads the market calendar from Alpaca.
+        """
+        raw_calendar = self.alpaca_api.trading.get_calendar(
+            as_date(start_date).isoformat(), as_date(end_date).isoformat())
+
+        # Types are ignored because the Alpaca API is using a non-type-hinted __getattr__ function so Pylance
+        # freaks out when it doesn't need to.
+        return [
+            CalendarDay(
+                date(day.date.year, day.date.month, day.date.day),  # type: ignore
+                time(day.open.hour, day.open.minute),  # type: ignore
+                time(day.close.hour, day.close.minute))  # type: ignore
+            for day in raw_calendar
+        ]
+
+    def get_max_concurrent_requests(self) -> int:
+        """
+        Each Alpaca API key pair has its own rate limit, so one request can be in flight per key pair.
+        """
+        return self.alpaca_api.num_api_key_pairs
+
+    def get_calendar_cache_path(self) -> Union[str, None]:
+        """
+        Saves the calendar index next to the bar cache, if the Alpaca API bundle has one.
+        """
+        if self.alpaca_api.bar_cache is None:
+            return None
+
+        return os.path.join(self.alpaca_api.bar_cache.cache_dir, "calendar.json")
+
+
+class FileDataSource(DataSource):
+    """
+    Reads bars and the market calendar from local files, so simulations can run without network access or
+    API keys.
+
+    Bars are read from ``{bars_dir}/{time_frame}/{symbol}.parquet`` (or ``.csv``), where ``time_frame`` is
+    formatted the way Alpaca formats it (i.e. ``1Hour``, ``15Min``, ``1Day``). The columns can use either
+    Alpaca's raw names (t, o, h, l, c, v, n, vw) or the long names (timestamp, open, high, low, close,
+    volume, trade_count, vwap).
+
+    The calendar is read from a CSV file at ``calendar_path`` with the columns date, open and close, i.e.
+    ``2022-01-03,09:30,16:00``.
+    """
+
+    bars_dir: str
+    calendar_path: str
+    _bars: dict[tuple[str, str], tuple[pd.DataFrame, np.ndarray]]
+    _calendar: Union[list[CalendarDay], None]
+
+    def __init__(self, bars_dir: str, calendar_path: str):
+        self.bars_dir = bars_dir
+        self.calendar_path = calendar_path
+
+        # Bar files and the calendar file are only read once
+        self._bars = {}
+        self._calendar = None
+
+    def get_bulk_bars(self, symbols: list[str], time_frame: TimeFrame, start_date: date,
+                      end_date: date) -> dict[str, pd.DataFrame]:
+        """
+        Returns the raw bars for all ``symbols`` between ``start_date`` and ``end_date`` (inclusive) from the
+        bar files.
+        """
+        start_date = as_date(start_date)
+        end_date = as_date(end_date)
+
+        output_dict = {}
+
+        for symbol in symbols:
+            bars, bar_dates = self._load_bars(symbol, time_frame)
+
+            in_range = (bar_dates >= np.datetime64(start_date)) & (bar_dates <= np.datetime64(end_date))
+            output_dict[symbol] = bars.loc[in_range].reset_index(drop=True)
+
+        return output_dict
+
+    def get_calendar(self, start_date: date, end_date: date) -> list[CalendarDay]:
+        """
+        Returns the days in the calendar file between ``start_date`` and ``end_date`` (inclusive).
+        """
+        start_date = as_date(start_date)
+        end_date = as_date(end_date)
+
+        if self._calendar is None:
+            calendar_df = pd.read_csv(self.calendar_path, dtype=str)
+            self._calendar = sorted(
+                (CalendarDay(
+                    date.fromisoformat(row.date),
+                    time.fromisoformat(row.open),
+                    time.fromisoformat(row.close))
+                 for row in calendar_df.itertuples(index=False)),
+                key=lambda day: day.date)
+
+        return [day for day in self._calendar if start_date <= day.date <= end_date]
+
+    def get_calendar_cache_key(self) -> str:
+        """
+        Calendar files are identified by their absolute path.
+        """
+        return f"{type(self).__name__}:{os.path.abspath(self.calendar_path)}"
+
+    def _load_bars(self, symbol: str, time_frame: TimeFrame) -> tuple[pd.DataFrame, np.ndarray]:
+        """
+        Reads (and memoizes) the bar file for one symbol and time frame. Returns the raw bars along with the
+        UTC date of every bar, which is used to filter the bars by date.
+        """
+        key = (symbol, str(time_frame))
+
+        if key not in self._bars:
+            symbol_dir = os.path.join(self.bars_dir, str(time_frame))
+            parquet_path = os.path.join(symbol_dir, f"{symbol}.parquet")
+            csv_path = os.path.join(symbol_dir, f"{symbol}.csv")
+
+            if os.path.exists(parquet_path):
+                bars = pd.read_parquet(parquet_path)
+            elif os.path.exists(csv_path):
+                bars = pd.read_csv(csv_path)
+            else:
+                raise FileNotFoundError(
+                    f"No bar file found for {symbol} with a time frame of {time_frame}. Expected either "
+                    f"{parquet_path} or {csv_path}")
+
+            bars = bars.rename(columns=LONG_TO_RAW_COLUMN_NAMES)[RAW_BAR_COLUMNS]
+
+            # Store timestamps the same way the Alpaca client returns them, as UTC datetimes
+            timestamps = pd.to_datetime(bars["t"], utc=True)
+            order = timestamps.argsort(kind="stable")
+            bars["t"] = timestamps
+            bars = bars.iloc[order].reset_index(drop=True)
+
+            bar_dates = timestamps.iloc[order].dt.tz_convert(None).to_numpy().astype("datetime64[D]")
+
+            self._bars[key] = (bars, bar_dates)
+
+        return self._bars[key]
@@ -1,13 +1,26 @@
+from __future__ import annotations
+
+import json
+import os
+from bisect import bisect_left, bisect_right
 from dataclasses import dataclass
-from datetime import date, datetime
-from typing import no_type_check
+from datetime import date, datetime, time, timedelta
+from typing import Union
 
-from alpaca_trade_api import entity
-from pytz import timezone
+import numpy as np
+import pandas as pd
 
-from monte.api import AlpacaAPIBundle
+from monte.bar_cache import MARKET_TIME_ZONE, as_date
+from monte.data_sources import CalendarDay
 from monte.machine_settings import MachineSettings
 
+# Calendars are always loaded starting from this date, so the start buffer before the earliest allowed
+# simulation start date (Jan 1st, 2016) is covered.
+CALENDAR_START_DATE = date(2015, 1, 1)
+
+# In-process calendar indexes, keyed by DataSource.get_calendar_cache_key()
+_trading_calendars: dict[str, TradingCalendar] = {}
+
 
 @dataclass
 class TradingDay():
@@ -21,71 +34,258 @@ class TradingDay():
     close_time: datetime
 
 
+@dataclass
+class TradingDayTable():
+    """
+    A column-oriented version of a list of TradingDays, meant for vectorized lookups. ``dates`` is a sorted
+    array of datetime64[D] values, while ``open_times`` and ``close_times`` hold the matching market open and
+    close times as int64 nanoseconds since the epoch (UTC).
+    """
+    dates: np.ndarray
+    open_times: np.ndarray
+    close_times: np.ndarray
+
+
+class TradingCalendar():
+    """
+    An index of the market calendar between ``start_date`` and ``end_date``. The trading days are stored as
+    sorted arrays so that range and nearest-trading-day queries are binary searches. A calendar is loaded
+    once per process (see ``get_trading_calendar()``) and can be saved to disk between runs.
+
+    ``fetch_date`` is the market date the calendar was fetched on. Days before it had already happened, so
+    they never change, but later days can (closures announced later, early closes, etc.).
+    """
+
+    start_date: date
+    end_date: date
+    fetch_date: date
+    calendar_days: list[CalendarDay]
+    trading_days: list[TradingDay]
+    dates: list[date]
+    table: TradingDayTable
+
+    def __init__(self, calendar_days: list[CalendarDay], start_date: date, end_date: date, fetch_date: date):
+        # The range of dates this calendar is known to be complete for
+        self.start_date = start_date
+        self.end_date = end_date
+        self.fetch_date = fetch_date
+
+        self.calendar_days = sorted(calendar_days, key=lambda day: day.date)
+        self.trading_days = _get_trading_day_obj_list_from_date_list(self.calendar_days)
+        self.dates = [trading_day.date for trading_day in self.trading_days]
+        self.table = get_trading_day_table(self.trading_days)
+
+    def covers(self, start_date: date, end_date: date) -> bool:
+        """
+        Returns True if this calendar is complete between ``start_date`` and ``end_date``.
+        """
+        return self.start_date <= start_date and end_date <= self.end_date
+
+    def is_current(self, end_date: date, current_date: date) -> bool:
+        """
+        Returns True if the days up to ``end_date`` can still be trusted on ``current_date``, either because
+        they had already happened when the calendar was fetched or because it was fetched on ``current_date``.
+        """
+        return end_date < self.fetch_date or current_date <= self.fetch_date
+
+    def get_trading_days_in_range(self, start_date: date, end_date: date) -> list[TradingDay]:
+        """
+        Returns the TradingDays between ``start_date`` and ``end_date`` (inclusive).
+        """
+        start_index, end_index = self._get_index_range(start_date, end_date)
+        return self.trading_days[start_index:end_index]
+
+    def get_table_in_range(self, start_date: date, end_date: date) -> TradingDayTable:
+        """
+        Returns a TradingDayTable holding the TradingDays between ``start_date`` and ``end_date``
+        (inclusive).
+        """
+        start_index, end_index = self._get_index_range(start_date, end_date)
+        return TradingDayTable(
+            self.table.dates[start_index:end_index],
+            self.table.open_times[start_index:end_index],
+            self.table.close_times[start_index:end_index])
+
+    def get_trading_days_before(self, day: date, num_days: int) -> list[TradingDay]:
+        """
+        Returns the ``num_days`` TradingDays immediately before ``day`` (not including ``day`` itself).
+        """
+        end_index = bisect_left(self.dates, day)
+
+        if end_index < num_days:
+            raise ValueError(f"The market calendar has fewer than {num_days} trading days before {day}")
+
+        return self.trading_days[end_index - num_days:end_index]
+
+    def save(self, path: str):
+        """
+        Saves the calendar to a JSON file at ``path``.
+        """
+        calendar_dict = {
+            "start_date": self.start_date.isoformat(),
+            "end_date": self.end_date.isoformat(),
+            "fetch_date": self.fetch_date.isoformat(),
+            "days": [
+                [day.date.isoformat(), day.open.strftime("%H:%M"), day.close.strftime("%H:%M")]
+                for day in self.calendar_days
+            ]
+        }
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        # Write to a temporary file first so other processes never read a half-written calendar
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w") as calendar_file:
+            json.dump(calendar_dict, calendar_file)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> TradingCalendar:
+        """
+        Loads a calendar that was saved with ``save()``.
+        """
+        with open(path, "r") as calendar_file:
+            calendar_dict = json.load(calendar_file)
+
+        calendar_days = [
+            CalendarDay(date.fromisoformat(day), time.fromisoformat(open_time), time.fromisoformat(close_time))
+            for day, open_time, close_time in calendar_dict["days"]
+        ]
+
+        # Calendars saved before the fetch date was recorded can only be trusted for their first day
+        return cls(
+            calendar_days,
+            date.fromisoformat(calendar_dict["start_date"]),
+            date.fromisoformat(calendar_dict["end_date"]),
+            date.fromisoformat(calendar_dict.get("fetch_date", calendar_dict["start_date"])))
+
+    def _get_index_range(self, start_date: date, end_date: date) -> tuple[int, int]:
+        """
+        Returns the (start, end) slice indexes of the trading days between ``start_date`` and ``end_date``
+        (inclusive).
+        """
+        return bisect_left(self.dates, start_date), bisect_right(self.dates, end_date)
+
+
+def get_trading_calendar(machine_settings: MachineSettings, start_date: Union[date, datetime],
+                         end_date: Union[date, datetime]) -> TradingCalendar:
+    """
+    Returns the calendar index for the machine's data source, making sure it covers ``start_date`` to
+    ``end_date``. The index is kept in memory for the life of the process and is saved to disk (if the data
+    source has a calendar cache path), so the data source is only asked for the calendar when the range is
+    not covered yet. Days from the calendar's fetch date on are fetched again once that date has passed, so
+    later changes to the schedule are picked up.
+    """
+    start_date = as_date(start_date)
+    end_date = as_date(end_date)
+    current_date = datetime.now(MARKET_TIME_ZONE).date()
+
+    data_source = machine_settings.data_source
+    cache_key = data_source.get_calendar_cache_key()
+    cache_path = data_source.get_calendar_cache_path()
+
+    # In-process index
+    calendar = _trading_calendars.get(cache_key)
+    if (calendar is not None and calendar.covers(start_date, end_date) and
+            calendar.is_current(end_date, current_date)):
+        return calendar
+
+    # On-disk index
+    if calendar is None and cache_path is not None and os.path.exists(cache_path):
+        calendar = TradingCalendar.load(cache_path)
+        _trading_calendars[cache_key] = calendar
+
+        if calendar.covers(start_date, end_date) and calendar.is_current(end_date, current_date):
+            return calendar
+
+    # Get a wide range of the calendar from the data source in one request, so later queries are covered too
+    new_start_date = min(start_date, CALENDAR_START_DATE)
+    new_end_date = max(end_date, date(date.today().year + 1, 12, 31))
+
+    # The days of the current calendar that had already happened when it was fetched are kept, and only the
+    # rest is fetched again
+    if calendar is not None:
+        new_start_date = min(new_start_date, calendar.start_date)
+        new_end_date = max(new_end_date, calendar.end_date)
+
+    kept_days = []
+    fetch_start_date = new_start_date
+    if calendar is not None and calendar.start_date <= new_start_date:
+        fetch_start_date = max(
+            calendar.start_date, min(calendar.fetch_date, calendar.end_date + timedelta(days=1)))
+        kept_days = [day for day in calendar.calendar_days if day.date < fetch_start_date]
+
+    raw_market_days = kept_days + _get_raw_trading_dates_in_range(
+        machine_settings, fetch_start_date, new_end_date)
+    calendar = TradingCalendar(raw_market_days, new_start_date, new_end_date, current_date)
+    _trading_calendars[cache_key] = calendar
+
+    if cache_path is not None:
+        calendar.save(cache_path)
+
+    return calendar
+
+
 def get_list_of_trading_days_in_range(machine_settings: MachineSettings,
                                       start_date: date, end_date: date) -> list[TradingDay]:
     """
     Returns a list of days (as TradingDay instances) that U.S. markets are open between the start and end
     dates provided. The result is inclusive of both the start and end dates.
     """
-    raw_market_days = _get_raw_trading_dates_in_range(machine_settings, start_date, end_date)
-    return _get_trading_day_obj_list_from_date_list(raw_market_days)
+    calendar = get_trading_calendar(machine_settings, start_date, end_date)
+    return calendar.get_trading_days_in_range(as_date(start_date), as_date(end_date))
+
+
+def get_trading_day_table_in_range(machine_settings: MachineSettings,
+                                   start_date: date, end_date: date) -> TradingDayTable:
+    """
+    Returns a TradingDayTable of the days that U.S. markets are open between the start and end dates
+    provided. The result is inclusive of both the start and end dates.
+    """
+    calendar = get_trading_calendar(machine_settings, start_date, end_date)
+    return calendar.get_table_in_range(as_date(start_date), as_date(end_date))
+
+
+def get_trading_days_before(machine_settings: MachineSettings, day: date,
+                            num_days: int) -> list[TradingDay]:
+    """
+    Returns the ``num_days`` days (as TradingDay instances) that U.S. markets were open immediately before
+    ``day``, not including ``day`` itself.
+    """
+    # There are always more than 4 trading days in a week, so this range is guaranteed to hold num_days
+    calendar = get_trading_calendar(
+        machine_settings, as_date(day) - timedelta(days=2 * num_days + 30), day)
+    return calendar.get_trading_days_before(as_date(day), num_days)
 
 
 def _get_raw_trading_dates_in_range(machine_settings: MachineSettings,
-                                    start_date: date, end_date: date) -> list[entity.Calendar]:
+                                    start_date: date, end_date: date) -> list[CalendarDay]:
     """
     This should not be used by end-users.
 
-    Returns a list of days (as alpaca_trade_api.Calendar instances) that U.S. markets are open between the
-    start and end dates provided. The result is inclusive of both the start and end dates.
+    Returns a list of days (as CalendarDay instances) that U.S. markets are open between the start and end
+    dates provided, as reported by the machine's data source. The result is inclusive of both the start and
+    end dates.
     """
-    return machine_settings.alpaca_api.trading.get_calendar(start_date.isoformat(), end_date.isoformat())
+    return machine_settings.data_source.get_calendar(start_date, end_date)
 
 
-@no_type_check
-def _get_trading_day_obj_list_from_date_list(
-        calendar_instance_list: list[entity.Calendar]) -> list[TradingDay]:
+def _get_trading_day_obj_list_from_date_list(calendar_day_list: list[CalendarDay]) -> list[TradingDay]:
     """
-    Converts a list of alpaca_trade_api.Calendar instances into a list of TradingDay instances.
+    Converts a list of CalendarDay instances into a list of TradingDay instances.
     """
     trading_days = []
 
-    for day in calendar_instance_list:
+    for day in calendar_day_list:
 
-        # Create a date object (from the datetime library) for the calendar date of the
-        # market day
-        trading_date = date(
-            # Types are ignored because the Alpaca API is using a non-type-hinted __getattr__ function
-            # so Pylance freaks out when it doesn't need to.
-            day.date.year,  # type: ignore
-            day.date.month,  # type: ignore
-            day.date.day  # type: ignore
-        )
-
-        # Grab the DST-aware timezone object for eastern time
-        timezone_ET = timezone("America/New_York")
+        # The calendar date of the market day
+        trading_date = day.date
 
         # Create a datetime object for the opening time with the timezone info attached
-        open_time = timezone_ET.localize(datetime(
-            # Types are ignored because the Alpaca API is using a non-type-hinted __getattr__ function
-            # so Pylance freaks out when it doesn't need to.
-            day.date.year,  # type: ignore
-            day.date.month,  # type: ignore
-            day.date.day,  # type: ignore
-            day.open.hour,  # type: ignore
-            day.open.minute  # type: ignore
-        ))
+        open_time = MARKET_TIME_ZONE.localize(datetime.combine(trading_date, day.open))
 
         # Create a datetime object for the closing time with the timezone info attached
-        close_time = timezone_ET.localize(datetime(
-            # Types are ignored because the Alpaca API is using a non-type-hinted __getattr__ function
-            # so Pylance freaks out when it doesn't need to.
-            day.date.year,  # type: ignore
-            day.date.month,  # type: ignore
-            day.date.day,  # type: ignore
-            day.close.hour,  # type: ignore
-            day.close.minute  # type: ignore
-        ))
+        close_time = MARKET_TIME_ZONE.localize(datetime.combine(trading_date, day.close))
 
         # Create a TradingDay object with the right open/close times and append it to
         # the list of all such TradingDay objects within the span between start_date and
@@ -96,6 +296,29 @@ def _get_trading_day_obj_list_from_date_list(
     return trading_days
 
 
+def get_trading_day_table(trading_days: list[TradingDay]) -> TradingDayTable:
+    """
+    Converts a list of TradingDay instances into a TradingDayTable.
+    """
+    dates = np.array([trading_day.date for trading_day in trading_days], dtype="datetime64[D]")
+    open_times = to_epoch_ns([trading_day.open_time for trading_day in trading_days])
+    close_times = to_epoch_ns([trading_day.close_time for trading_day in trading_days])
+
+    return TradingDayTable(dates, open_times, close_times)
+
+
+def to_epoch_ns(datetimes) -> np.ndarray:
+    """
+    Converts timezone-aware datetimes (a list, Series or DatetimeIndex) into an int64 array of nanoseconds
+    since the epoch (UTC).
+    """
+    if len(datetimes) == 0:
+        return np.array([], dtype=np.int64)
+
+    utc_datetimes = pd.DatetimeIndex(datetimes).tz_convert(None)
+    return np.asarray(utc_datetimes, dtype="datetime64[ns]").view(np.int64)
+
+
 def get_list_of_buffer_ranges(machine_settings: MachineSettings, buffer_length: int, start_date: date,
                               end_date: date) -> list[tuple[date, date]]:
     """
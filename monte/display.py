@@ -1,10 +1,59 @@
 from __future__ import annotations
 
+import io
+import threading
 from datetime import datetime
+from typing import Any, TextIO
 
 from monte.broker import Broker
 
 
+class AlgorithmOutput():
+    """
+    Stands in for ``sys.stdout`` while algorithms run on a thread pool (see ``AlgorithmScheduler``). What each
+    algorithm prints (like ``print_total_value()``) is held in a buffer of its own instead of being interleaved
+    with the output of the algorithms on the other threads. ``write_out()`` then writes the buffers to
+    ``stream`` in the order the algorithms were added, which is the order a serial run prints in. Output from
+    threads that aren't running an algorithm goes straight to ``stream``.
+    """
+
+    stream: TextIO
+    _buffers: dict[int, io.StringIO]
+
+    def __init__(self, stream: TextIO):
+        self.stream = stream
+        self._buffers = {}
+        self._local = threading.local()
+
+    def start_algorithm(self, algo_index: int):
+        """
+        Sends what the current thread prints from now on to the buffer of the algorithm at ``algo_index``.
+        """
+        self._local.buffer = self._buffers.setdefault(algo_index, io.StringIO())
+
+    def write_out(self):
+        """
+        Writes the buffers to ``stream`` in algorithm order and empties them.
+        """
+        for algo_index in sorted(self._buffers):
+            self.stream.write(self._buffers[algo_index].getvalue())
+
+        self._buffers = {}
+        self.stream.flush()
+
+    def write(self, text: str) -> int:
+        buffer = getattr(self._local, "buffer", None)
+        return (self.stream if buffer is None else buffer).write(text)
+
+    def flush(self):
+        if getattr(self._local, "buffer", None) is None:
+            self.stream.flush()
+
+    def __getattr__(self, name: str) -> Any:
+        # Everything else (encoding, isatty(), etc.) comes from the real stream
+        return getattr(self.stream, name)
+
+
 def print_total_value(name: str, broker: Broker, current_datetime: datetime):
     print(
         f"{current_datetime.date()} {current_datetime.hour:02d}:{current_datetime.minute:02d} | "
@@ -10,8 +10,10 @@ from monte.algorithm import Algorithm
 from monte.api import AlpacaAPIBundle
 from monte.asset_manager import AssetManager, DataDestination
 from monte.broker import Broker
+from monte.column import clear_column_caches
 from monte.machine_settings import MachineSettings
 from monte.portfolio import Portfolio
+from monte.scheduler import AlgorithmScheduler
 
 
 class TradingMachine():
@@ -23,6 +25,7 @@ class TradingMachine():
     machine_settings: MachineSettings
     asset_manager: AssetManager
     algo_instances: list[Algorithm]
+    scheduler: AlgorithmScheduler
     epoch_start_time: float
     _results_df: pd.DataFrame
 
@@ -61,6 +64,9 @@ class TradingMachine():
         # Note the start time of the trading machine
         self.epoch_start_time = time.time()
 
+        # Results cached by column functions are only valid for the simulation they were calculated in
+        clear_column_caches()
+
         # Run startup code for algorithms
         for algo in self.algo_instances:
             algo.startup()
@@ -76,59 +82,61 @@ class TradingMachine():
         # is constructed and spawned with all of the assets it needs to get data for as an argument.
         self.asset_manager.startup()
 
+        # Decides which algorithms run on each time frame of the testing phase. This needs the asset_manager's
+        # clock, so it must happen after am.startup() is called.
+        self.scheduler = AlgorithmScheduler(self.algo_instances, self.asset_manager)
+
     # TODO: run_as_process function to run the trading machine on a separate process
     def run(self):
         """
         Runs the trading machine, start to finish.
         """
 
-        # Run Machine startup code
-        self.startup()
-
-        algos_have_been_trained = False
-        first_iteration = True
-
-        # Run the algorithms
-        while True:
+        # If the simulation stops early, the asset manager still has to stop its processes and free the shared
+        # memory of the buffers that were never used
+        try:
+            # Run Machine startup code
+            self.startup()
 
-            # Update the dataframes in the asset_manager
-            try:
-                self.asset_manager.increment_dataframes()
-            except StopIteration:
+            algos_have_been_trained = False
 
-                # If the algorithms were never trained, train them
-                if not algos_have_been_trained:
-                    self._train_algos()
+            if self.asset_manager.data_destination is DataDestination.TRAINING_DATA:
+                print("Entering training phase of the simulation, downloading training data.")
 
-                break
+            # Run the algorithms
+            while True:
 
-            # Runs on the first iteration if starting from the training data phase
-            if first_iteration and self.asset_manager.data_destination is DataDestination.TRAINING_DATA:
-                print("Entering training phase of the simulation, downloading training data.")
-                first_iteration = False
+                # Update the dataframes in the asset_manager
+                try:
+                    # No algorithm runs until the testing phase, so the training data can be loaded in bulk
+                    if (self.machine_settings.fast_forward_training and
+                            self.asset_manager.data_destination is DataDestination.TRAINING_DATA):
+                        self.asset_manager.fast_forward_training_data()
 
-            # If the asset_manager is in the testing data phase, run all of the algorithms
-            elif self.asset_manager.data_destination is DataDestination.TESTING_DATA:
+                    self.asset_manager.increment_dataframes()
+                except StopIteration:
 
-                # Runs if the trading_machine just entered the testing data phase.
-                if not algos_have_been_trained:
-                    print("Calling train() on all algorithms.")
-                    self._train_algos()
-                    algos_have_been_trained = True
-                    print("Entering testing phase of the simulation.")
+                    # If the algorithms were never trained, train them
+                    if not algos_have_been_trained:
+                        self._train_algos()
 
-                # Process any orders and run each algorithm
-                for algo in self.algo_instances:
+                    break
 
-                    # Process pending orders
-                    processed_orders = algo.get_broker().process_pending_orders()
+                # If the asset_manager is in the testing data phase, run all of the algorithms
+                if self.asset_manager.data_destination is DataDestination.TESTING_DATA:
 
-                    # Remove any empty positions in the portfolio
-                    algo.get_broker().portfolio._delete_empty_positions()
+                    # Runs if the trading_machine just entered the testing data phase.
+                    if not algos_have_been_trained:
+                        print("Calling train() on all algorithms.")
+                        self._train_algos()
+                        algos_have_been_trained = True
+                        print("Entering testing phase of the simulation.")
 
-                    # Run the algorithm
-                    current_datetime = self.asset_manager.latest_datetime
-                    algo.run_one_time_frame(current_datetime, processed_orders)
+                    # Process any orders and run each algorithm that is due on this time frame
+                    self.scheduler.run_tick()
+        except BaseException:
+            self.asset_manager.cleanup()
+            raise
 
         # Run Machine cleanup code
         self.cleanup()
@@ -158,6 +166,9 @@ class TradingMachine():
         for algo in self.algo_instances:
             algo.cleanup()
 
+        # Stop the threads the algorithms ran on
+        self.scheduler.close()
+
         # Run cleanup code for asset_manager
         self.asset_manager.cleanup()
 
@@ -1,11 +1,23 @@
-import math
 from datetime import datetime
+from enum import Enum
+from typing import Union
 
 import pytz
 from alpaca_trade_api import TimeFrame, TimeFrameUnit
 
 from monte.api import AlpacaAPIBundle
 from monte.column import Column
+from monte.column_plan import ColumnPlan
+from monte.data_sources import AlpacaDataSource, DataSource
+
+
+class MissingBarPolicy(Enum):
+    """
+    An Enum holding the ways a tick of the simulation clock that a symbol has no bar for can be handled.
+    """
+    FORWARD_FILL = 'forward_fill'
+    NAN = 'nan'
+    DROP = 'drop'
 
 
 class MachineSettings():
@@ -14,24 +26,38 @@ class MachineSettings():
     settings.
     """
 
-    alpaca_api: AlpacaAPIBundle
+    alpaca_api: Union[AlpacaAPIBundle, None]
+    data_source: DataSource
     start_date: datetime
     end_date: datetime
     training_data_percentage: float
     time_frame: TimeFrame
     derived_columns: dict[str, Column]
+    column_plan: ColumnPlan
     max_rows_in_test_df: int
-    start_buffer_days: int
+    warmup_rows: int
     data_buffer_days: int
+    prefetch_window: int
+    max_queued_buffer_bytes: int
+    missing_bar_policy: MissingBarPolicy
+    fast_forward_training: bool
+    num_asset_workers: int
+    num_algorithm_threads: int
     time_zone: pytz.tzinfo.BaseTzInfo
 
     # TODO: Default to user's current timezone instead of US/Eastern
 
     def __init__(
-            self, alpaca_api: AlpacaAPIBundle, start_date: datetime, end_date: datetime,
+            self, alpaca_api: Union[AlpacaAPIBundle, None], start_date: datetime, end_date: datetime,
             training_data_percentage: float, time_frame: TimeFrame, derived_columns: dict[str, Column] = {},
-            max_rows_in_test_df: int = 10, time_zone: pytz.tzinfo.BaseTzInfo = pytz.timezone('US/Eastern')):
+            max_rows_in_test_df: int = 10, time_zone: pytz.tzinfo.BaseTzInfo = pytz.timezone('US/Eastern'),
+            data_source: Union[DataSource, None] = None, prefetch_window: Union[int, None] = None,
+            max_queued_buffer_bytes: int = 512 * 1024 * 1024,
+            missing_bar_policy: MissingBarPolicy = MissingBarPolicy.FORWARD_FILL,
+            fast_forward_training: bool = True, num_asset_workers: int = 1,
+            num_algorithm_threads: int = 1):
         self.alpaca_api = alpaca_api
+        self.data_source = self.resolve_data_source(data_source)
         self.start_date = start_date
         self.end_date = end_date
         self.training_data_percentage = training_data_percentage
@@ -48,14 +74,59 @@ class MachineSettings():
         # Add timezone info to start_date and end_date
         self.add_tz_info_to_dates()
 
-        # Derive the start buffer days
-        self.start_buffer_days = self.calculate_start_buffer_days()
+        # Work out the order the derived columns are calculated in
+        self.compile_column_plan()
+
+        # Derive the number of warmup rows
+        self.warmup_rows = self.calculate_warmup_rows()
 
         # Derive the data buffer days
         self.data_buffer_days = self.calculate_data_buffer_days()
 
         self.validate_data_buffer_days()
 
+        # Derive the number of data buffers that can be requested at the same time
+        self.prefetch_window = self.calculate_prefetch_window(prefetch_window)
+
+        # The maximum number of bytes of buffer data that can wait in the buffer queue at once
+        self.max_queued_buffer_bytes = max_queued_buffer_bytes
+        self.validate_max_queued_buffer_bytes()
+
+        # How to handle bars that one symbol is missing but other symbols have
+        self.missing_bar_policy = missing_bar_policy
+        self.validate_missing_bar_policy()
+
+        # Whether the training data is loaded in bulk instead of one row at a time
+        self.fast_forward_training = fast_forward_training
+        self.validate_fast_forward_training()
+
+        # The number of worker processes the watched assets are split between. With 1, everything runs in the
+        # main process.
+        self.num_asset_workers = num_asset_workers
+        self.validate_num_asset_workers()
+
+        # The number of threads the algorithms that run on a time frame are split between. With 1, the algorithms
+        # run one after another in the main thread. Because of the GIL, more threads only help algorithms that
+        # spend their time in code that releases it (like numpy, pandas or scikit-learn).
+        self.num_algorithm_threads = num_algorithm_threads
+        self.validate_num_algorithm_threads()
+
+    def resolve_data_source(self, data_source: Union[DataSource, None]) -> DataSource:
+        """
+        Returns the data source the trading machine should get bars and the market calendar from. Defaults
+        to the Alpaca API if no data source is provided.
+        """
+        if data_source is not None:
+            if not isinstance(data_source, DataSource):
+                raise TypeError("The data source must be an instance of monte.data_sources.DataSource")
+
+            return data_source
+
+        if self.alpaca_api is None:
+            raise ValueError("Either alpaca_api or data_source must be provided.")
+
+        return AlpacaDataSource(self.alpaca_api)
+
     def validate_dates(self):
         """
         Checks that ``self.start_date`` and ``self.end_date`` are valid and can be used in the trading
@@ -119,65 +190,78 @@ class MachineSettings():
                 f"Data buffers need to be greater than or equal to 7 days. The current data buffer is "
                 f"{self.data_buffer_days} days")
 
-    def add_tz_info_to_dates(self):
+    def validate_max_queued_buffer_bytes(self):
         """
-        Adds timezone info to ``self.start_date`` and ``self.end_date``.
+        Checks that ``self.max_queued_buffer_bytes`` is valid and can be used in the trading machine.
         """
-        self.start_date = self.start_date.replace(tzinfo=self.time_zone)
-        self.end_date = self.end_date.replace(tzinfo=self.time_zone)
+        if self.max_queued_buffer_bytes < 1:
+            raise ValueError(
+                f"The maximum number of queued buffer bytes must be at least 1. The current value is "
+                f"{self.max_queued_buffer_bytes}")
 
-    def calculate_start_buffer_days(self) -> int:
+    def validate_missing_bar_policy(self):
         """
-        Calculates the number of start buffer days needed based on ``self.max_rows_in_test_df`` and
-        ``self.rows_per_day()``.
+        Checks that ``self.missing_bar_policy`` is valid and can be used in the trading machine.
         """
-        # Get the number of start buffer days needed to make the derived columns in the test df run correctly.
-        # During the testing phase, all of the derived columns already have data to use and
-        rows_per_day = self.get_rows_per_day()
-        days_needed_for_test_df = math.ceil(self.max_rows_in_test_df / rows_per_day)
-
-        max_days_needed_by_derived_columns = 0
-        for derived_column in self.derived_columns.values():
-            # Get the number of days needed by the current derived column
-            days_needed_by_derived_column = self.get_start_buffer_days_needed_by_derived_column(
-                derived_column, rows_per_day)
+        if not isinstance(self.missing_bar_policy, MissingBarPolicy):
+            raise TypeError("The missing bar policy must be a member of the MissingBarPolicy enum.")
 
-            # Update the maximum number of days needed by any derived column
-            max_days_needed_by_derived_columns = max(
-                max_days_needed_by_derived_columns, days_needed_by_derived_column)
+    def validate_fast_forward_training(self):
+        """
+        Checks that ``self.fast_forward_training`` is valid and can be used in the trading machine.
+        """
+        if not isinstance(self.fast_forward_training, bool):
+            raise TypeError("fast_forward_training must be a bool.")
 
-        # Set the start buffer days to the maximum of the days needed by the testing df and the days needed
-        # by the derived columns
-        start_buffer_days = max(days_needed_for_test_df, max_days_needed_by_derived_columns)
+    def validate_num_asset_workers(self):
+        """
+        Checks that ``self.num_asset_workers`` is valid and can be used in the trading machine.
+        """
+        if not isinstance(self.num_asset_workers, int) or isinstance(self.num_asset_workers, bool):
+            raise TypeError("num_asset_workers must be an int.")
 
-        return start_buffer_days
+        if self.num_asset_workers < 1:
+            raise ValueError(
+                f"The number of asset workers must be at least 1. The current value is {self.num_asset_workers}")
 
-    def get_start_buffer_days_needed_by_derived_column(self, dcol: Column, rows_per_day: int) -> int:
+    def validate_num_algorithm_threads(self):
         """
-        Returns the number of start buffer days needed by a derived column and its entire dependency tree.
-
-        If a derived column needs 10 days and it depends on a column that needs 20 days, this will return 30
-        days.
+        Checks that ``self.num_algorithm_threads`` is valid and can be used in the trading machine.
         """
-        parent_column_days_needed = 0
+        if not isinstance(self.num_algorithm_threads, int) or isinstance(self.num_algorithm_threads, bool):
+            raise TypeError("num_algorithm_threads must be an int.")
 
-        # If the derived column has dependencies
-        if dcol.column_dependencies:
-            # For each column it depends on
-            for column_title in dcol.column_dependencies:
+        if self.num_algorithm_threads < 1:
+            raise ValueError(
+                f"The number of algorithm threads must be at least 1. The current value is "
+                f"{self.num_algorithm_threads}")
 
-                # Calculate how many start buffer days the depended column needs
-                column_obj = self.derived_columns[column_title]
-                dependent_column_days_needed = self.get_start_buffer_days_needed_by_derived_column(
-                    column_obj, rows_per_day)
+    def add_tz_info_to_dates(self):
+        """
+        Adds timezone info to ``self.start_date`` and ``self.end_date``.
+        """
+        self.start_date = self.start_date.replace(tzinfo=self.time_zone)
+        self.end_date = self.end_date.replace(tzinfo=self.time_zone)
 
-                # Update the parent column days needed to be the max of all of the depended columns days
-                parent_column_days_needed = max(parent_column_days_needed, dependent_column_days_needed)
+    def calculate_warmup_rows(self) -> int:
+        """
+        Calculates the number of rows of data (the warmup rows) that are added before the simulation's start
+        date. With that many rows, every derived column has a value on the first row of the simulation, and so
+        does every row of a full testing dataframe. The column plan knows after how many rows each derived
+        column is sure to have a value, following its whole dependency chain.
+        """
+        rows_needed_by_derived_columns = max([1] + [step.filled_row_count for step in self.column_plan])
 
-        # Add the days needed by the parent derived column itself to the total
-        parent_column_days_needed += math.ceil(dcol.num_rows_needed / rows_per_day)
+        # The oldest row of a full testing dataframe on the first row of the simulation is the first row that
+        # needs to have every derived column, so the rows before it are warmup rows too
+        return rows_needed_by_derived_columns + self.max_rows_in_test_df - 2
 
-        return parent_column_days_needed
+    def compile_column_plan(self):
+        """
+        Compiles ``self.derived_columns`` into ``self.column_plan``, the order the derived columns are
+        calculated in. Raises a ValueError if the derived columns depend on each other in a circle.
+        """
+        self.column_plan = ColumnPlan.compile(self.derived_columns)
 
     def get_rows_per_day(self) -> int:
         """
@@ -226,11 +310,26 @@ class MachineSettings():
                 "machine_settings.time_frame.unit must be one of (TimeFrameUnit.Minute, "
                 "TimeFrameUnit.Hour, TimeFrameUnit.Day)")
 
+    def calculate_prefetch_window(self, prefetch_window: Union[int, None]) -> int:
+        """
+        Returns the number of data buffers the data getter process keeps in flight at once. Defaults to the
+        number of concurrent requests the data source supports (i.e. one per Alpaca API key pair), but never
+        less than 2 so that the next buffer is always being fetched while the current one is delivered.
+        """
+        if prefetch_window is None:
+            return max(2, self.data_source.get_max_concurrent_requests())
+
+        if prefetch_window < 1:
+            raise ValueError(
+                f"The prefetch window must be at least 1. The current value is {prefetch_window}")
+
+        return prefetch_window
+
     def add_derived_columns(self, new_columns: dict[str, Column]):
         """
         Adds derived columns contained in ``new_columns`` to ``self.derived_columns`` if the column names
-        have no clashes. Also updates ``self.max_rows_in_test_df`` and ``self.start_buffer_days`` based on
-        the new columns.
+        have no clashes. Also updates ``self.max_rows_in_test_df`` and ``self.warmup_rows`` based on the new
+        columns.
         """
         for column_title, new_derived_column in new_columns.items():
 
@@ -260,6 +359,10 @@ class MachineSettings():
         for derived_column in self.derived_columns.values():
             self.max_rows_in_test_df = max(self.max_rows_in_test_df, derived_column.num_rows_needed)
 
-        # Re-calculate the number of start buffer days needed since it is calculated based on
+        # Re-compile the column plan with the new columns. This also rejects circular dependencies before the
+        # warmup rows are calculated from the plan.
+        self.compile_column_plan()
+
+        # Re-calculate the number of warmup rows needed since it is calculated based on the column plan and
         # self.max_rows_in_test_df.
-        self.start_buffer_days = self.calculate_start_buffer_days()
+        self.warmup_rows = self.calculate_warmup_rows()
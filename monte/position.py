@@ -49,7 +49,7 @@ class Position():
         """
         Returns the most recent volume-weighted average price (vwap) of the underlying Asset.
         """
-        return self.asset_manager.get_testing_df(self.symbol).iloc[-1].vwap
+        return self.asset_manager.get_price(self.symbol)
 
     @property
     def total_value(self) -> float:
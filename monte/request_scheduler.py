@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Union
+
+# Alpaca allows 200 requests per minute for each API key pair
+ALPACA_REQUESTS_PER_MINUTE = 200
+
+# HTTP status codes that mean a request should be retried after backing off. 429 means the key is being
+# throttled, the 5xx codes are errors on Alpaca's side.
+RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+def get_backoff_delay(attempt: int, base_delay: float = 0.5, max_delay: float = 30.0) -> float:
+    """
+    Returns how long to wait before retry number ``attempt`` (starting at 0). The delay grows exponentially
+    with each attempt, up to ``max_delay``, and is randomly jittered so that many requests failing at once
+    don't all retry at the same moment.
+    """
+    delay = min(max_delay, base_delay * 2 ** attempt)
+    return random.uniform(delay / 2, delay)
+
+
+@dataclass
+class KeyUtilization():
+    """
+    A snapshot of how much of one API key pair's rate limit is being used.
+    """
+    key_index: int
+    requests_last_minute: int
+    requests_per_minute: int
+    num_requests: int
+    num_throttled: int
+    num_server_errors: int
+
+    @property
+    def utilization(self) -> float:
+        """
+        The fraction of the key's per-minute rate limit that was used in the last minute.
+        """
+        return self.requests_last_minute / self.requests_per_minute
+
+
+class TokenBucket():
+    """
+    A token bucket for one API key pair. The bucket holds up to one minute's worth of requests and refills
+    continuously at the key's rate limit. Every request takes one token.
+    """
+
+    capacity: float
+    refill_rate: float
+    tokens: float
+    blocked_until: float
+    _last_refill_time: float
+
+    def __init__(self, requests_per_minute: int):
+        self.capacity = float(requests_per_minute)
+        self.refill_rate = requests_per_minute / 60
+        self.tokens = self.capacity
+        self.blocked_until = 0.0
+        self._last_refill_time = time.monotonic()
+
+    def refill(self, now: float):
+        """
+        Adds the tokens that have accumulated since the last refill.
+        """
+        self.tokens = min(self.capacity, self.tokens + (now - self._last_refill_time) * self.refill_rate)
+        self._last_refill_time = now
+
+    def get_wait_time(self, now: float) -> float:
+        """
+        Returns the number of seconds until a token is available, 0 if one is available now.
+        """
+        if now < self.blocked_until:
+            return self.blocked_until - now
+
+        if self.tokens >= 1:
+            return 0.0
+
+        return (1 - self.tokens) / self.refill_rate
+
+    def take(self):
+        """
+        Takes one token out of the bucket.
+        """
+        self.tokens -= 1
+
+    def block(self, now: float, delay: float):
+        """
+        Stops handing out tokens for ``delay`` seconds and empties the bucket. Used when the server says the
+        key is being throttled.
+        """
+        self.blocked_until = max(self.blocked_until, now + delay)
+        self.tokens = 0.0
+
+
+class RequestScheduler():
+    """
+    Spreads requests across several API key pairs without going over any key's rate limit. Every request
+    asks the scheduler for a key first, and is sent with whichever key has the most budget left. Keys that
+    get throttled are backed off of.
+
+    The scheduler is thread-safe, so one scheduler can be shared by every thread that downloads data.
+    """
+
+    num_keys: int
+    requests_per_minute: int
+    max_retries: int
+    _buckets: list[TokenBucket]
+    _recent_requests: list[deque]
+    _num_requests: list[int]
+    _num_throttled: list[int]
+    _num_server_errors: list[int]
+    _lock: threading.Lock
+
+    def __init__(self, num_keys: int, requests_per_minute: int = ALPACA_REQUESTS_PER_MINUTE,
+                 max_retries: int = 8):
+        if num_keys < 1:
+            raise ValueError("A RequestScheduler needs at least one API key pair.")
+
+        self.num_keys = num_keys
+        self.requests_per_minute = requests_per_minute
+        self.max_retries = max_retries
+
+        self._buckets = [TokenBucket(requests_per_minute) for _ in range(num_keys)]
+
+        # The times of the requests sent with each key in the last minute, for reporting utilization
+        self._recent_requests = [deque() for _ in range(num_keys)]
+
+        self._num_requests = [0] * num_keys
+        self._num_throttled = [0] * num_keys
+        self._num_server_errors = [0] * num_keys
+
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> dict:
+        # Locks can't be pickled, so a fresh one is made when the scheduler is unpickled
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> tuple[Union[int, None], float]:
+        """
+        Tries to take a token from the key with the most budget left. Returns the index of that key and 0 if
+        a token was taken. Otherwise, returns None and the number of seconds until a key will have budget.
+        """
+        with self._lock:
+            now = time.monotonic()
+
+            for bucket in self._buckets:
+                bucket.refill(now)
+
+            wait_times = [bucket.get_wait_time(now) for bucket in self._buckets]
+            available_keys = [key_index for key_index, wait_time in enumerate(wait_times) if wait_time == 0]
+
+            if not available_keys:
+                return None, min(wait_times)
+
+            key_index = max(available_keys, key=lambda index: self._buckets[index].tokens)
+            self._buckets[key_index].take()
+            self._record_request(key_index, now)
+
+            return key_index, 0.0
+
+    def record_failure(self, key_index: int, status_code: int, retry_after: Union[float, None] = None):
+        """
+        Records a failed request made with ``key_index``. If the key was throttled, it is not used again
+        until ``retry_after`` seconds (or a full token's worth of time) have passed.
+        """
+        with self._lock:
+            if status_code == 429:
+                self._num_throttled[key_index] += 1
+
+                delay = retry_after if retry_after is not None else 60 / self.requests_per_minute
+                self._buckets[key_index].block(time.monotonic(), delay)
+
+            else:
+                self._num_server_errors[key_index] += 1
+
+    def get_utilization(self) -> list[KeyUtilization]:
+        """
+        Returns how much of the rate limit of every key pair was used in the last minute.
+        """
+        with self._lock:
+            now = time.monotonic()
+
+            utilization = []
+            for key_index in range(self.num_keys):
+                self._forget_old_requests(key_index, now)
+
+                utilization.append(KeyUtilization(
+                    key_index,
+                    len(self._recent_requests[key_index]),
+                    self.requests_per_minute,
+                    self._num_requests[key_index],
+                    self._num_throttled[key_index],
+                    self._num_server_errors[key_index]))
+
+            return utilization
+
+    def _record_request(self, key_index: int, now: float):
+        """
+        Records that a request was sent with ``key_index``.
+        """
+        self._num_requests[key_index] += 1
+        self._recent_requests[key_index].append(now)
+        self._forget_old_requests(key_index, now)
+
+    def _forget_old_requests(self, key_index: int, now: float):
+        """
+        Drops requests that are more than a minute old from the recent requests of ``key_index``.
+        """
+        recent_requests = self._recent_requests[key_index]
+        while recent_requests and recent_requests[0] <= now - 60:
+            recent_requests.popleft()
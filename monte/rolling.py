@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import sys
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Starting with Python 3.12, sum() adds floats with Neumaier's compensated summation instead of plainly adding
+# them one after another
+_PYTHON_SUM_IS_COMPENSATED = sys.version_info >= (3, 12)
+
+
+def rolling_windows(values: np.ndarray, num_rows: int) -> np.ndarray:
+    """
+    Returns a 2-D (rows x ``num_rows``) float array where row ``i`` holds ``values[i - num_rows + 1:i + 1]``,
+    oldest first. Rows that don't have ``num_rows`` values up to and including them are all NaN.
+    """
+    values = np.asarray(values, dtype=np.float64)
+
+    windows = np.full((len(values), num_rows), np.nan)
+    if num_rows <= len(values):
+        windows[num_rows - 1:] = sliding_window_view(values, num_rows)
+
+    return windows
+
+
+def python_sum(windows: np.ndarray) -> np.ndarray:
+    """
+    Adds up every row of ``windows`` from its last (newest) value to its first, rounding exactly the way
+    Python's ``sum()`` does when it adds the same floats in the same order.
+    """
+    num_values = windows.shape[1]
+    if num_values == 0:
+        return np.zeros(len(windows))
+
+    with np.errstate(invalid="ignore", over="ignore"):
+        total = 0.0 + windows[:, -1]
+        compensation = np.zeros(len(windows))
+
+        for column_index in range(num_values - 2, -1, -1):
+            values = windows[:, column_index]
+            new_total = total + values
+
+            if _PYTHON_SUM_IS_COMPENSATED:
+                compensation += np.where(
+                    np.abs(total) >= np.abs(values), (total - new_total) + values, (values - new_total) + total)
+
+            total = new_total
+
+        if _PYTHON_SUM_IS_COMPENSATED:
+            total = np.where((compensation != 0) & np.isfinite(compensation), total + compensation, total)
+
+    return total
+
+
+def python_pow(values: np.ndarray, exponent: float) -> np.ndarray:
+    """
+    Raises every value to ``exponent``, rounding exactly the way Python's ``**`` operator does. Python calls the
+    C library's ``pow()`` for every exponent, and so does ``np.float_power()``. ``np.power()`` doesn't: it
+    computes squares, square roots and reciprocals with dedicated instructions, which can round differently
+    (for example, ``np.power(x, 2)`` differs from ``x ** 2`` in the last bit for about 1 in 1000 values).
+    """
+    return np.float_power(np.asarray(values, dtype=np.float64), exponent)
+
+
+def python_divide(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    """
+    Divides ``numerator`` by ``denominator`` element by element. Like dividing floats in Python, this raises a
+    ZeroDivisionError instead of returning infinities if any denominator is 0.
+    """
+    if np.any(np.asarray(denominator) == 0):
+        raise ZeroDivisionError("float division by zero")
+
+    return np.divide(numerator, denominator)
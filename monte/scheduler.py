@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import sys
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Union
+
+from monte.algorithm import Algorithm
+from monte.asset_manager import AssetManager
+from monte.cadence import Cadence, Tick
+from monte.display import AlgorithmOutput
+from monte.orders import Order
+
+
+class AlgorithmScheduler():
+    """
+    Runs the algorithms on every tick of the testing phase according to their cadences (see
+    ``Algorithm.get_cadence()``).
+
+    Algorithms are grouped by cadence, and each group's cadence is checked once per tick, so algorithms that
+    aren't due cost nothing more than their share of that one check. Pending orders are still processed on
+    every tick for every algorithm that has any, so that orders always fill on the tick after they are placed.
+    The processed orders are held until the algorithm's next run and then passed into
+    ``run_one_time_frame()`` all at once.
+
+    Before anything runs on a tick, the asset manager takes a snapshot of the market data (see
+    ``AssetManager.take_snapshot()``) that the algorithms and their brokers read from. With more than one
+    algorithm thread (see ``MachineSettings.num_algorithm_threads``), the algorithms that are due are split into
+    contiguous batches that run on a thread pool, each batch in the order the algorithms were added. Every
+    algorithm only places orders with its own broker, and the brokers' orders are processed on the main thread
+    in the order the algorithms were added, so the results are the same as running the algorithms one after
+    another. What the algorithms print is buffered per algorithm and written out in that order too (see
+    ``AlgorithmOutput``).
+
+    The threads only run algorithms at the same time while they are in code that releases the GIL (like numpy,
+    pandas or scikit-learn). Algorithms that spend their time in Python code don't run any faster on more than
+    one thread.
+    """
+
+    algorithms: list[Algorithm]
+    asset_manager: AssetManager
+    num_ticks: int
+    _cadence_groups: dict[Cadence, list[int]]
+    _unreported_orders: list[list[Order]]
+    _session_open_times: set[int]
+    _session_close_times: set[int]
+    _num_threads: int
+    _executor: Union[ThreadPoolExecutor, None]
+
+    def __init__(self, algorithms: list[Algorithm], asset_manager: AssetManager):
+        self.algorithms = algorithms
+        self.asset_manager = asset_manager
+        self.num_ticks = 0
+
+        # The indices of the algorithms that use each cadence, in the order the algorithms were added
+        self._cadence_groups = {}
+        for algo_index, algo in enumerate(algorithms):
+            cadence = algo.get_cadence()
+
+            if not isinstance(cadence, Cadence):
+                raise TypeError(
+                    f"The get_cadence() method of {algo.get_name()} must return an instance of "
+                    f"monte.cadence.Cadence.")
+
+            self._cadence_groups.setdefault(cadence, []).append(algo_index)
+
+        self._unreported_orders = [[] for _ in algorithms]
+
+        # The first and last tick of every trading day of the simulation
+        machine_settings = asset_manager.machine_settings
+        session_open_times, session_close_times = asset_manager.clock.get_session_ticks(
+            machine_settings.start_date, machine_settings.end_date)
+
+        self._session_open_times = set(session_open_times.tolist())
+        self._session_close_times = set(session_close_times.tolist())
+
+        self._num_threads = min(machine_settings.num_algorithm_threads, len(algorithms))
+        self._executor = None
+        if self._num_threads > 1:
+            self._executor = ThreadPoolExecutor(max_workers=self._num_threads, thread_name_prefix="Algorithm")
+
+    def run_tick(self):
+        """
+        Processes the pending orders of every algorithm and runs the algorithms that are due on the latest tick
+        of the simulation clock.
+        """
+        self.asset_manager.take_snapshot()
+
+        tick_time = self.asset_manager.clock.latest_time
+        tick = Tick(
+            self.num_ticks,
+            self.asset_manager.latest_datetime,
+            tick_time in self._session_open_times,
+            tick_time in self._session_close_times,
+            self.asset_manager)
+
+        self.num_ticks += 1
+
+        # Each algorithm has its own broker, so processing every algorithm's orders before running any of them
+        # gives the same results as processing each algorithm's orders right before it runs
+        for algo_index, algo in enumerate(self.algorithms):
+            broker = algo.get_broker()
+
+            if broker.has_pending_orders:
+                self._unreported_orders[algo_index].extend(broker.process_pending_orders())
+
+                # Remove any empty positions in the portfolio
+                broker.portfolio._delete_empty_positions()
+
+        due_runs = []
+        for algo_index in self._get_due_algorithms(tick):
+            due_runs.append((algo_index, self._unreported_orders[algo_index]))
+            self._unreported_orders[algo_index] = []
+
+        if self._executor is None or len(due_runs) < 2:
+            self._run_algorithms(tick, due_runs)
+            return
+
+        # Split the runs into one contiguous batch per thread
+        num_batches = min(self._num_threads, len(due_runs))
+        batches = []
+        for batch_index in range(num_batches):
+            batch_start = len(due_runs) * batch_index // num_batches
+            batch_end = len(due_runs) * (batch_index + 1) // num_batches
+            batches.append(due_runs[batch_start:batch_end])
+
+        # Hold what each algorithm prints until the tick's runs are done, so that it comes out in the same order
+        # as in a serial run
+        stdout = sys.stdout
+        output = AlgorithmOutput(stdout)
+        sys.stdout = output
+
+        try:
+            futures = [self._executor.submit(self._run_algorithms, tick, batch, output) for batch in batches]
+
+            # Wait for every batch before raising the exception of the first batch that failed, if any, so that
+            # no algorithm is still running when the tick ends
+            wait(futures)
+
+        finally:
+            sys.stdout = stdout
+            output.write_out()
+
+        for future in futures:
+            future.result()
+
+    def close(self):
+        """
+        Shuts down the thread pool the algorithms run on, if there is one.
+        """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def _run_algorithms(self, tick: Tick, runs: list[tuple[int, list[Order]]],
+                        output: Union[AlgorithmOutput, None] = None):
+        """
+        Runs the algorithm of every (algorithm index, processed orders) pair in ``runs``, in order. If
+        ``output`` is given, what each algorithm prints goes to its buffer there.
+        """
+        for algo_index, processed_orders in runs:
+            if output is not None:
+                output.start_algorithm(algo_index)
+
+            self.algorithms[algo_index].run_one_time_frame(tick.datetime, processed_orders)
+
+    def _get_due_algorithms(self, tick: Tick) -> list[int]:
+        """
+        Returns the indices of the algorithms that run on ``tick``, in the order the algorithms were added.
+        """
+        due_algorithms = []
+
+        for cadence, algo_indices in self._cadence_groups.items():
+            if cadence.is_due(tick, False):
+                due_algorithms.extend(algo_indices)
+
+            # Cadences that depend on orders are checked again for each algorithm with processed orders
+            elif cadence.depends_on_orders:
+                due_algorithms.extend(
+                    algo_index for algo_index in algo_indices
+                    if self._unreported_orders[algo_index] and cadence.is_due(tick, True))
+
+        if len(self._cadence_groups) > 1:
+            due_algorithms.sort()
+
+        return due_algorithms
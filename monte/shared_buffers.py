@@ -0,0 +1,233 @@
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Union
+
+import numpy as np
+
+from monte.bar_panel import BarPanel
+
+# Every array in a shared memory segment starts on a multiple of this many bytes
+COLUMN_ALIGNMENT = 64
+
+# The names of the panel's time index arrays in a shared memory segment. Every other array is a panel field.
+TIMES_ARRAY = "times"
+TIMESTAMPS_ARRAY = "timestamps"
+
+
+@dataclass(frozen=True)
+class SharedColumn():
+    """
+    Describes where one array lives inside a shared memory segment.
+    """
+    name: str
+    dtype: str
+    shape: tuple[int, ...]
+    offset: int
+
+
+@dataclass(frozen=True)
+class SharedArraysDescriptor():
+    """
+    A small, picklable description of a set of named arrays that were published into a shared memory segment.
+    """
+    shm_name: str
+    num_bytes: int
+    columns: tuple[SharedColumn, ...]
+
+
+@dataclass(frozen=True)
+class SharedBufferDescriptor():
+    """
+    A small, picklable description of one buffer's worth of data (for all symbols) that was published into a
+    shared memory segment. This is what gets sent over the buffer queue instead of the data itself.
+
+    The segment holds the arrays of one BarPanel: the time index and one (time x symbol) array per field,
+    where the symbols are in the order of ``symbols``.
+    """
+    shm_name: str
+    num_bytes: int
+    symbols: tuple[str, ...]
+    columns: tuple[SharedColumn, ...]
+
+
+def publish_buffer(panel: BarPanel) -> SharedBufferDescriptor:
+    """
+    Copies the arrays of a panel into a new shared memory segment. The segment is handed over to whichever
+    process calls ``attach_buffer()``, which becomes responsible for freeing it. A segment that is never
+    attached must be freed with ``discard_arrays()``.
+    """
+    arrays = {TIMES_ARRAY: panel.times, TIMESTAMPS_ARRAY: panel.timestamps}
+    arrays.update(panel.fields)
+
+    arrays_descriptor = publish_arrays(arrays)
+
+    return SharedBufferDescriptor(
+        arrays_descriptor.shm_name, arrays_descriptor.num_bytes, tuple(panel.symbols), arrays_descriptor.columns)
+
+
+def attach_buffer(descriptor: SharedBufferDescriptor) -> tuple[SharedMemory, BarPanel]:
+    """
+    Attaches to a shared memory segment published with ``publish_buffer()`` and returns the segment along
+    with the panel. The panel's arrays are views into shared memory, not copies.
+
+    The segment is unlinked right away, so it is freed as soon as it is closed. Call ``release_segment()``
+    once the panel is no longer needed.
+    """
+    shm, arrays = attach_arrays(
+        SharedArraysDescriptor(descriptor.shm_name, descriptor.num_bytes, descriptor.columns))
+
+    times = arrays.pop(TIMES_ARRAY)
+    timestamps = arrays.pop(TIMESTAMPS_ARRAY)
+
+    return shm, BarPanel(list(descriptor.symbols), times, timestamps, arrays)
+
+
+def publish_arrays(arrays: dict[str, np.ndarray]) -> SharedArraysDescriptor:
+    """
+    Copies numeric (not object) arrays into a new shared memory segment. The segment is handed over to
+    whichever process calls ``attach_arrays()``, which becomes responsible for freeing it. A segment that is
+    never attached must be freed with ``discard_arrays()``.
+    """
+    # Lay the arrays out one after another
+    columns, num_bytes = _lay_out({name: (array.shape, array.dtype) for name, array in arrays.items()})
+
+    shm = SharedMemory(create=True, size=max(num_bytes, 1))
+
+    for column, array in zip(columns, arrays.values()):
+        shared_array = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf, offset=column.offset)
+        shared_array[...] = array
+
+    descriptor = SharedArraysDescriptor(shm.name, num_bytes, tuple(columns))
+
+    # The consumer owns the segment from here on. Stop this process's resource tracker from destroying the
+    # segment when this process exits, which could happen before the consumer gets to it.
+    shared_array = None
+    shm.close()
+    if os.name == "posix":
+        resource_tracker.unregister(shm._name, "shared_memory")  # type: ignore
+
+    return descriptor
+
+
+def attach_arrays(descriptor: SharedArraysDescriptor) -> tuple[SharedMemory, dict[str, np.ndarray]]:
+    """
+    Attaches to a shared memory segment published with ``publish_arrays()`` and returns the segment along with
+    the arrays, which are views into shared memory, not copies.
+
+    The segment is unlinked right away, so it is freed as soon as it is closed. Call ``release_segment()``
+    once the arrays are no longer needed.
+    """
+    shm = SharedMemory(name=descriptor.shm_name)
+
+    # Unlinking only removes the name, the memory stays mapped until the segment is closed
+    if os.name == "posix":
+        shm.unlink()
+
+    return shm, _get_arrays(shm, descriptor)
+
+
+def allocate_arrays(
+        array_types: dict[str, tuple[tuple[int, ...], np.dtype]]
+) -> tuple[SharedMemory, SharedArraysDescriptor, dict[str, np.ndarray]]:
+    """
+    Creates a new shared memory segment with room for zeroed arrays of the given shapes and dtypes, and returns
+    the segment, its descriptor and the arrays (views into the segment). Unlike ``publish_arrays()``, which
+    hands a new segment over for every set of arrays, the segment is meant to be written to over and over by
+    processes that open it with ``open_arrays()``. It stays with this process, which frees it with
+    ``free_segment()``.
+    """
+    columns, num_bytes = _lay_out(array_types)
+
+    shm = SharedMemory(create=True, size=max(num_bytes, 1))
+    descriptor = SharedArraysDescriptor(shm.name, num_bytes, tuple(columns))
+
+    arrays = _get_arrays(shm, descriptor)
+    for array in arrays.values():
+        array[...] = 0
+
+    return shm, descriptor, arrays
+
+
+def open_arrays(descriptor: SharedArraysDescriptor) -> tuple[SharedMemory, dict[str, np.ndarray]]:
+    """
+    Opens a shared memory segment created with ``allocate_arrays()`` in another process and returns the segment
+    along with the arrays, which are views into shared memory. The segment is left linked, since it belongs to
+    the process that allocated it. Call ``release_segment()`` once the arrays are no longer needed.
+    """
+    shm = SharedMemory(name=descriptor.shm_name)
+
+    return shm, _get_arrays(shm, descriptor)
+
+
+def discard_arrays(descriptor: Union[SharedArraysDescriptor, SharedBufferDescriptor]):
+    """
+    Frees a shared memory segment published with ``publish_arrays()`` or ``publish_buffer()`` that will never
+    be attached, like a buffer left on the buffer queue when a simulation stops early.
+    """
+    try:
+        shm = SharedMemory(name=descriptor.shm_name)
+    except FileNotFoundError:
+        return
+
+    shm.close()
+    if os.name == "posix":
+        shm.unlink()
+
+
+def release_segment(shm: SharedMemory) -> bool:
+    """
+    Tries to close a segment returned by ``attach_buffer()``. Returns False if something still holds a view
+    into the segment, in which case it should be released again later.
+    """
+    try:
+        shm.close()
+    except BufferError:
+        return False
+
+    return True
+
+
+def free_segment(shm: SharedMemory):
+    """
+    Frees a segment created with ``allocate_arrays()``. Every view into the segment must have been dropped.
+    """
+    release_segment(shm)
+    if os.name == "posix":
+        shm.unlink()
+
+
+def _lay_out(array_types: dict[str, tuple[tuple[int, ...], np.dtype]]) -> tuple[list[SharedColumn], int]:
+    """
+    Lays arrays of the given shapes and dtypes out one after another, each starting on a multiple of
+    COLUMN_ALIGNMENT bytes. Returns the columns along with the total number of bytes they take up.
+    """
+    columns = []
+    num_bytes = 0
+    for name, (shape, dtype) in array_types.items():
+        dtype = np.dtype(dtype)
+        num_bytes = _align(num_bytes)
+        columns.append(SharedColumn(name, dtype.str, tuple(shape), num_bytes))
+        num_bytes += int(np.prod(shape, dtype=np.int64)) * dtype.itemsize
+
+    return columns, num_bytes
+
+
+def _get_arrays(shm: SharedMemory, descriptor: SharedArraysDescriptor) -> dict[str, np.ndarray]:
+    """
+    Returns the arrays described by ``descriptor`` as views into ``shm``.
+    """
+    return {
+        column.name: np.ndarray(column.shape, dtype=np.dtype(column.dtype), buffer=shm.buf, offset=column.offset)
+        for column in descriptor.columns
+    }
+
+
+def _align(offset: int) -> int:
+    """
+    Rounds ``offset`` up to the next multiple of COLUMN_ALIGNMENT.
+    """
+    return -(-offset // COLUMN_ALIGNMENT) * COLUMN_ALIGNMENT
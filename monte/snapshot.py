@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import threading
+from collections.abc import Callable
+from datetime import datetime
+
+import pandas as pd
+
+
+class MarketSnapshot():
+    """
+    The market data of every watched asset on one tick of the testing phase: its testing dataframe, the latest
+    row of that dataframe and its latest price.
+
+    The asset manager takes a snapshot once per tick, after the testing data has been incremented (see
+    ``AssetManager.take_snapshot()``). Until the next increment, everything that reads the testing data (the
+    brokers, portfolios, positions and algorithms) reads it from the snapshot. Each symbol's data is only built
+    the first time it is asked for, so a tick costs nothing for the assets nobody looks at, and it is built once
+    per tick no matter how many algorithms look at it. Algorithms running on separate threads share the
+    snapshot, and a lock makes sure that a symbol's data is only built by one of them. The dataframes and rows
+    it holds are shared as well, so they must be treated as read-only.
+
+    The data is built from the testing data as it is when it is first asked for, so a snapshot must not be used
+    after the testing data is incremented again.
+    """
+
+    time: int
+    datetime: datetime
+    _symbols: list[str]
+    _build_testing_df: Callable[[str], pd.DataFrame]
+    _testing_dfs: dict[str, pd.DataFrame]
+    _latest_rows: dict[str, pd.Series]
+    _prices: dict[str, float]
+    _lock: threading.Lock
+
+    def __init__(self, time: int, datetime: datetime, symbols: list[str],
+                 build_testing_df: Callable[[str], pd.DataFrame]):
+        # Nanoseconds since the epoch (UTC)
+        self.time = time
+        self.datetime = datetime
+
+        self._symbols = symbols
+        self._build_testing_df = build_testing_df
+
+        self._testing_dfs = {}
+        self._latest_rows = {}
+        self._prices = {}
+        self._lock = threading.Lock()
+
+    @property
+    def symbols(self) -> list[str]:
+        """
+        The symbols of every asset in the snapshot.
+        """
+        return list(self._symbols)
+
+    def get_testing_df(self, symbol: str) -> pd.DataFrame:
+        """
+        Returns the testing dataframe of ``symbol``.
+        """
+        if symbol in self._testing_dfs:
+            return self._testing_dfs[symbol]
+
+        with self._lock:
+            if symbol not in self._testing_dfs:
+                self._testing_dfs[symbol] = self._build_testing_df(symbol)
+
+            return self._testing_dfs[symbol]
+
+    def get_latest_row(self, symbol: str) -> pd.Series:
+        """
+        Returns the latest row of the testing dataframe of ``symbol``.
+        """
+        if symbol in self._latest_rows:
+            return self._latest_rows[symbol]
+
+        # Assets without any testing data have no latest row, asking for one raises the same error that asking
+        # the empty dataframe would
+        df = self.get_testing_df(symbol)
+
+        with self._lock:
+            if symbol not in self._latest_rows:
+                self._latest_rows[symbol] = df.iloc[-1]
+
+            return self._latest_rows[symbol]
+
+    def get_price(self, symbol: str) -> float:
+        """
+        Returns the latest volume-weighted average price (vwap) of ``symbol``.
+        """
+        if symbol in self._prices:
+            return self._prices[symbol]
+
+        row = self.get_latest_row(symbol)
+
+        with self._lock:
+            if symbol not in self._prices:
+                self._prices[symbol] = row.vwap
+
+            return self._prices[symbol]
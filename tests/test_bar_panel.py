@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from monte.bar_panel import BarAligner
+from monte.dates import to_epoch_ns
+from monte.machine_settings import MissingBarPolicy
+
+TICKS = pd.date_range("2022-01-03 14:30", periods=4, freq="h", tz="UTC")
+
+
+def get_bars(tick_indices: list[int], first_price: float) -> pd.DataFrame:
+    """
+    Returns a cleaned buffer dataframe with one bar on each of the ticks in ``tick_indices``. The prices go up
+    by 1 with every bar, starting from ``first_price``.
+    """
+    prices = first_price + np.arange(len(tick_indices), dtype=np.float64)
+
+    return pd.DataFrame({
+        "datetime": TICKS[tick_indices],
+        "open": prices,
+        "high": prices + 0.5,
+        "low": prices - 0.5,
+        "close": prices + 0.25,
+        "volume": np.arange(1, len(tick_indices) + 1, dtype=np.int64) * 100,
+        "trade_count": np.arange(1, len(tick_indices) + 1, dtype=np.int64),
+        "vwap": prices + 0.1,
+    })
+
+
+def align(policy: MissingBarPolicy):
+    """
+    Aligns a buffer where AAA has a bar on every tick and BBB is missing the bar on the third tick.
+    """
+    buffer_data = {"AAA": get_bars([0, 1, 2, 3], 10.0), "BBB": get_bars([0, 1, 3], 20.0)}
+    return BarAligner(policy).align(buffer_data, to_epoch_ns(TICKS))
+
+
+def test_complete_symbol_is_unchanged():
+    for policy in MissingBarPolicy:
+        panel = align(policy)
+        rows = panel.get_rows(slice(0, panel.num_rows), "AAA")
+
+        expected_ticks = [0, 1, 3] if policy is MissingBarPolicy.DROP else [0, 1, 2, 3]
+        expected = get_bars([0, 1, 2, 3], 10.0).iloc[expected_ticks]
+
+        np.testing.assert_array_equal(rows["close"], expected["close"].to_numpy())
+        np.testing.assert_array_equal(rows["volume"], expected["volume"].to_numpy())
+
+
+def test_forward_fill():
+    panel = align(MissingBarPolicy.FORWARD_FILL)
+    row = panel.get_row(2, "BBB")
+
+    assert panel.num_rows == 4
+    assert row["open"] == row["high"] == row["low"] == row["close"] == 21.25
+    assert row["vwap"] == 21.1
+    assert row["volume"] == 0
+    assert row["trade_count"] == 0
+
+    # Volumes and trade counts stay integers, since forward-filled bars fill them with 0
+    assert panel.fields["volume"].dtype == np.int64
+
+
+def test_forward_fill_carries_over_between_buffers():
+    aligner = BarAligner(MissingBarPolicy.FORWARD_FILL)
+    aligner.align({"AAA": get_bars([0, 1], 10.0)}, to_epoch_ns(TICKS[:2]))
+
+    panel = aligner.align({"AAA": get_bars([3], 30.0)}, to_epoch_ns(TICKS[2:]))
+    row = panel.get_row(0, "AAA")
+
+    assert row["close"] == 11.25
+    assert row["vwap"] == 11.1
+    assert row["volume"] == 0
+
+
+def test_forward_fill_without_previous_bar_is_nan():
+    buffer_data = {"AAA": get_bars([1, 2, 3], 10.0)}
+    panel = BarAligner(MissingBarPolicy.FORWARD_FILL).align(buffer_data, to_epoch_ns(TICKS))
+
+    assert np.isnan(panel.get_row(0, "AAA")["close"])
+    assert panel.get_row(1, "AAA")["close"] == 10.25
+
+
+def test_nan():
+    panel = align(MissingBarPolicy.NAN)
+    row = panel.get_row(2, "BBB")
+
+    assert panel.num_rows == 4
+    for field in ["open", "high", "low", "close", "volume", "trade_count", "vwap"]:
+        assert np.isnan(row[field])
+
+    assert panel.get_row(3, "BBB")["close"] == 22.25
+
+
+def test_drop():
+    panel = align(MissingBarPolicy.DROP)
+
+    assert panel.num_rows == 3
+    np.testing.assert_array_equal(panel.times, to_epoch_ns(TICKS[[0, 1, 3]]))
+    assert panel.get_row(2, "BBB")["close"] == 22.25
+    assert panel.get_row(2, "AAA")["close"] == 13.25
+
+
+@pytest.mark.parametrize("policy", list(MissingBarPolicy))
+def test_bars_off_the_ticks_are_left_out(policy):
+    bars = get_bars([0, 1, 2, 3], 10.0)
+    bars["datetime"] = bars["datetime"] + pd.to_timedelta([0, 0, 5, 0], unit="min")
+    panel = BarAligner(policy).align({"AAA": bars}, to_epoch_ns(TICKS))
+
+    assert panel.get_rows(slice(0, panel.num_rows), "AAA")["close"].tolist()[:2] == [10.25, 11.25]
+    assert 12.25 not in panel.fields["close"]
+
+
+def test_timestamps_match_alpaca_format():
+    panel = align(MissingBarPolicy.NAN)
+
+    assert panel.get_row(0, "AAA")["timestamp"] == "2022-01-03T14:30:00Z"
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from derived_columns.definitions import (infimum, infimum_norm, mean, naive_sharpe, nearest_neighbor, net, returns,
+                                         std_dev)
+from monte.column import clear_column_caches
+
+NUM_ROWS = 10
+NUM_DF_ROWS = 500
+
+# (column function, arguments after num_rows) for every column function with a batch implementation
+BATCH_COLUMNS = [
+    (net, ("close",)),
+    (mean, ("close",)),
+    (std_dev, ("close",)),
+    (returns, ("close",)),
+    (infimum, ("close", 1.5)),
+    (infimum_norm, ("infimum", "returns")),
+    (nearest_neighbor, ("infimum", "returns")),
+    (naive_sharpe, ("close",)),
+]
+
+
+def get_random_df(seed: int) -> pd.DataFrame:
+    """
+    Returns a dataframe of random prices, returns and infimums for one symbol with one row per minute.
+    """
+    rng = np.random.default_rng(seed)
+
+    return pd.DataFrame({
+        "symbol": "TEST",
+        "timestamp": pd.date_range("2022-01-03 09:30", periods=NUM_DF_ROWS, freq="min", tz="UTC").astype(str),
+        "close": 100 + np.cumsum(rng.normal(0, 1, NUM_DF_ROWS)),
+        "returns": rng.normal(0, 0.01, NUM_DF_ROWS),
+        "infimum": rng.normal(0, 0.01, NUM_DF_ROWS),
+    })
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+@pytest.mark.parametrize("func, args", BATCH_COLUMNS, ids=[func.__name__ for func, _ in BATCH_COLUMNS])
+def test_batch_matches_column_function(func, args, seed):
+    """
+    The batch function must return exactly (not just approximately) what the column function returns for
+    every row that has at least ``NUM_ROWS`` rows up to and including it.
+    """
+    clear_column_caches()
+    df = get_random_df(seed)
+
+    batch_values = np.asarray(func.batch_func_(df, NUM_ROWS, *args), dtype=np.float64)
+    row_values = np.array([func(df.iloc[:row + 1], NUM_ROWS, *args) for row in range(NUM_ROWS - 1, len(df))],
+                          dtype=np.float64)
+
+    # Compare the bits so that even a one ULP difference fails
+    np.testing.assert_array_equal(batch_values[NUM_ROWS - 1:].view(np.int64), row_values.view(np.int64))
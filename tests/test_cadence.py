@@ -0,0 +1,294 @@
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+import pytz
+from alpaca_trade_api import TimeFrame, TimeFrameUnit
+
+from monte.algorithm import Algorithm
+from monte.cadence import (CrossingDirection, EveryNTimeFrames, EveryTimeFrame, OnColumnCrossing,
+                           OnProcessedOrders, SessionClose, SessionOpen, Tick)
+from monte.clock import SimulationClock
+from monte.column_store import ColumnStore
+from monte.data_sources import FileDataSource
+from monte.machine_settings import MachineSettings
+from monte.scheduler import AlgorithmScheduler
+
+TIME_ZONE = pytz.timezone("US/Eastern")
+
+# The Friday after Thanksgiving closes early, at 13:00
+CALENDAR = """date,open,close
+2021-11-24,09:30,16:00
+2021-11-26,09:30,13:00
+2021-11-29,09:30,16:00
+"""
+
+
+class FakeBroker():
+    """
+    Stands in for a Broker. The orders in ``pending_orders`` are all processed on the next tick.
+    """
+
+    def __init__(self):
+        self.pending_orders = []
+        self.portfolio = SimpleNamespace(_delete_empty_positions=lambda: None)
+
+    @property
+    def has_pending_orders(self) -> bool:
+        return len(self.pending_orders) > 0
+
+    def process_pending_orders(self) -> list:
+        processed_orders, self.pending_orders = self.pending_orders, []
+        return processed_orders
+
+
+class FakeAlgorithm(Algorithm):
+    """
+    Records the datetime and processed orders of every run.
+    """
+
+    def __init__(self, name: str, cadence):
+        self.name = name
+        self.cadence = cadence
+        self.broker = FakeBroker()
+        self.runs = []
+
+    def get_name(self) -> str:
+        return self.name
+
+    def get_broker(self) -> FakeBroker:
+        return self.broker
+
+    def get_derived_columns(self) -> dict:
+        return {}
+
+    def startup(self):
+        pass
+
+    def train(self):
+        pass
+
+    def run_one_time_frame(self, current_datetime: datetime, processed_orders: list):
+        self.runs.append((current_datetime.strftime("%m-%d %H:%M"), processed_orders))
+
+    def get_cadence(self):
+        return self.cadence
+
+    def cleanup(self):
+        pass
+
+
+class FakeAssetManager():
+    """
+    Stands in for an AssetManager, with a real clock that the tests move from tick to tick and the testing data
+    of one watched asset.
+    """
+
+    def __init__(self, machine_settings: MachineSettings):
+        self.machine_settings = machine_settings
+        self.clock = SimulationClock(machine_settings)
+
+        testing_data = ColumnStore(["close"], [], TIME_ZONE)
+        self.watched_assets = {"AAA": SimpleNamespace(testing_data=testing_data)}
+
+    def take_snapshot(self):
+        pass
+
+    @property
+    def latest_datetime(self) -> datetime:
+        return self.clock.latest_datetime
+
+
+@pytest.fixture
+def machine_settings(tmp_path) -> MachineSettings:
+    calendar_path = tmp_path / "calendar.csv"
+    calendar_path.write_text(CALENDAR)
+
+    return MachineSettings(
+        None, datetime(2021, 11, 24), datetime(2021, 11, 29), 0.0, TimeFrame(1, TimeFrameUnit.Hour),
+        data_source=FileDataSource(str(tmp_path), str(calendar_path)))
+
+
+def get_tick(index: int, is_session_open: bool = False, is_session_close: bool = False,
+             asset_manager=None) -> Tick:
+    return Tick(index, datetime(2021, 11, 24, 10), is_session_open, is_session_close, asset_manager)
+
+
+def run_scheduler(machine_settings: MachineSettings, algorithms: list[FakeAlgorithm],
+                  on_tick=None) -> FakeAssetManager:
+    """
+    Runs ``algorithms`` on every tick of the simulation. ``on_tick`` is called with the tick index and the
+    asset manager after each tick is run, like the algorithms' own code would be.
+    """
+    asset_manager = FakeAssetManager(machine_settings)
+    scheduler = AlgorithmScheduler(algorithms, asset_manager)
+
+    ticks = asset_manager.clock.get_ticks(machine_settings.start_date.date(), machine_settings.end_date.date())
+    for tick_index, tick_time in enumerate(ticks):
+        asset_manager.clock.advance_to(tick_time)
+        scheduler.run_tick()
+
+        if on_tick is not None:
+            on_tick(tick_index, asset_manager)
+
+    scheduler.close()
+    return asset_manager
+
+
+@pytest.mark.parametrize("num_time_frames, offset, due_indices", [
+    (1, 0, list(range(10))),
+    (3, 0, [0, 3, 6, 9]),
+    (3, 2, [2, 5, 8]),
+    (4, 1, [1, 5, 9]),
+])
+def test_every_n_time_frames(num_time_frames, offset, due_indices):
+    cadence = EveryNTimeFrames(num_time_frames, offset)
+
+    assert [index for index in range(10) if cadence.is_due(get_tick(index), False)] == due_indices
+
+
+@pytest.mark.parametrize("num_time_frames, offset", [(0, 0), (3, 3), (3, -1)])
+def test_every_n_time_frames_rejects_invalid_values(num_time_frames, offset):
+    with pytest.raises(ValueError):
+        EveryNTimeFrames(num_time_frames, offset)
+
+
+def test_session_cadences_follow_the_tick():
+    for is_session_open in (True, False):
+        for is_session_close in (True, False):
+            tick = get_tick(0, is_session_open, is_session_close)
+
+            assert SessionOpen().is_due(tick, False) is is_session_open
+            assert SessionClose().is_due(tick, False) is is_session_close
+
+
+def test_session_open_and_close_with_an_early_close(machine_settings):
+    every_tick = FakeAlgorithm("every_tick", EveryTimeFrame())
+    session_open = FakeAlgorithm("session_open", SessionOpen())
+    session_close = FakeAlgorithm("session_close", SessionClose())
+
+    run_scheduler(machine_settings, [every_tick, session_open, session_close])
+
+    # Hourly ticks run from 10:00 to the close, which is 13:00 on the early close
+    assert len(every_tick.runs) == 7 + 4 + 7
+    assert [run for run, _ in session_open.runs] == ["11-24 10:00", "11-26 10:00", "11-29 10:00"]
+    assert [run for run, _ in session_close.runs] == ["11-24 16:00", "11-26 13:00", "11-29 16:00"]
+
+
+def test_daily_ticks_are_both_session_open_and_close(machine_settings):
+    machine_settings.time_frame = TimeFrame(1, TimeFrameUnit.Day)
+    session_open = FakeAlgorithm("session_open", SessionOpen())
+    session_close = FakeAlgorithm("session_close", SessionClose())
+
+    run_scheduler(machine_settings, [session_open, session_close])
+
+    assert len(session_open.runs) == len(session_close.runs) == 3
+
+
+def test_on_processed_orders(machine_settings):
+    cadence = OnProcessedOrders()
+
+    assert cadence.depends_on_orders
+    assert not cadence.is_due(get_tick(0), False)
+    assert cadence.is_due(get_tick(0), True)
+
+    on_orders = FakeAlgorithm("on_orders", cadence)
+    every_third = FakeAlgorithm("every_third", EveryNTimeFrames(3))
+
+    def place_orders(tick_index: int, _):
+        if tick_index in (2, 5):
+            on_orders.broker.pending_orders.append(f"order {tick_index}")
+        if tick_index in (1, 3):
+            every_third.broker.pending_orders.append(f"order {tick_index}")
+
+    run_scheduler(machine_settings, [on_orders, every_third], place_orders)
+
+    # Orders are processed on the tick after they were placed, which is when OnProcessedOrders runs
+    assert on_orders.runs == [("11-24 13:00", ["order 2"]), ("11-24 16:00", ["order 5"])]
+
+    # Algorithms that aren't due get their processed orders on their next run
+    assert every_third.runs[:3] == [
+        ("11-24 10:00", []), ("11-24 13:00", ["order 1"]), ("11-24 16:00", ["order 3"])]
+    assert all(not orders for _, orders in every_third.runs[3:])
+
+
+@pytest.mark.parametrize("direction, due_indices", [
+    (CrossingDirection.UP, [1, 5]),
+    (CrossingDirection.DOWN, [3]),
+    (CrossingDirection.EITHER, [1, 3, 5]),
+])
+def test_on_column_crossing(machine_settings, direction, due_indices):
+    asset_manager = FakeAssetManager(machine_settings)
+    testing_data = asset_manager.watched_assets["AAA"].testing_data
+    cadence = OnColumnCrossing("AAA", "close", 2.0, direction)
+
+    due = []
+    for index, close in enumerate([1.0, 2.0, 3.0, 2.0, 1.0, 2.5, np.nan, 3.0]):
+        testing_data.append_row({"close": close})
+
+        if cadence.is_due(get_tick(index, asset_manager=asset_manager), False):
+            due.append(index)
+
+    # A value at the threshold counts as having crossed it, but moving away from the threshold doesn't. NaNs
+    # never cross.
+    assert due == due_indices
+
+
+def test_on_column_crossing_rejects_invalid_directions():
+    with pytest.raises(TypeError):
+        OnColumnCrossing("AAA", "close", 2.0, "up")
+
+
+def test_combined_cadences(machine_settings):
+    cadence = EveryNTimeFrames(5) | SessionClose()
+
+    assert not cadence.depends_on_orders
+    assert (SessionOpen() | OnProcessedOrders()).depends_on_orders
+
+    combined = FakeAlgorithm("combined", cadence)
+    run_scheduler(machine_settings, [combined])
+
+    # The algorithm runs once on ticks that both cadences are due on, like the early close (tick 10)
+    assert [run for run, _ in combined.runs] == [
+        "11-24 10:00", "11-24 15:00", "11-24 16:00", "11-26 13:00", "11-29 14:00", "11-29 16:00"]
+
+
+def test_equal_cadences_share_a_group(machine_settings):
+    algorithms = [FakeAlgorithm(f"algo_{index}", EveryNTimeFrames(3, index % 2)) for index in range(4)]
+    scheduler = AlgorithmScheduler(algorithms, FakeAssetManager(machine_settings))
+
+    assert scheduler._cadence_groups == {EveryNTimeFrames(3, 0): [0, 2], EveryNTimeFrames(3, 1): [1, 3]}
+
+
+class PrintingAlgorithm(FakeAlgorithm):
+    """
+    Prints its name and the time of every run. The algorithms that were added first take the longest, so on a
+    thread pool they finish last.
+    """
+
+    def __init__(self, name: str, delay: float):
+        super().__init__(name, EveryTimeFrame())
+        self.delay = delay
+
+    def run_one_time_frame(self, current_datetime: datetime, processed_orders: list):
+        print(f"{self.name} start {current_datetime:%m-%d %H:%M}")
+        time.sleep(self.delay)
+        print(f"{self.name} end")
+
+
+def test_threaded_runs_print_in_algorithm_order(machine_settings, capsys):
+    algorithms = [PrintingAlgorithm(f"algo_{index}", 0.004 - 0.001 * index) for index in range(4)]
+
+    machine_settings.num_algorithm_threads = 1
+    run_scheduler(machine_settings, algorithms)
+    serial_output = capsys.readouterr().out
+
+    machine_settings.num_algorithm_threads = 4
+    run_scheduler(machine_settings, algorithms)
+    threaded_output = capsys.readouterr().out
+
+    assert threaded_output == serial_output
+    assert serial_output.splitlines()[:4] == [
+        "algo_0 start 11-24 10:00", "algo_0 end", "algo_1 start 11-24 10:00", "algo_1 end"]
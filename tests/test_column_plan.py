@@ -0,0 +1,185 @@
+import pytest
+
+from derived_columns.definitions import infimum, mean, returns, std_dev
+from derived_columns.online import RollingMean
+from monte.column import Column, OnlineColumn
+from monte.column_plan import ColumnPlan
+
+
+def test_columns_come_after_their_dependencies():
+    derived_columns = {
+        "inf": Column("inf", infimum, 5, "ret", 1.5, column_dependencies=["ret"]),
+        "sd": Column("sd", std_dev, 5, "vwap"),
+        "ret": Column("ret", returns, 2, "vwap"),
+        "mean_inf": Column("mean_inf", mean, 3, "inf", column_dependencies=["inf"]),
+    }
+
+    plan = ColumnPlan.compile(derived_columns)
+
+    # Columns that are ready to be planned keep the order they were added in
+    assert plan.titles == ["sd", "ret", "inf", "mean_inf"]
+    assert [step.dependencies for step in plan] == [(), (), ("ret",), ("inf",)]
+
+
+def test_online_columns_depend_on_their_input_column():
+    derived_columns = {
+        "rolling_ret": OnlineColumn("rolling_ret", RollingMean, 4, "ret"),
+        "ret": Column("ret", returns, 2, "vwap"),
+    }
+
+    plan = ColumnPlan.compile(derived_columns)
+
+    assert plan.titles == ["ret", "rolling_ret"]
+    assert plan.steps[1].dependencies == ("ret",)
+
+
+def test_base_column_and_self_dependencies_are_ignored():
+    derived_columns = {"ret": Column("ret", returns, 2, "vwap", column_dependencies=["vwap", "ret"])}
+
+    plan = ColumnPlan.compile(derived_columns)
+
+    assert plan.steps[0].dependencies == ()
+    assert plan.steps[0].ready_row_count == 2
+
+
+@pytest.mark.parametrize("derived_columns, cycle", [
+    ({
+        "a": Column("a", mean, 2, "b", column_dependencies=["b"]),
+        "b": Column("b", mean, 2, "a", column_dependencies=["a"]),
+    }, "a -> b -> a"),
+    ({
+        "ret": Column("ret", returns, 2, "vwap"),
+        "a": Column("a", mean, 2, "c", column_dependencies=["ret", "c"]),
+        "b": Column("b", mean, 3, "a", column_dependencies=["a"]),
+        "c": Column("c", mean, 4, "b", column_dependencies=["b"]),
+    }, "a -> c -> b -> a"),
+])
+def test_circular_dependencies_are_rejected(derived_columns, cycle):
+    with pytest.raises(ValueError, match=cycle):
+        ColumnPlan.compile(derived_columns)
+
+
+def test_cycle_that_isnt_reachable_from_the_first_column():
+    derived_columns = {
+        "depends_on_cycle": Column("depends_on_cycle", mean, 2, "a", column_dependencies=["a"]),
+        "a": Column("a", mean, 2, "b", column_dependencies=["b"]),
+        "b": Column("b", mean, 2, "a", column_dependencies=["a"]),
+    }
+
+    with pytest.raises(ValueError, match="a -> b -> a"):
+        ColumnPlan.compile(derived_columns)
+
+
+def test_ready_and_filled_row_counts():
+    derived_columns = {
+        "ret": Column("ret", returns, 2, "vwap"),
+        "inf": Column("inf", infimum, 5, "ret", 1.5, column_dependencies=["ret"]),
+        "mean_inf": Column("mean_inf", mean, 3, "inf", column_dependencies=["inf"]),
+        "sd": Column("sd", std_dev, 10, "vwap"),
+        "mixed": Column("mixed", mean, 2, "inf", column_dependencies=["inf", "sd"]),
+    }
+
+    plan = {step.title: step for step in ColumnPlan.compile(derived_columns)}
+
+    # A column is ready once each of its dependencies has had a value for as many rows as the column needs
+    assert plan["ret"].ready_row_count == 2
+    assert plan["inf"].ready_row_count == 2 + 5 - 1
+    assert plan["mean_inf"].ready_row_count == 6 + 3 - 1
+    assert plan["sd"].ready_row_count == 10
+    assert plan["mixed"].ready_row_count == max(6 + 2 - 1, 10 + 2 - 1)
+
+    for step in plan.values():
+        assert step.filled_row_count == step.ready_row_count
+
+
+@pytest.mark.parametrize("phase", [0, 1, 3])
+def test_periodic_row_counts(phase):
+    derived_columns = {
+        "slow": Column("slow", mean, 3, "vwap", period=4, phase=phase),
+        "after_slow": Column("after_slow", mean, 2, "slow", column_dependencies=["slow"]),
+        "slow_after_slow": Column(
+            "slow_after_slow", mean, 2, "slow", column_dependencies=["slow"], period=2),
+    }
+
+    plan = {step.title: step for step in ColumnPlan.compile(derived_columns)}
+
+    # A periodic column can have to wait up to a whole period after it is ready before it has a value, and
+    # columns that depend on it wait for that
+    assert plan["slow"].ready_row_count == 3
+    assert plan["slow"].filled_row_count == 3 + 4 - 1
+    assert plan["after_slow"].ready_row_count == 6 + 2 - 1
+    assert plan["after_slow"].filled_row_count == 7
+    assert plan["slow_after_slow"].ready_row_count == 7
+    assert plan["slow_after_slow"].filled_row_count == 7 + 2 - 1
+
+
+def test_invalid_period_and_phase_are_rejected():
+    with pytest.raises(ValueError):
+        Column("slow", mean, 3, "vwap", period=0)
+
+    with pytest.raises(ValueError):
+        Column("slow", mean, 3, "vwap", period=4, phase=4)
+
+
+def test_columns_defined_the_same_way_are_aliased():
+    derived_columns = {
+        "ret": Column("ret", returns, 2, "vwap"),
+        "same_ret": Column("same_ret", returns, 2, "vwap"),
+        "inf": Column("inf", infimum, 5, "ret", 1.5, column_dependencies=["ret"]),
+        "same_inf": Column("same_inf", infimum, 5, "same_ret", 1.5, column_dependencies=["same_ret"]),
+    }
+
+    plan = ColumnPlan.compile(derived_columns)
+
+    # Arguments that name aliases of the same column count as the same
+    assert plan.titles == ["ret", "inf"]
+    assert plan.aliases == {"same_ret": "ret", "same_inf": "inf"}
+    assert plan.steps[1].all_titles == ("inf", "same_inf")
+    assert plan.steps[1].ready_row_count == 6
+
+
+@pytest.mark.parametrize("other_column", [
+    Column("other", mean, 4, "vwap"),
+    Column("other", mean, 3, "close"),
+    Column("other", std_dev, 3, "vwap"),
+    Column("other", mean, 3, "vwap", period=2),
+    Column("other", mean, 3, "vwap", period=2, phase=1),
+])
+def test_columns_defined_differently_are_not_aliased(other_column):
+    derived_columns = {"mean": Column("mean", mean, 3, "vwap"), "other": other_column}
+
+    plan = ColumnPlan.compile(derived_columns)
+
+    assert plan.titles == ["mean", "other"]
+    assert plan.aliases == {}
+
+
+def test_columns_with_different_dependencies_are_not_aliased():
+    derived_columns = {
+        "ret": Column("ret", returns, 2, "vwap"),
+        "sd": Column("sd", std_dev, 10, "vwap"),
+        "mean": Column("mean", mean, 3, "vwap", column_dependencies=["ret"]),
+        "waits_for_sd": Column("waits_for_sd", mean, 3, "vwap", column_dependencies=["sd"]),
+        "same_mean": Column("same_mean", mean, 3, "vwap", column_dependencies=["ret", "ret"]),
+    }
+
+    plan = {step.title: step for step in ColumnPlan.compile(derived_columns)}
+
+    # Only the columns with the same dependencies are aliased, since the dependencies decide from which row on a
+    # column is calculated
+    assert plan["mean"].aliases == ("same_mean",)
+    assert plan["mean"].ready_row_count == 4
+    assert plan["waits_for_sd"].ready_row_count == 12
+
+
+def test_columns_with_unhashable_arguments_are_compared_by_equality():
+    derived_columns = {
+        "mean": Column("mean", mean, 3, "vwap", weights=[1, 2, 3]),
+        "same_mean": Column("same_mean", mean, 3, "vwap", weights=[1, 2, 3]),
+        "other_mean": Column("other_mean", mean, 3, "vwap", weights=[3, 2, 1]),
+    }
+
+    plan = ColumnPlan.compile(derived_columns)
+
+    assert plan.titles == ["mean", "other_mean"]
+    assert plan.aliases == {"same_mean": "mean"}
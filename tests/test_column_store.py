@@ -0,0 +1,181 @@
+import numpy as np
+import pandas as pd
+import pytest
+import pytz
+
+from monte.column_store import ColumnStore
+
+TIME_ZONE = pytz.timezone("America/New_York")
+COLUMNS = ["datetime", "close", "volume", "symbol"]
+
+
+def get_rows(num_rows: int) -> list[dict]:
+    """
+    Returns ``num_rows`` rows of made-up asset data, one minute apart.
+    """
+    datetimes = pd.date_range("2022-01-03 09:30", periods=num_rows, freq="min", tz=TIME_ZONE)
+
+    return [
+        {"datetime": datetimes[row], "close": 100.0 + row, "volume": 10 * row, "symbol": "TEST"}
+        for row in range(num_rows)
+    ]
+
+
+def get_store(rows: list[dict], initial_capacity: int = 4) -> ColumnStore:
+    store = ColumnStore(COLUMNS, ["datetime"], TIME_ZONE, initial_capacity=initial_capacity)
+    for row in rows:
+        store.append_row(row)
+
+    return store
+
+
+def test_append_row_types_columns_by_their_first_value():
+    store = get_store(get_rows(3))
+    df = store.to_dataframe()
+
+    assert len(store) == 3
+    assert df["close"].dtype == np.float64
+    assert df["volume"].dtype == np.int64
+    assert store.get_column("symbol").dtype == object
+    assert df["datetime"].tolist() == [row["datetime"] for row in get_rows(3)]
+    assert store.get_last_value("datetime") == get_rows(3)[-1]["datetime"]
+
+
+def test_append_row_fills_missing_columns_with_nan():
+    store = get_store([{"close": 1.0}])
+
+    assert np.isnan(store.get_last_value("volume"))
+
+
+def test_column_that_starts_missing_is_typed_as_float():
+    store = get_store([{"close": 1.0}, {"close": 2.0, "volume": 5}])
+
+    assert store.get_column("volume").dtype == np.float64
+    assert np.isnan(store.get_column("volume")[0])
+    assert store.get_column("volume")[1] == 5
+
+
+@pytest.mark.parametrize("value, dtype", [(1.5, np.float64), (np.nan, np.float64), ("many", object)])
+def test_integer_column_widens_for_values_that_dont_fit(value, dtype):
+    store = get_store(get_rows(2))
+    store.set_last_value("volume", value)
+
+    assert store.get_column("volume").dtype == dtype
+    assert store.get_column("volume")[0] == 0
+
+    if dtype == object:
+        assert store.get_last_value("volume") == value
+
+
+def test_float_column_widens_to_objects():
+    store = get_store(get_rows(2))
+    store.set_value("close", 0, "not a number")
+
+    assert store.get_column("close").tolist() == ["not a number", 101.0]
+
+
+def test_append_rows_matches_append_row():
+    rows = get_rows(20)
+    single_store = get_store(rows)
+
+    bulk_store = ColumnStore(COLUMNS, ["datetime"], TIME_ZONE, initial_capacity=4)
+    bulk_store.append_rows({column: [row[column] for row in rows[:7]] for column in COLUMNS})
+    bulk_store.append_rows({column: [row[column] for row in rows[7:]] for column in COLUMNS})
+
+    pd.testing.assert_frame_equal(bulk_store.to_dataframe(), single_store.to_dataframe())
+
+
+def test_append_rows_with_missing_first_values_matches_append_row():
+    rows = [{"close": 1.0}, {"close": 2.0, "volume": 5}, {"close": 3.0, "volume": 6}]
+    single_store = get_store(rows)
+
+    bulk_store = ColumnStore(COLUMNS, ["datetime"], TIME_ZONE)
+    bulk_store.append_rows({"close": [1.0, 2.0, 3.0], "volume": [np.nan, 5, 6]})
+
+    pd.testing.assert_frame_equal(bulk_store.to_dataframe(), single_store.to_dataframe())
+
+
+def test_store_grows_when_full():
+    rows = get_rows(50)
+    store = get_store(rows, initial_capacity=4)
+
+    assert store.capacity >= 50
+    assert store.get_column("close").tolist() == [row["close"] for row in rows]
+
+
+def test_trimmed_store_reuses_its_capacity():
+    rows = get_rows(200)
+    store = get_store(rows[:8], initial_capacity=16)
+
+    for row in rows[8:]:
+        store.append_row(row)
+        store.drop_first_rows(1)
+
+    assert store.capacity == 16
+    assert len(store) == 8
+    assert store.get_column("close").tolist() == [row["close"] for row in rows[-8:]]
+
+
+def test_drop_rows_through():
+    rows = get_rows(10)
+    store = get_store(rows)
+    store.drop_rows_through("datetime", rows[3]["datetime"])
+
+    assert len(store) == 6
+    assert store.to_dataframe()["datetime"].iloc[0] == rows[4]["datetime"]
+
+
+def test_copy_tail_keeps_the_last_rows_and_their_types():
+    rows = get_rows(30)
+    store = get_store(rows)
+    store.drop_first_rows(5)
+
+    tail_store = store.copy_tail(10)
+
+    pd.testing.assert_frame_equal(tail_store.to_dataframe(), store.to_dataframe(last_n=10))
+    assert tail_store.capacity >= 20
+
+    # The copy doesn't share its arrays with the original
+    tail_store.set_last_value("close", -1.0)
+    assert store.get_last_value("close") == rows[-1]["close"]
+
+    # Columns keep their types, so appending to the copy works like appending to the original
+    tail_store.append_row(get_rows(31)[-1])
+    assert tail_store.get_column("volume").dtype == np.int64
+
+
+def test_copy_tail_of_short_store():
+    store = get_store(get_rows(3))
+
+    assert len(store.copy_tail(10)) == 3
+
+
+def test_to_dataframe_is_cached_until_the_store_changes():
+    store = get_store(get_rows(5))
+    df = store.to_dataframe()
+
+    assert store.to_dataframe() is df
+
+    store.set_last_value("close", 0.0)
+    changed_df = store.to_dataframe()
+
+    assert changed_df is not df
+    assert changed_df["close"].iloc[-1] == 0.0
+    assert df["close"].iloc[-1] == 104.0
+
+    store.append_row(get_rows(6)[-1])
+    assert len(store.to_dataframe()) == 6
+
+    store.drop_first_rows(2)
+    assert len(store.to_dataframe()) == 4
+
+
+def test_to_dataframe_last_n_and_as_objects():
+    store = get_store(get_rows(5))
+
+    last_rows = store.to_dataframe(last_n=2)
+    object_df = store.to_dataframe(as_objects=True)
+
+    assert last_rows["close"].tolist() == [103.0, 104.0]
+    assert (object_df.dtypes == object).all()
+    assert object_df.iloc[-1].tolist() == store.to_dataframe().iloc[-1].tolist()
@@ -0,0 +1,84 @@
+import math
+
+import numpy as np
+import pytest
+
+from derived_columns.online import (RollingInfimum, RollingMax, RollingMean, RollingMin, RollingStdDev,
+                                    RollingSum, RollingWindowState)
+from monte.column import OnlineState
+
+NUM_ROWS = 5
+
+
+def get_windows(values: list[float]):
+    """
+    Yields every window of ``NUM_ROWS`` values, oldest first, along with the index of its last value.
+    """
+    for index in range(NUM_ROWS - 1, len(values)):
+        yield index, values[index - NUM_ROWS + 1:index + 1]
+
+
+# (state, function of a full window that the state's value should match)
+STATES = [
+    (lambda: RollingSum(NUM_ROWS), sum),
+    (lambda: RollingMean(NUM_ROWS), lambda window: sum(window) / NUM_ROWS),
+    (lambda: RollingStdDev(NUM_ROWS), lambda window: float(np.std(window))),
+    (lambda: RollingInfimum(NUM_ROWS, 1.5), lambda window: float(np.mean(window) - 1.5 * np.std(window))),
+    (lambda: RollingMin(NUM_ROWS), min),
+    (lambda: RollingMax(NUM_ROWS), max),
+]
+
+
+@pytest.mark.parametrize("create_state, window_func", STATES)
+def test_state_matches_window(create_state, window_func):
+    values = np.random.default_rng(0).normal(100, 5, 200).tolist()
+    state = create_state()
+
+    outputs = [state.update(value) for value in values]
+
+    assert all(math.isnan(output) for output in outputs[:NUM_ROWS - 1])
+    for index, window in get_windows(values):
+        assert outputs[index] == pytest.approx(window_func(window), rel=1e-12)
+
+
+@pytest.mark.parametrize("create_state, window_func", STATES)
+def test_missing_values_make_the_value_nan_while_in_the_window(create_state, window_func):
+    values = np.random.default_rng(1).normal(100, 5, 30).tolist()
+    values[10] = math.nan
+    state = create_state()
+
+    outputs = [state.update(value) for value in values]
+
+    assert all(math.isnan(output) for output in outputs[10:10 + NUM_ROWS])
+    assert outputs[10 + NUM_ROWS] == pytest.approx(window_func(values[11:11 + NUM_ROWS]), rel=1e-12)
+
+
+def test_checkpoint_is_independent():
+    state = RollingMean(NUM_ROWS)
+    for value in range(10):
+        state.update(value)
+
+    checkpoint = state.checkpoint()
+    state.update(100)
+
+    assert checkpoint.update(10) == 8.0
+
+
+def test_incomplete_states_cant_be_created():
+    class NoUpdate(OnlineState):
+        @property
+        def is_full(self) -> bool:
+            return True
+
+    class NoValue(RollingWindowState):
+        def _add(self, value: float):
+            pass
+
+        def _remove(self, value: float):
+            pass
+
+    with pytest.raises(TypeError):
+        NoUpdate(NUM_ROWS)
+
+    with pytest.raises(TypeError):
+        NoValue(NUM_ROWS)
@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+from monte.rolling import python_pow, python_sum, rolling_windows
+
+
+@pytest.mark.parametrize("exponent", [2, 3, 0.5, 1.5, -1])
+def test_python_pow_matches_python(exponent):
+    values = np.abs(np.random.default_rng(0).normal(0, 1, 100_000))
+    powers = python_pow(values, exponent)
+
+    expected = np.array([value ** exponent for value in values.tolist()])
+
+    # Compare the bits so that even a one ULP difference fails
+    np.testing.assert_array_equal(powers.view(np.int64), expected.view(np.int64))
+
+
+def test_python_sum_matches_python():
+    values = np.random.default_rng(0).normal(0, 1e6, 10_000)
+    windows = rolling_windows(values, 7)[6:]
+
+    expected = np.array([sum(window[::-1].tolist()) for window in windows])
+
+    np.testing.assert_array_equal(python_sum(windows).view(np.int64), expected.view(np.int64))
+
+
+def test_rolling_windows():
+    windows = rolling_windows(np.arange(5), 3)
+
+    assert np.isnan(windows[:2]).all()
+    np.testing.assert_array_equal(windows[2:], [[0, 1, 2], [1, 2, 3], [2, 3, 4]])
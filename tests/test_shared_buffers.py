@@ -0,0 +1,47 @@
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+import pytest
+
+from monte.shared_buffers import (COLUMN_ALIGNMENT, allocate_arrays, attach_arrays, free_segment, open_arrays,
+                                  publish_arrays, release_segment)
+
+
+def test_published_arrays_are_copied_into_the_segment():
+    arrays = {"values": np.arange(5, dtype=np.float64), "flags": np.array([True, False]),
+              "counts": np.arange(6, dtype=np.int64).reshape(2, 3)}
+
+    descriptor = publish_arrays(arrays)
+    shm, shared_arrays = attach_arrays(descriptor)
+
+    for name, array in arrays.items():
+        np.testing.assert_array_equal(shared_arrays[name], array)
+        assert shared_arrays[name].dtype == array.dtype
+
+    assert all(column.offset % COLUMN_ALIGNMENT == 0 for column in descriptor.columns)
+
+    shared_arrays = None
+    assert release_segment(shm)
+
+
+def test_allocated_arrays_are_shared_until_freed():
+    shm, descriptor, arrays = allocate_arrays({"command": ((2,), np.int64), "values": ((3, 4), np.float64)})
+
+    assert not arrays["command"].any() and not arrays["values"].any()
+
+    # Another mapping of the segment (like the one in an asset worker) sees the same memory every time
+    other_shm, other_arrays = open_arrays(descriptor)
+    for row in range(3):
+        other_arrays["values"][row] = row + 0.5
+        other_arrays["command"][0] = row
+
+        assert arrays["command"][0] == row
+        np.testing.assert_array_equal(arrays["values"][row], np.full(4, row + 0.5))
+
+    other_arrays = None
+    assert release_segment(other_shm)
+
+    arrays = None
+    free_segment(shm)
+    with pytest.raises(FileNotFoundError):
+        SharedMemory(name=descriptor.shm_name)